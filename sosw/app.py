@@ -46,7 +46,7 @@ import os
 from collections import defaultdict
 from importlib import import_module
 from typing import Dict
-from sosw.components.benchmark import benchmark
+from sosw.components.benchmark import benchmark, get_latency_stats, reset_latency_histograms, LATENCY_STATS_PREFIXES
 from sosw.components.config import get_config
 from sosw.components.helpers import *
 from sosw.components.dynamo_db import DynamoDbClient
@@ -103,6 +103,7 @@ class Processor:
 
         self.stats = defaultdict(int)
         self.result = defaultdict(int)
+        self.record_latency_histograms = self.config.get('record_latency_histograms', True)
 
         self.register_clients(self.config.get('init_clients', []))
 
@@ -322,6 +323,11 @@ class Processor:
            def get_stats(self, recursive=False):
                return super().get_stats(recursive=False)
 
+        Percentiles of the methods decorated with ``@benchmark(histogram=True)`` are added to the result as
+        ``latency_p50_<method>``, ``latency_p90_<method>``, ``latency_p99_<method>``, ``latency_max_<method>``
+        and the same with the ``total_`` prefix for the lifetime of the Processor. Recording of the histograms is
+        disabled with ``config['record_latency_histograms'] = False``.
+
         :param recursive:   Merge stats from self.***_client.
         :rtype:     dict
         :return:    Statistics counter of current Processor instance.
@@ -335,7 +341,7 @@ class Processor:
                 except Exception:
                     logger.debug(f"{some_client} doesn't have get_stats() implemented. Recommended to fix this.")
 
-        return dict(self.stats)
+        return {**self.stats, **get_latency_stats(self)}
 
 
     def reset_stats(self, recursive: bool = True):
@@ -361,16 +367,17 @@ class Processor:
         preserved.update({k: v for k, v in self.stats.items()
                           if k in self.config.get('lifetime_stats_params', []) or k.startswith('total_')})
 
-        # Update them with current values
+        # Update them with current values. Latency percentiles are not summable, the histograms are merged instead.
         for k, v in self.stats.items():
-            if not isinstance(v, (int, float)):
+            if not isinstance(v, (int, float)) or k.startswith(LATENCY_STATS_PREFIXES):
                 continue
             if not (k in self.config.get('lifetime_stats_params', []) or k.startswith('total_')):
                 preserved[f'total_{k}'] += v
 
         # Recreate a new version of stats to avoid mess in the memory between dictionaries.
         self.stats = defaultdict(int)
-        self.stats.update(preserved)
+        self.stats.update({k: v for k, v in preserved.items() if not k.startswith(LATENCY_STATS_PREFIXES)})
+        reset_latency_histograms(self)
 
         if recursive:
             for some_client in [x for x in dir(self) if x.endswith('_client')]:
@@ -380,6 +387,21 @@ class Processor:
                     pass
 
 
+    def flush(self):
+        """
+        Flush the buffered writes of the Processor helpers, e.g. of the ``meta_handler`` in the ``buffered`` mode.
+        Called by the lambda handler after every invocation even if the Processor failed.
+        Failures are logged and the rows stay in the buffer for the next invocation of the warm container.
+        """
+
+        meta_handler = getattr(self, 'meta_handler', None)
+        if meta_handler:
+            try:
+                meta_handler.flush()
+            except Exception:
+                logger.exception("Failed to flush the buffer of meta_handler")
+
+
     def die(self, message="Unknown Failure"):
         """
         Logs current Processor stats and `message`. Then raises RuntimeError with `message`.
@@ -522,7 +544,10 @@ def get_lambda_handler(processor_class, global_vars=None, custom_config=None):
         if global_vars.processor is None:
             global_vars.processor = processor_class(custom_config=custom_config, test=test)
 
-        result = global_vars.processor(event)
+        try:
+            result = global_vars.processor(event)
+        finally:
+            global_vars.processor.flush()
 
         logger.info(global_vars.processor.get_stats())
 
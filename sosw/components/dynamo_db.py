@@ -45,17 +45,198 @@ import boto3
 import datetime
 import json
 import os
+import queue
+import random
+import threading
 import time
 import pprint
 
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
 
 from .benchmark import benchmark
 from .helpers import chunks, to_bool
 
 
+def _decode_number(val, val_dict=None):
+    # type_deserializer.deserialize() parses 'N' to ``Decimal`` type but it cant be parsed to a datetime
+    # so we cast it to either an integer or a float.
+    return float(val) if '.' in val else int(val)
+
+
+def _decode_string(val, val_dict=None):
+    return val
+
+
+def _decode_json_looking_string(val, val_dict=None):
+    # Try to load to a dictionary if looks like JSON.
+    if val.startswith('{') and val.endswith('}'):
+        try:
+            return json.loads(val)
+        except ValueError:
+            logger.warning("A JSON-looking string failed to parse: %s", val)
+    return val
+
+
+class RowMapperCodec:
+    """
+    Converter of rows from the DynamoDB syntax to regular dictionaries, compiled once from the ``row_mapper``
+    of the :class:`DynamoDbClient` config.
+
+    The per-field decoders are resolved during initialization and stored as tuples, so converting a row does not
+    have to look up the config or compare types of the row_mapper for every field of every row.
+    You should not normally use this class directly: ``DynamoDbClient.dynamo_to_dict()`` dispatches to the codec
+    of the client.
+    """
+
+
+    def __init__(self, row_mapper: Dict, json_loads_results: bool = True,
+                 type_deserializer: Optional[TypeDeserializer] = None):
+
+        # Own copy, the compiled decoders should match it.
+        self.row_mapper = dict(row_mapper or {})
+        self.json_loads_results = json_loads_results
+
+        self.type_deserializer = type_deserializer or TypeDeserializer()
+
+        self._type_decoders = {
+            'N': _decode_number,
+            'S': _decode_json_looking_string if json_loads_results else _decode_string,
+            'M': lambda val, val_dict: self.decode_all_fields(val),
+        }
+
+        # Ex: (('task_id', 'S', <decoder>), ('greenfield', 'N', <decoder>), ...)
+        self._field_decoders = tuple((key, key_type, self._get_type_decoder(key_type))
+                                     for key, key_type in self.row_mapper.items())
+
+
+    def _get_type_decoder(self, key_type: str):
+        return self._type_decoders.get(key_type) or (lambda val, val_dict: self.type_deserializer.deserialize(val_dict))
+
+
+    def decode(self, dynamo_row: Dict, fetch_all_fields: bool = False) -> Dict:
+        """
+        Convert the row from DynamoDB syntax to a regular dictionary.
+
+        :param dict dynamo_row:       DynamoDB row item
+        :param bool fetch_all_fields: If False only row_mapper fields will be extracted from dynamo_row, else, all
+                                      fields will be extracted from dynamo_row.
+        """
+
+        return self.decode_all_fields(dynamo_row) if fetch_all_fields else self.decode_mapped_fields(dynamo_row)
+
+
+    def decode_mapped_fields(self, dynamo_row: Dict) -> Dict:
+        """ Extract and convert only the fields of the row_mapper. """
+
+        result = {}
+        for key, key_type, decoder in self._field_decoders:
+            val_dict = dynamo_row.get(key)  # Ex: {'N': "1234"} or {'S': "myvalue"}
+            if val_dict:
+                try:
+                    val = val_dict[key_type]  # Ex: 1234 or "myvalue"
+                except KeyError:
+                    real_type = list(val_dict.keys())[0]
+                    raise ValueError(f"'{key}' is expected to be of type '{key_type}' in row_mapper, "
+                                     f"but real value is of type '{real_type}'")
+
+                result[key] = decoder(val, val_dict)
+
+        return result
+
+
+    def decode_all_fields(self, dynamo_row: Dict) -> Dict:
+        """ Convert all the fields of the row taking types from the row itself. """
+
+        # Types are taken from every value here, so the most common ones are resolved inline.
+        json_loads_results = self.json_loads_results
+        result = {}
+        for key, val_dict in dynamo_row.items():
+            for val_type, val in val_dict.items():
+                if val_type == 'S':
+                    result[key] = _decode_json_looking_string(val) if json_loads_results else val
+                elif val_type == 'N':
+                    result[key] = float(val) if '.' in val else int(val)
+                elif val_type == 'M':
+                    result[key] = self.decode_all_fields(val)
+                else:
+                    result[key] = self.type_deserializer.deserialize(val_dict)
+
+        return result
+
+
+class CapacityTokenBucket:
+    """
+    Thread-safe token bucket of DynamoDB capacity units for a single table and action (read or write).
+
+    The bucket is refilled with ``rate`` units per second (the provisioned capacity of the table) up to ``burst``
+    units. Callers ``wait()`` until the bucket has some capacity, make the call and then ``consume()`` the real
+    ``ConsumedCapacity`` reported by DynamoDB. Large items may drive the balance below zero, so the following calls
+    wait longer until the debt is restored. This way the average throughput follows the provisioned capacity
+    whatever the size of items is.
+    """
+
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        assert rate > 0, "Rate of CapacityTokenBucket must be positive"
+
+        self.rate = float(rate)
+        self.burst = max(float(burst or rate), 1.0)
+
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self):
+        """ Must be called holding the lock. """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+    def wait(self, units: float = 1.0) -> float:
+        """
+        Blocks until the bucket has at least ``units`` (but not more than ``burst``) tokens. Does not consume them.
+
+        :return: Time slept in seconds.
+        """
+
+        units = min(units, self.burst)
+        slept = 0.0
+
+        while True:
+            with self._lock:
+                self._refill()
+                missing = units - self.tokens
+
+            # Tolerate the rounding errors of float time.
+            if missing < 1e-6:
+                return slept
+
+            pause = missing / self.rate
+            time.sleep(pause)
+            slept += pause
+
+
+    def available(self) -> float:
+        """ Current balance of the bucket. May be negative. """
+
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+    def consume(self, units: float):
+        """ Takes ``units`` from the bucket. The balance may become negative. """
+
+        with self._lock:
+            self._refill()
+            self.tokens -= units
+
+
 class DynamoDbClient:
     """
     Has default methods for different types of DynamoDB tables.
@@ -76,11 +257,31 @@ class DynamoDbClient:
             'required_fields': ['col_name_1']
             'table_name': 'some_table_name',  # If a table is not specified, this table will be used.
             'hash_key': 'the_hash_key',
-            'dont_json_loads_results': True  # Use this if you don't want to convert json strings into json
+            'dont_json_loads_results': True,  # Use this if you don't want to convert json strings into json
+            'max_parallel_scan_workers': 10,  # Maximum number of threads for scans with ``total_segments``
+            'rate_limit_to_capacity': True,  # Throttle calls to the provisioned capacity of tables. Default: False
+            'capacity_burst_seconds': 5,  # Seconds of unused capacity that may be spent at once. Default: 1
+            'backend': 'memory',  # Use the in-process MemoryDynamoDb instead of AWS. Default: boto3 client
         }
 
+    With ``rate_limit_to_capacity`` the client keeps a :class:`CapacityTokenBucket` for reads and writes of every
+    table with PROVISIONED billing mode. All the calls through the client request ``ReturnConsumedCapacity=TOTAL``,
+    wait for the capacity before the call and consume the real capacity reported by DynamoDB after it.
+    ON DEMAND (PAY_PER_REQUEST) tables are never throttled.
+
+    With ``'backend': 'memory'`` the client works with the shared in-process
+    :class:`~sosw.components.memory_dynamo_db.MemoryDynamoDb` instead of AWS. The ``backend`` may also be any object
+    with the API of the boto3 DynamoDB client, e.g. a separate instance of MemoryDynamoDb.
+
     """
 
+    # Default and maximum number of operations in one call of transact_write_items.
+    TRANSACT_WRITE_DEFAULT_ITEMS = 10
+    TRANSACT_WRITE_MAX_ITEMS = 100
+
+    _row_mapper: Optional[Dict] = None
+    _codec: Optional[RowMapperCodec] = None
+
 
     def __init__(self, config):
         assert isinstance(config, dict), "Config must be provided during DynamoDbClient initialization"
@@ -93,7 +294,14 @@ class DynamoDbClient:
         self.config = config
 
         # create a dynamodb client
-        self.dynamo_client = boto3.client('dynamodb', region_name=config.get('region_name'))
+        backend = config.get('backend')
+        if backend == 'memory':
+            from sosw.components.memory_dynamo_db import get_memory_dynamo_db
+            self.dynamo_client = get_memory_dynamo_db()
+        elif backend:
+            self.dynamo_client = backend
+        else:
+            self.dynamo_client = boto3.client('dynamodb', region_name=config.get('region_name'))
 
         # storage for table description(s)
         self._table_descriptions: Optional[Dict[str, Dict]] = {}
@@ -103,12 +311,52 @@ class DynamoDbClient:
         self.identify_dynamo_capacity(table_name=self.config['table_name'])
 
         self.stats = defaultdict(int)
-        if not hasattr(self, 'row_mapper'):
-            self.row_mapper = self.config.get('row_mapper')
-
+        # The client may be shared by threads, e.g. of the segmented scan or of ``TaskManager.invoke_tasks``.
+        self._stats_lock = threading.Lock()
         self.type_serializer = TypeSerializer()
         self.type_deserializer = TypeDeserializer()
 
+        if self.row_mapper is None:
+            self.row_mapper = self.config.get('row_mapper')
+
+        self._rate_limiters: Dict[Tuple[str, str], Optional[CapacityTokenBucket]] = {}
+        self._rate_limiters_lock = threading.Lock()
+
+
+    @property
+    def row_mapper(self) -> Optional[Dict]:
+        return self._row_mapper
+
+
+    @row_mapper.setter
+    def row_mapper(self, value: Optional[Dict]):
+        self._row_mapper = value
+        self.invalidate_codec()
+
+
+    @property
+    def codec(self) -> RowMapperCodec:
+        """
+        Compiled converter of rows from DynamoDB syntax to dictionaries for the ``row_mapper`` of the client.
+        Lazily compiled on the first use after the ``row_mapper`` is assigned.
+
+        ..  note:: If you modify the ``row_mapper`` or ``config['dont_json_loads_results']`` in place,
+                   call :meth:`invalidate_codec` to recompile it.
+        """
+
+        codec = self._codec
+        if codec is None:
+            codec = self._codec = RowMapperCodec(row_mapper=self.row_mapper,
+                                                 json_loads_results=not self.config.get('dont_json_loads_results'),
+                                                 type_deserializer=self.type_deserializer)
+        return codec
+
+
+    def invalidate_codec(self):
+        """ Drop the compiled ``codec``, the next conversion compiles it again from the current settings. """
+
+        self._codec = None
+
 
     def identify_dynamo_capacity(self, table_name=None):
         """
@@ -275,72 +523,14 @@ class DynamoDbClient:
             logger.warning("dynamo_to_dict ``strict`` variable is deprecated in sosw 0.7.13+. "
                            "Please replace it's usage with ``fetch_all_fields`` (and reverse the boolean value)")
         fetch_all_fields = fetch_all_fields if fetch_all_fields is not None else False if strict is None else not strict
-        result = {}
 
-        # Get fields from dynamo_row which are present in row mapper
-        if not fetch_all_fields:
-            for key, key_type in self.row_mapper.items():
-                val_dict = dynamo_row.get(key)  # Ex: {'N': "1234"} or {'S': "myvalue"}
-                if val_dict:
-                    val = val_dict.get(key_type)  # Ex: 1234 or "myvalue"
-
-                    if val is None and key_type not in val_dict:
-                        real_type = list(val_dict.keys())[0]
-                        raise ValueError(f"'{key}' is expected to be of type '{key_type}' in row_mapper, "
-                                         f"but real value is of type '{real_type}'")
-
-                    # type_deserializer.deserialize() parses 'N' to ``Decimal`` type but it cant be parsed to a datetime
-                    # so we cast it to either an integer or a float.
-                    if key_type == 'N':
-                        result[key] = float(val) if '.' in val else int(val)
-                    elif key_type == 'M':
-                        result[key] = self.dynamo_to_dict(val, fetch_all_fields=True)
-                    elif key_type == 'S':
-                        # Try to load to a dictionary if looks like JSON.
-                        if val.startswith('{') and val.endswith('}') and \
-                                not self.config.get('dont_json_loads_results'):
-                            try:
-                                result[key] = json.loads(val)
-                            except ValueError:
-                                logger.warning("A JSON-looking string failed to parse: %s", val)
-                                result[key] = val
-                        else:
-                            result[key] = val
-                    else:
-                        result[key] = self.type_deserializer.deserialize(val_dict)
-
-        # Get all fields from dynamo_row
-        else:
-            for key, val_dict in dynamo_row.items():
-                for val_type, val in val_dict.items():
-
-                    # type_deserializer.deserialize() parses 'N' to ``Decimal`` type but it cant be parsed to a datetime
-                    # so we cast it to either an integer or a float.
-                    if val_type == 'N':
-                        result[key] = float(val) if '.' in val else int(val)
-                    elif val_type == 'M':
-                        result[key] = self.dynamo_to_dict(val, fetch_all_fields=True)
-                    elif val_type == 'S':
-                        # Try to load to a dictionary if looks like JSON.
-                        if val.startswith('{') and val.endswith('}') and \
-                                not self.config.get('dont_json_loads_results'):
-                            try:
-                                result[key] = json.loads(val)
-                            except ValueError:
-                                logger.warning("A JSON-looking string failed to parse: %s", val)
-                                result[key] = val
-                        else:
-                            result[key] = val
-                    else:
-                        result[key] = self.type_deserializer.deserialize(val_dict)
-
-        assert all(True for x in self.config['required_fields'] if result.get(x)), "Some ``required_fields`` are missing"
-        return result
+        return self.codec.decode(dynamo_row, fetch_all_fields=fetch_all_fields)
 
 
     def dict_to_dynamo(self, row_dict, add_prefix=None, strict=True):
         """
         Convert the row from regular dictionary to the ugly DynamoDB syntax. Takes settings from row_mapper.
+        Unlike ``dynamo_to_dict`` it does not use the compiled ``codec``, the row_mapper is read on every call.
 
         e.g.                ``{'key1': 'value1', 'key2': 'value2'}``
         will convert to:    ``{'key1': {'Type1': 'value1'}, 'key2': {'Type2': 'value2'}}``
@@ -539,6 +729,11 @@ class DynamoDbClient:
             if return_count:
                 raise Exception(f"DynamoDbCLient.get_by_query does not support ``max_items`` and ``return_count`` together")
 
+            # Without filtering, every item read from the page is returned, so we do not read more than we need.
+            # With a filter expression the Limit applies before filtering, so we keep the default page size.
+            if not filter_expression:
+                query_args['PaginationConfig']['PageSize'] = max_items
+
         if desc:
             query_args['ScanIndexForward'] = False
 
@@ -554,22 +749,49 @@ class DynamoDbClient:
         For signature description see: query_constructor_
         """
 
-        query_args = self._query_constructor(keys=keys, **kwargs)
+        if kwargs.get('return_count'):
+            query_args = self._query_constructor(keys=keys, **kwargs)
+            return sum([page['Count'] for page in self._paginate('query', query_args)])
 
-        paginator = self.dynamo_client.get_paginator('query')
-        response_iterator = paginator.paginate(**query_args)
         result = []
+        for page in self.get_by_query_generator(keys, **kwargs):
+            result.extend(page)
+
+        return result
+
+
+    def get_by_query_generator(self, keys: Dict, **kwargs) -> Iterator[List[Dict]]:
+        """
+        Same as get_by_query, but yields the results page by page as soon as they are received and converted.
+        Use it for queries of many items to avoid keeping the whole result in memory.
+
+        Respects ``max_items``: the last page is truncated and no more pages are requested after it.
+        Does not support ``return_count``.
+
+        For signature description see: query_constructor_
+        """
 
         if kwargs.get('return_count'):
-            return sum([page['Count'] for page in response_iterator])
+            raise ValueError("DynamoDbClient.get_by_query_generator does not support ``return_count``. "
+                             "Use get_by_query instead.")
+
+        query_args = self._query_constructor(keys=keys, **kwargs)
+        max_items = kwargs.get('max_items')
+        fetch_all_fields = kwargs.get('fetch_all_fields')
 
+        response_iterator = self._paginate('query', query_args)
+
+        remaining = max_items
         for page in response_iterator:
-            result += [self.dynamo_to_dict(x, fetch_all_fields=kwargs.get('fetch_all_fields')) for x in page['Items']]
-            self.stats['dynamo_get_queries'] += 1
-            if kwargs.get('max_items') and len(result) >= kwargs.get('max_items'):
-                break
+            with self._stats_lock:
+                self.stats['dynamo_get_queries'] += 1
+            items = page['Items'] if not max_items else page['Items'][:remaining]
+            yield [self.dynamo_to_dict(x, fetch_all_fields=fetch_all_fields) for x in items]
 
-        return result[:kwargs.get('max_items')] if kwargs.get('max_items') else result
+            if max_items:
+                remaining -= len(items)
+                if remaining <= 0:
+                    break
 
 
     def _parse_filter_expression(self, expression: str) -> Tuple[str, Dict]:
@@ -619,7 +841,7 @@ class DynamoDbClient:
         return result_expr, result_values
 
     def get_by_scan(self, attrs=None, table_name=None, index_name=None, strict=None, fetch_all_fields=None,
-                    consistent_read=None):
+                    consistent_read=None, total_segments=None):
         """
         Scans a table. Don't use this method if you want to select by keys. It is SLOW compared to get_by_query.
         Careful - don't make queries of too many items, this could run for a long time.
@@ -632,6 +854,8 @@ class DynamoDbClient:
                If not specified also in the config, will scan the table itself without any index.
         :param bool consistent_read: If True , then the operation uses strongly consistent reads;
             otherwise, the operation uses eventually consistent reads. Default is False
+        :param int total_segments: If greater than 1, the table is scanned in this number of segments in parallel.
+            See get_by_scan_generator for details.
 
         :param bool strict: DEPRECATED.
         :param bool fetch_all_fields: If False, will only get the attributes specified in the row mapper.
@@ -640,22 +864,17 @@ class DynamoDbClient:
         :rtype: list
         """
 
-        if strict is not None:
-            logger.warning("get_by_query ``strict`` variable is deprecated in sosw 0.7.13+. "
-                           "Please replace it's usage with ``fetch_all_fields`` (and reverse the boolean value)")
-        fetch_all_fields = fetch_all_fields if fetch_all_fields is not None else False if strict is None else not strict
-
-        response_iterator = self._build_scan_iterator(attrs, table_name, index_name, consistent_read)
-
         result = []
-        for page in response_iterator:
-            result += [self.dynamo_to_dict(x, fetch_all_fields=fetch_all_fields) for x in page['Items']]
-            self.stats['dynamo_scan_queries'] += 1
+        for page in self.get_by_scan_generator(attrs=attrs, table_name=table_name, index_name=index_name,
+                                               strict=strict, fetch_all_fields=fetch_all_fields,
+                                               consistent_read=consistent_read, total_segments=total_segments):
+            result += page
 
         return result
 
+
     def get_by_scan_generator(self, attrs=None, table_name=None, index_name=None, strict=None, fetch_all_fields=None,
-                              consistent_read=None):
+                              consistent_read=None, total_segments=None):
         """
         Scans a table. Don't use this method if you want to select by keys. It is SLOW compared to get_by_query.
         Careful - don't make queries of too many items, this could run for a long time.
@@ -669,6 +888,9 @@ class DynamoDbClient:
                If not specified also in the config, will scan the table itself without any index.
         :param bool consistent_read: If True , then the operation uses strongly consistent reads;
                otherwise, the operation uses eventually consistent reads. Default uses this settings of boto3 (False).
+        :param int total_segments: If greater than 1, the table is split to this number of segments which are scanned
+               in parallel (``Segment`` / ``TotalSegments`` of the Scan). Pages are yielded in the order they arrive,
+               so the order of items is not guaranteed. See _scan_segments_in_parallel for details.
 
         :param bool strict: DEPRECATED.
         :param bool fetch_all_fields: If False, will only get the attributes specified in the row mapper.
@@ -682,13 +904,20 @@ class DynamoDbClient:
                            "Please replace it's usage with ``fetch_all_fields`` (and reverse the boolean value)")
         fetch_all_fields = fetch_all_fields if fetch_all_fields is not None else False if strict is None else not strict
 
-        response_iterator = self._build_scan_iterator(attrs, table_name, index_name, consistent_read)
+        if total_segments and total_segments > 1:
+            response_iterator = self._scan_segments_in_parallel(total_segments, attrs=attrs, table_name=table_name,
+                                                                index_name=index_name, consistent_read=consistent_read)
+        else:
+            response_iterator = self._build_scan_iterator(attrs, table_name, index_name, consistent_read)
+
         for page in response_iterator:
-            self.stats['dynamo_scan_queries'] += 1
+            with self._stats_lock:
+                self.stats['dynamo_scan_queries'] += 1
             yield [self.dynamo_to_dict(x, fetch_all_fields=fetch_all_fields) for x in page['Items']]
 
 
-    def _build_scan_iterator(self, attrs=None, table_name=None, index_name=None, consistent_read=None):
+    def _build_scan_iterator(self, attrs=None, table_name=None, index_name=None, consistent_read=None,
+                             segment=None, total_segments=None):
         table_name = self._get_validate_table_name(table_name)
 
         filter_values = None
@@ -722,12 +951,78 @@ class DynamoDbClient:
         if index_name:
             query_args['IndexName'] = index_name
 
+        if total_segments:
+            query_args['Segment'] = segment
+            query_args['TotalSegments'] = total_segments
+
         logger.debug("Scanning dynamo: %s", query_args)
 
-        paginator = self.dynamo_client.get_paginator('scan')
-        response_iterator = paginator.paginate(**query_args)
+        # Segments of a parallel scan always share the read capacity of the table.
+        return self._paginate('scan', query_args, force_rate_limit=bool(total_segments))
 
-        return response_iterator
+
+    def _scan_segments_in_parallel(self, total_segments: int, table_name: Optional[str] = None,
+                                   max_workers: Optional[int] = None, **kwargs) -> Iterator[Dict]:
+        """
+        Scans ``total_segments`` segments of the table concurrently in a pool of threads and yields the raw pages
+        of all the segments as soon as they arrive.
+
+        The number of threads is limited by ``max_workers`` or ``config['max_parallel_scan_workers']`` (default: 10).
+        For tables with PROVISIONED billing mode all the threads share the read :class:`CapacityTokenBucket`
+        of the table, so the scan consumes no more than the provisioned read capacity whatever the number of threads.
+        ON DEMAND (PAY_PER_REQUEST) tables are scanned without pauses.
+
+        Other ``kwargs`` are passed to ``_build_scan_iterator``.
+        """
+
+        table_name = self._get_validate_table_name(table_name)
+        max_workers = min(total_segments, max_workers or self.config.get('max_parallel_scan_workers', 10))
+
+        pages = queue.Queue(maxsize=2 * max_workers)
+        stop = threading.Event()
+        segment_done = object()
+
+
+        def put(item):
+            # Do not block forever if the consumer has already stopped reading pages.
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+
+        def scan_segment(segment):
+            try:
+                for page in self._build_scan_iterator(table_name=table_name, segment=segment,
+                                                      total_segments=total_segments, **kwargs):
+                    if stop.is_set():
+                        return
+                    put(page)
+            except Exception as err:
+                put(err)
+            finally:
+                put(segment_done)
+
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = [executor.submit(scan_segment, segment) for segment in range(total_segments)]
+        try:
+            finished = 0
+            while finished < total_segments:
+                item = pages.get()
+                if item is segment_done:
+                    finished += 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
 
 
     def batch_get_items_one_table(self, keys_list, table_name=None, max_retries=0, retry_wait_base_time=0.2,
@@ -792,7 +1087,8 @@ class DynamoDbClient:
                 batch_get_item_query['RequestItems'][table_name]['ConsistentRead'] = consistent_read
 
             logger.debug("batch_get_item query: %s", batch_get_item_query)
-            latest_result = self.dynamo_client.batch_get_item(**batch_get_item_query)
+            latest_result = self._call_with_capacity(self.dynamo_client.batch_get_item, 'read', [table_name],
+                                                     **batch_get_item_query)
             logger.debug("latest_result: %s", latest_result)
             unprocessed_keys = get_unprocessed_keys(latest_result)
             all_items += latest_result['Responses'][table_name]
@@ -806,7 +1102,8 @@ class DynamoDbClient:
                     logger.warning("batch_get_item action did NOT finish successfully.")
                     time.sleep(wait_time)
                     batch_get_item_query['RequestItems'][table_name]['Keys'] = unprocessed_keys
-                    latest_result = self.dynamo_client.batch_get_item(**batch_get_item_query)
+                    latest_result = self._call_with_capacity(self.dynamo_client.batch_get_item, 'read', [table_name],
+                                                             **batch_get_item_query)
                     logger.debug("latest_result: %s", latest_result)
                     all_items += latest_result['Responses'][table_name]
                     retry_num += 1
@@ -870,11 +1167,12 @@ class DynamoDbClient:
         put_query = self.build_put_query(row, table_name, overwrite_existing)
         logger.debug("Put to DB: %s", put_query)
 
-        dynamo_response = self.dynamo_client.put_item(**put_query)
+        dynamo_response = self._call_with_capacity(self.dynamo_client.put_item, 'write', [table_name], **put_query)
 
         logger.debug("Response from dynamo %s", dynamo_response)
 
-        self.stats['dynamo_put_queries'] += 1
+        with self._stats_lock:
+            self.stats['dynamo_put_queries'] += 1
 
 
     def create(self, row: Dict, table_name: str = None):
@@ -970,9 +1268,11 @@ class DynamoDbClient:
                 update_item_query['ExpressionAttributeValues'].update(values)
 
         logger.debug("Updating an item, query: %s", update_item_query)
-        response = self.dynamo_client.update_item(**update_item_query)
+        response = self._call_with_capacity(self.dynamo_client.update_item, 'write', [table_name],
+                                            **update_item_query)
         logger.debug("Update result: %s", response)
-        self.stats['dynamo_update_queries'] += 1
+        with self._stats_lock:
+            self.stats['dynamo_update_queries'] += 1
 
 
     def patch(self, keys: Dict, attributes_to_update: Optional[Dict] = None,
@@ -998,7 +1298,7 @@ class DynamoDbClient:
         """
 
         query = self.build_delete_query(keys, table_name)
-        self.dynamo_client.delete_item(**query)
+        self._call_with_capacity(self.dynamo_client.delete_item, 'write', [query['TableName']], **query)
 
 
     def make_put_transaction_item(self, row, table_name=None):
@@ -1009,11 +1309,14 @@ class DynamoDbClient:
         return {'Delete': self.build_delete_query(row, table_name)}
 
 
-    def transact_write(self, *transactions: Dict):
+    def transact_write(self, *transactions: Dict, max_items_per_transaction: Optional[int] = None):
         """
         Executes many write transaction. Can execute operations on different tables.
-        Will split transactions to chunks - because transact_write_items accepts up to 10 actions.
-        WARNING: If you're expecting a transaction on more than 10 operations - AWS DynamoDB doesn't support it.
+        Will split transactions to chunks of ``max_items_per_transaction`` operations
+        (default: ``TRANSACT_WRITE_DEFAULT_ITEMS``, maximum: ``TRANSACT_WRITE_MAX_ITEMS``, the limit
+        of transact_write_items). Only the operations within the same chunk are atomic. Bigger chunks make fewer
+        calls, but the whole chunk must also fit the 4 MB limit of the request.
+        WARNING: If you're expecting a transaction on more than 100 operations - AWS DynamoDB doesn't support it.
 
         ..  code-block:: python
 
@@ -1034,15 +1337,116 @@ class DynamoDbClient:
             assert isinstance(t[action], dict), f"transaction[{action}] must be a dictionary. bad type: " \
                                                 f"{type(t[action])}"
 
-        for t_chunk in chunks(transactions, 10):
+        chunk_size = min(max_items_per_transaction or self.TRANSACT_WRITE_DEFAULT_ITEMS, self.TRANSACT_WRITE_MAX_ITEMS)
+
+        for t_chunk in chunks(transactions, chunk_size):
             logger.debug("Transactions: %s", t_chunk)
 
-            response = self.dynamo_client.transact_write_items(TransactItems=t_chunk)
+            table_names = [list(t.values())[0]['TableName'] for t in t_chunk]
+            response = self._call_with_capacity(self.dynamo_client.transact_write_items, 'write', table_names,
+                                                TransactItems=t_chunk)
 
-            self.stats['dynamo_transact_write_operations'] += 1
+            with self._stats_lock:
+                self.stats['dynamo_transact_write_operations'] += 1
             logger.debug("Response from transact_write_items: %s", response)
 
 
+    def batch_write_items(self, *items: Dict, max_retries: int = 5, retry_wait_base_time: float = 0.05):
+        """
+        Executes many write operations with BatchWriteItem. Can execute operations on different tables.
+        Accepts the same items as ``transact_write`` (made by ``make_put_transaction_item`` and
+        ``make_delete_transaction_item``), but the operations are **not** atomic and do not support conditions.
+
+        Items are split to chunks of 25 (the limit of BatchWriteItem). The ``UnprocessedItems`` returned by DynamoDB
+        are retried up to ``max_retries`` times with exponential backoff and full jitter:
+        a random pause between 0 and ``retry_wait_base_time * 2 ** retry_number`` seconds.
+
+        ..  code-block:: python
+
+            dynamo_db_client = DynamoDbClient(config)
+            items = [dynamo_db_client.make_put_transaction_item(row, table_name='table1') for row in rows]
+            items.append(dynamo_db_client.make_delete_transaction_item(keys, table_name='table2'))
+            dynamo_db_client.batch_write_items(*items)
+
+        ..  warning:: A single chunk must not contain several operations on the same item.
+
+        :raises RuntimeError: If some items are still unprocessed after all the retries.
+        """
+
+        supported_actions = {'Put': 'PutRequest', 'Delete': 'DeleteRequest'}
+        for item in items:
+            assert isinstance(item, dict), "item must be a dictionary"
+            assert len(item) == 1, "one item must contain only one operation"
+            action = list(item.keys())[0]
+            assert action in supported_actions, f"Bad action '{action}'. " \
+                                                f"Supported actions: {', '.join(supported_actions)}"
+            assert 'ConditionExpression' not in item[action], "BatchWriteItem does not support conditions"
+
+        for items_chunk in chunks(items, 25):
+
+            request_items = defaultdict(list)
+            for item in items_chunk:
+                action, query = list(item.items())[0]
+                request = {k: v for k, v in query.items() if k != 'TableName'}
+                request_items[query['TableName']].append({supported_actions[action]: request})
+
+            retry_num = 0
+            while request_items:
+                logger.debug("batch_write_item query: %s", request_items)
+                response = self._call_with_capacity(self.dynamo_client.batch_write_item, 'write', request_items,
+                                                    RequestItems=dict(request_items))
+                logger.debug("Response from batch_write_item: %s", response)
+                with self._stats_lock:
+                    self.stats['dynamo_batch_write_operations'] += 1
+
+                request_items = response.get('UnprocessedItems')
+                if not request_items:
+                    break
+
+                if retry_num >= max_retries:
+                    raise RuntimeError(f"batch_write_items failed after {max_retries} retries. "
+                                       f"Unprocessed items: {request_items}")
+
+                logger.warning("batch_write_item action did NOT finish successfully. Retry #%s", retry_num + 1)
+                with self._stats_lock:
+                    self.stats['dynamo_batch_write_retries'] += 1
+                time.sleep(random.uniform(0, retry_wait_base_time * 2 ** retry_num))
+                retry_num += 1
+
+
+    def batch_put(self, rows: List[Dict], table_name: Optional[str] = None, **kwargs):
+        """
+        Writes the rows to the DynamoDB table with BatchWriteItem: one API call per 25 rows.
+        Existing rows with the same keys are overwritten.
+
+        For the retry settings in ``kwargs`` see ``batch_write_items``.
+
+        :param rows:        The rows to add to the table. key is column name, value is value.
+        :param table_name:  Name of the dynamo table to add the rows to.
+        """
+
+        table_name = self._get_validate_table_name(table_name)
+        self.batch_write_items(*[self.make_put_transaction_item(row, table_name) for row in rows], **kwargs)
+        with self._stats_lock:
+            self.stats['dynamo_batch_put_items'] += len(rows)
+
+
+    def batch_delete(self, keys_list: List[Dict], table_name: Optional[str] = None, **kwargs):
+        """
+        Deletes the rows from the DynamoDB table with BatchWriteItem: one API call per 25 rows.
+
+        For the retry settings in ``kwargs`` see ``batch_write_items``.
+
+        :param keys_list:   List of keys and values of the rows we delete.
+        :param table_name:  Name of the dynamo table.
+        """
+
+        table_name = self._get_validate_table_name(table_name)
+        self.batch_write_items(*[self.make_delete_transaction_item(keys, table_name) for keys in keys_list], **kwargs)
+        with self._stats_lock:
+            self.stats['dynamo_batch_delete_items'] += len(keys_list)
+
+
     def _get_validate_table_name(self, table_name=None):
         if table_name is None:
             table_name = self.config.get('table_name')
@@ -1088,12 +1492,127 @@ class DynamoDbClient:
             return self._table_capacity[table_name]
 
 
+    def get_rate_limiter(self, action: str, table_name: Optional[str] = None,
+                         force: bool = False) -> Optional[CapacityTokenBucket]:
+        """
+        Returns the :class:`CapacityTokenBucket` shared by all the calls of this client to the table.
+
+        Rate limiting is enabled with ``config['rate_limit_to_capacity']`` or ``force``. The burst of the bucket is
+        ``config['capacity_burst_seconds']`` (default: 1) seconds of the provisioned capacity.
+
+        :param action:      "read" or "write"
+        :param table_name:  Name of the table. Default: from config.
+        :param force:       Return the bucket even if rate limiting is not enabled in config.
+        :return:            The bucket or None if rate limiting is disabled or the table is ON DEMAND (PAY_PER_REQUEST).
+        """
+
+        if not force and not self.config.get('rate_limit_to_capacity'):
+            return None
+
+        table_name = self._get_validate_table_name(table_name)
+
+        with self._rate_limiters_lock:
+            if (table_name, action) not in self._rate_limiters:
+                table_capacity = self.get_capacity(table_name=table_name)
+                capacity = table_capacity[action] if table_capacity else None
+                self._rate_limiters[(table_name, action)] = CapacityTokenBucket(
+                    rate=capacity, burst=capacity * self.config.get('capacity_burst_seconds', 1)) if capacity else None
+
+            return self._rate_limiters[(table_name, action)]
+
+
+    def _wait_for_capacity(self, *limiters: CapacityTokenBucket):
+        for limiter in limiters:
+            slept = limiter.wait()
+            if slept:
+                with self._stats_lock:
+                    self.stats['dynamo_capacity_wait_time'] += slept
+
+
+    def _consume_capacity(self, consumed_capacity: Union[Dict, List[Dict], None], action: str,
+                          limiters: Dict[str, CapacityTokenBucket]):
+        """
+        Consumes the ``ConsumedCapacity`` from the response of DynamoDB in the buckets of corresponding tables.
+        If DynamoDB did not report it for some table, assumes a single capacity unit.
+        """
+
+        if isinstance(consumed_capacity, dict):
+            consumed_capacity = [consumed_capacity]
+
+        reported = {}
+        for entry in consumed_capacity if isinstance(consumed_capacity, list) else []:
+            reported[entry.get('TableName')] = float(entry.get('CapacityUnits', 0))
+
+        # Queries and scans report a single entry. It belongs to the only table of the call.
+        if len(limiters) == 1 and len(reported) == 1:
+            reported = {list(limiters)[0]: list(reported.values())[0]}
+
+        for table_name, limiter in limiters.items():
+            units = reported.get(table_name, 1.0)
+            limiter.consume(units)
+            with self._stats_lock:
+                self.stats[f"dynamo_consumed_{action}_capacity"] += units
+
+
+    def _call_with_capacity(self, api_method, action: str, table_names: Iterable[str], **query) -> Dict:
+        """
+        Calls the ``api_method`` of boto3 client with the ``query``. If rate limiting is enabled, waits for capacity
+        of all the ``table_names`` involved, requests ``ReturnConsumedCapacity`` and consumes it after the call.
+        """
+
+        limiters = {t: self.get_rate_limiter(action, table_name=t) for t in set(table_names)}
+        limiters = {t: limiter for t, limiter in limiters.items() if limiter}
+
+        if not limiters:
+            return api_method(**query)
+
+        self._wait_for_capacity(*limiters.values())
+        response = api_method(ReturnConsumedCapacity='TOTAL', **query)
+        self._consume_capacity(response.get('ConsumedCapacity'), action, limiters)
+
+        return response
+
+
+    def _paginate(self, operation: str, query_args: Dict, force_rate_limit: bool = False) -> Iterator[Dict]:
+        """
+        Returns the iterator over pages of the ``operation`` ('query' or 'scan') of boto3 paginator.
+        If rate limiting is enabled (or forced), waits for read capacity of the table before requesting every page
+        and consumes the ``ConsumedCapacity`` of every received page.
+        """
+
+        limiter = self.get_rate_limiter('read', table_name=query_args['TableName'], force=force_rate_limit)
+        if limiter:
+            query_args = {**query_args, 'ReturnConsumedCapacity': 'TOTAL'}
+
+        paginator = self.dynamo_client.get_paginator(operation)
+        response_iterator = paginator.paginate(**query_args)
+
+        if not limiter:
+            return response_iterator
+
+        return self._rate_limited_pages(response_iterator, limiter, query_args['TableName'])
+
+
+    def _rate_limited_pages(self, response_iterator, limiter: CapacityTokenBucket, table_name: str) -> Iterator[Dict]:
+        self._wait_for_capacity(limiter)
+        for page in response_iterator:
+            self._consume_capacity(page.get('ConsumedCapacity'), 'read', {table_name: limiter})
+            yield page
+
+            # The next page is requested only when the consumer asks for it.
+            if page.get('LastEvaluatedKey'):
+                self._wait_for_capacity(limiter)
+
+
     def sleep_db(self, last_action_time: datetime.datetime, action: str, table_name=None):
         """
         Sleeps between calls to dynamodb (if it needs to).
         Uses the table's capacity to decide how long it needs to sleep.
         No need to sleep for ON DEMAND (PAY_PER_REQUEST) tables.
 
+        ..  warning:: DEPRECATED. Assumes that every call consumes exactly one capacity unit.
+                      Use ``config['rate_limit_to_capacity']`` instead, see :meth:`get_rate_limiter`.
+
         :param last_action_time: Last time when we did this action (read/write) to this dynamo table
         :param action: "read" or "write"
         """
@@ -815,7 +815,7 @@ def recursive_update(d: Dict, u: Mapping) -> Dict:
 
     for k, v in u.items():
         if isinstance(v, abc.Mapping) and isinstance(d.get(k), (abc.Mapping, type(None))):
-            new[k] = recursive_update(d.get(k, {}), v)
+            new[k] = recursive_update(d.get(k) or {}, v)
 
         elif isinstance(v, (set, list, tuple)):
             if isinstance(d.get(k), (set, list, tuple)):
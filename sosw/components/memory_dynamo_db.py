@@ -0,0 +1,1024 @@
+"""
+..  hidden-code-block:: text
+    :label: View Licence Agreement <br>
+
+    sosw - Serverless Orchestrator of Serverless Workers
+
+    The MIT License (MIT)
+    Copyright (C) 2024  sosw core contributors <info@sosw.app>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+
+__all__ = ['MemoryDynamoDb', 'get_memory_dynamo_db', 'SOSW_TABLES']
+__author__ = "Nikolay Grishchenko"
+__version__ = "1.0"
+
+try:
+    from aws_lambda_powertools import Logger
+
+    logger = Logger(child=True)
+
+except ImportError:
+    import logging
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+import bisect
+import json
+import math
+import re
+import threading
+import zlib
+
+from collections import defaultdict
+from copy import deepcopy
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from sosw.components.dynamo_db import CapacityTokenBucket
+
+
+# Schemas of the tables used by the Essentials. Same as in examples/yaml/initial/sosw-dev-shared-dynamodb.yaml
+SOSW_TABLES = {
+    'sosw_tasks':                  {
+        'KeySchema':              [{'AttributeName': 'task_id', 'KeyType': 'HASH'}],
+        'GlobalSecondaryIndexes': [{
+            'IndexName':  'sosw_tasks_greenfield',
+            'KeySchema':  [{'AttributeName': 'labourer_id', 'KeyType': 'HASH'},
+                           {'AttributeName': 'greenfield', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    },
+    'sosw_closed_tasks':           {
+        'KeySchema':              [{'AttributeName': 'task_id', 'KeyType': 'HASH'}],
+        'GlobalSecondaryIndexes': [{
+            'IndexName':  'labourer_task_status_with_time',
+            'KeySchema':  [{'AttributeName': 'labourer_id_task_status', 'KeyType': 'HASH'},
+                           {'AttributeName': 'closed_at', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': ['completed_at', 'greenfield', 'attempts']},
+        }],
+    },
+    'sosw_retry_tasks':            {
+        'KeySchema':             [{'AttributeName': 'labourer_id', 'KeyType': 'HASH'},
+                                  {'AttributeName': 'task_id', 'KeyType': 'RANGE'}],
+        'LocalSecondaryIndexes': [{
+            'IndexName':  'labourer_id_greenfield',
+            'KeySchema':  [{'AttributeName': 'labourer_id', 'KeyType': 'HASH'},
+                           {'AttributeName': 'desired_launch_time', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+    },
+    'sosw_tasks_meta':             {
+        'KeySchema': [{'AttributeName': 'task_id', 'KeyType': 'HASH'},
+                      {'AttributeName': 'created_at', 'KeyType': 'RANGE'}],
+    },
+    'sosw_running_tasks_counters': {
+        'KeySchema': [{'AttributeName': 'labourer_id', 'KeyType': 'HASH'}],
+    },
+    'config':                      {
+        'KeySchema': [{'AttributeName': 'env', 'KeyType': 'HASH'},
+                      {'AttributeName': 'config_name', 'KeyType': 'RANGE'}],
+    },
+}
+
+# Max size of data read by a single Query or Scan call.
+PAGE_MAX_BYTES = 1024 * 1024
+
+TOKEN_RE = re.compile(r"\s*(<>|<=|>=|[=<>(),+\-\[\]]|:[\w\-]+|#[\w\-]+|[A-Za-z_][\w\-]*(?:\.[A-Za-z_][\w\-]*)*)")
+
+_type_deserializer = TypeDeserializer()
+
+
+def _client_error(code: str, message: str, operation: str, **extra) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message}, **extra}, operation)
+
+
+def _python_value(value: Optional[Dict]):
+    """ Comparable Python value of the DynamoDB formatted ``value``. """
+
+    if value is None:
+        return None
+
+    value_type, raw = next(iter(value.items()))
+    if value_type == 'S':
+        return raw
+    if value_type == 'N':
+        return Decimal(raw)
+
+    return _type_deserializer.deserialize(value)
+
+
+def _item_size(item: Dict) -> int:
+    """ Approximate size of the item in bytes, like the one DynamoDB uses for capacity units. """
+    return len(json.dumps(item, sort_keys=True, default=str))
+
+
+def _format_number(value: Decimal) -> str:
+    return str(value.normalize()) if value == value.to_integral_value() and 'E' not in str(value) \
+        else format(value, 'f')
+
+
+class _Expression:
+    """
+    Tiny parser of DynamoDB expressions: ``ConditionExpression``, ``FilterExpression``, ``KeyConditionExpression``
+    and ``UpdateExpression``. Only top level attributes are supported.
+    """
+
+    def __init__(self, expression: str, names: Optional[Dict] = None, values: Optional[Dict] = None):
+        self.names = names or {}
+        self.values = values or {}
+        self.tokens = []
+
+        position = 0
+        expression = expression.strip()
+        while position < len(expression):
+            match = TOKEN_RE.match(expression, position)
+            if not match:
+                raise _client_error('ValidationException', f"Invalid expression: {expression}", 'Expression')
+            self.tokens.append(match.group(1))
+            position = match.end()
+
+        self.position = 0
+
+
+    def peek(self, upper: bool = False) -> Optional[str]:
+        token = self.tokens[self.position] if self.position < len(self.tokens) else None
+        return token.upper() if upper and token else token
+
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected and token.upper() != expected.upper()):
+            raise _client_error('ValidationException', f"Expected {expected} at {token} in: {' '.join(self.tokens)}",
+                                'Expression')
+        self.position += 1
+        return token
+
+
+    def parse_condition(self):
+        node = self._or()
+        if self.peek() is not None:
+            raise _client_error('ValidationException', f"Unexpected token {self.peek()}", 'Expression')
+        return node
+
+
+    def _or(self):
+        node = self._and()
+        while self.peek(upper=True) == 'OR':
+            self.take()
+            node = ('or', node, self._and())
+        return node
+
+
+    def _and(self):
+        node = self._not()
+        while self.peek(upper=True) == 'AND':
+            self.take()
+            node = ('and', node, self._not())
+        return node
+
+
+    def _not(self):
+        if self.peek(upper=True) == 'NOT':
+            self.take()
+            return 'not', self._not()
+        return self._primary()
+
+
+    def _primary(self):
+        if self.peek() == '(':
+            self.take('(')
+            node = self._or()
+            self.take(')')
+            return node
+
+        if self.peek(upper=True) in ('ATTRIBUTE_EXISTS', 'ATTRIBUTE_NOT_EXISTS', 'BEGINS_WITH', 'CONTAINS'):
+            name = self.take().lower()
+            self.take('(')
+            args = [self._operand()]
+            while self.peek() == ',':
+                self.take(',')
+                args.append(self._operand())
+            self.take(')')
+            return 'func', name, args
+
+        left = self._operand()
+        operator = self.peek(upper=True)
+
+        if operator == 'BETWEEN':
+            self.take()
+            low = self._operand()
+            self.take('AND')
+            return 'between', left, low, self._operand()
+
+        if operator == 'IN':
+            self.take()
+            self.take('(')
+            options = [self._operand()]
+            while self.peek() == ',':
+                self.take(',')
+                options.append(self._operand())
+            self.take(')')
+            return 'in', left, options
+
+        if operator in ('=', '<>', '<', '<=', '>', '>='):
+            self.take()
+            return 'cmp', operator, left, self._operand()
+
+        raise _client_error('ValidationException', f"Unsupported operator {operator}", 'Expression')
+
+
+    def _operand(self):
+        token = self.take()
+
+        if token.startswith(':'):
+            if token not in self.values:
+                raise _client_error('ValidationException', f"Missing value {token}", 'Expression')
+            return 'value', self.values[token]
+
+        if token.upper() in ('IF_NOT_EXISTS', 'LIST_APPEND') and self.peek() == '(':
+            self.take('(')
+            first = self._operand()
+            self.take(',')
+            second = self._operand()
+            self.take(')')
+            return token.lower(), first, second
+
+        return 'path', self.names.get(token, token)
+
+
+    def parse_update(self) -> List[Tuple]:
+        """ :return: List of actions: ``('SET', name, value_node)``, ``('REMOVE', name)``, ``('ADD', name, value)`` """
+
+        actions = []
+        while self.peek() is not None:
+            clause = self.take().upper()
+            if clause not in ('SET', 'REMOVE', 'ADD', 'DELETE'):
+                raise _client_error('ValidationException', f"Invalid UpdateExpression clause {clause}", 'Expression')
+
+            while True:
+                name = self._operand()[1]
+                if clause == 'SET':
+                    self.take('=')
+                    node = self._operand()
+                    if self.peek() in ('+', '-'):
+                        node = (self.take(), node, self._operand())
+                    actions.append(('SET', name, node))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', name))
+                else:
+                    actions.append((clause, name, self._operand()))
+
+                if self.peek() != ',':
+                    break
+                self.take(',')
+
+        return actions
+
+
+def _evaluate_operand(node, item: Dict) -> Optional[Dict]:
+    kind = node[0]
+
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return item.get(node[1])
+    if kind == 'if_not_exists':
+        return _evaluate_operand(node[1], item) or _evaluate_operand(node[2], item)
+    if kind == 'list_append':
+        return {'L': _evaluate_operand(node[1], item)['L'] + _evaluate_operand(node[2], item)['L']}
+    if kind in ('+', '-'):
+        left, right = _python_value(_evaluate_operand(node[1], item)), _python_value(_evaluate_operand(node[2], item))
+        if not isinstance(left, Decimal) or not isinstance(right, Decimal):
+            raise _client_error('ValidationException', "Arithmetic is supported only for numbers", 'UpdateItem')
+        return {'N': _format_number(left + right if kind == '+' else left - right)}
+
+    raise ValueError(f"Unsupported operand {node}")
+
+
+def _evaluate_condition(node, item: Dict) -> bool:
+    kind = node[0]
+
+    if kind == 'or':
+        return _evaluate_condition(node[1], item) or _evaluate_condition(node[2], item)
+    if kind == 'and':
+        return _evaluate_condition(node[1], item) and _evaluate_condition(node[2], item)
+    if kind == 'not':
+        return not _evaluate_condition(node[1], item)
+
+    if kind == 'func':
+        name, args = node[1], node[2]
+        if name == 'attribute_exists':
+            return args[0][1] in item
+        if name == 'attribute_not_exists':
+            return args[0][1] not in item
+
+        value, argument = _python_value(_evaluate_operand(args[0], item)), _python_value(_evaluate_operand(args[1], item))
+        if name == 'begins_with':
+            return isinstance(value, (str, bytes)) and type(value) is type(argument) and value.startswith(argument)
+        return value is not None and argument in value
+
+    if kind == 'between':
+        value, low, high = [_python_value(_evaluate_operand(x, item)) for x in node[1:]]
+        try:
+            return value is not None and low <= value <= high
+        except TypeError:
+            return False
+
+    if kind == 'in':
+        value = _python_value(_evaluate_operand(node[1], item))
+        return value is not None and value in [_python_value(_evaluate_operand(x, item)) for x in node[2]]
+
+    operator, left, right = node[1], _python_value(_evaluate_operand(node[2], item)), \
+                            _python_value(_evaluate_operand(node[3], item))
+
+    if left is None or right is None:
+        return operator == '<>' and (left is None) != (right is None)
+
+    try:
+        return {
+            '=':  lambda a, b: a == b,
+            '<>': lambda a, b: a != b,
+            '<':  lambda a, b: a < b,
+            '<=': lambda a, b: a <= b,
+            '>':  lambda a, b: a > b,
+            '>=': lambda a, b: a >= b,
+        }[operator](left, right)
+    except TypeError:
+        # Values of different types are never equal or comparable in DynamoDB.
+        return operator == '<>'
+
+
+def _find_equality(node, name: str) -> Optional[Dict]:
+    """ Value of the ``name = :value`` condition from the top level AND chain of the key condition. """
+
+    if node[0] == 'and':
+        return _find_equality(node[1], name) or _find_equality(node[2], name)
+    if node[0] == 'cmp' and node[1] == '=' and node[2] == ('path', name) and node[3][0] == 'value':
+        return node[3][1]
+
+
+class _Table:
+
+    def __init__(self, name: str, key_schema: List[Dict], indexes: List[Dict], provisioned_throughput: Optional[Dict],
+                 description: Dict):
+        self.name = name
+        self.hash_key, self.range_key = self.get_keys(key_schema)
+        self.indexes = {x['IndexName']: x for x in indexes}
+        self.provisioned_throughput = provisioned_throughput
+        self.description = description
+
+        # Items by the serialized primary key. The table and every index keep the keys of their items sorted
+        # by ``get_sort_key()``: by partition for Query and all together for Scan. Pages are read by bisection.
+        self.items: Dict[str, Dict] = {}
+        self.partitions: Dict[Optional[str], Dict[str, List[Tuple]]] = defaultdict(lambda: defaultdict(list))
+        self.scan_order: Dict[Optional[str], List[Tuple]] = defaultdict(list)
+
+
+    @staticmethod
+    def get_keys(key_schema: List[Dict]) -> Tuple[str, Optional[str]]:
+        hash_key = next(x['AttributeName'] for x in key_schema if x['KeyType'] == 'HASH')
+        range_key = next((x['AttributeName'] for x in key_schema if x['KeyType'] == 'RANGE'), None)
+        return hash_key, range_key
+
+
+    def get_index_keys(self, index_name: Optional[str]) -> Tuple[str, Optional[str]]:
+        if index_name is None:
+            return self.hash_key, self.range_key
+
+        if index_name not in self.indexes:
+            raise _client_error('ValidationException', f"Table {self.name} has no index {index_name}", 'Query')
+        return self.get_keys(self.indexes[index_name]['KeySchema'])
+
+
+    def get_primary_key(self, item: Dict) -> Dict:
+        key = {self.hash_key: item[self.hash_key]}
+        if self.range_key:
+            key[self.range_key] = item[self.range_key]
+        return key
+
+
+    def serialize_key(self, key: Dict) -> str:
+        if self.hash_key not in key or (self.range_key and self.range_key not in key):
+            raise _client_error('ValidationException', f"The provided key does not match the schema of {self.name}",
+                                'GetItem')
+        return json.dumps(self.get_primary_key(key), sort_keys=True)
+
+
+    def get_sort_key(self, index_name: Optional[str], item: Dict, key: Optional[str] = None) -> Tuple:
+        """
+        Order of items in the table or index: by the range key of it and then by the serialized primary key.
+        Also works for the ``ExclusiveStartKey`` that has the key attributes of the item.
+        """
+
+        range_key = self.get_index_keys(index_name)[1]
+        return (_python_value(item.get(range_key)) if range_key else 0, key or self.serialize_key(item))
+
+
+    def put(self, item: Dict):
+        key = self.serialize_key(item)
+        self.delete(key)
+        self.items[key] = item
+
+        for index_name in [None, *self.indexes]:
+            hash_key, range_key = self.get_index_keys(index_name)
+            # Indexes are sparse: items without the keys of the index are not in the index.
+            if hash_key in item and (range_key is None or range_key in item):
+                sort_key = self.get_sort_key(index_name, item, key)
+                bisect.insort(self.partitions[index_name][json.dumps(item[hash_key], sort_keys=True)], sort_key)
+                bisect.insort(self.scan_order[index_name], sort_key)
+
+
+    def delete(self, key: str) -> Optional[Dict]:
+        item = self.items.pop(key, None)
+        if item is not None:
+            for index_name in [None, *self.indexes]:
+                hash_key, range_key = self.get_index_keys(index_name)
+                if hash_key in item and (range_key is None or range_key in item):
+                    sort_key = self.get_sort_key(index_name, item, key)
+                    for entries in (self.partitions[index_name][json.dumps(item[hash_key], sort_keys=True)],
+                                    self.scan_order[index_name]):
+                        position = bisect.bisect_left(entries, sort_key)
+                        if position < len(entries) and entries[position] == sort_key:
+                            del entries[position]
+        return item
+
+
+    def project(self, item: Dict, index_name: Optional[str]) -> Dict:
+        if index_name is None:
+            return item
+
+        projection = self.indexes[index_name].get('Projection', {'ProjectionType': 'ALL'})
+        if projection['ProjectionType'] == 'ALL':
+            return item
+
+        attributes = {self.hash_key, self.range_key, *self.get_index_keys(index_name)}
+        if projection['ProjectionType'] == 'INCLUDE':
+            attributes.update(projection.get('NonKeyAttributes', []))
+        return {k: v for k, v in item.items() if k in attributes}
+
+
+class MemoryDynamoDb:
+    """
+    In-process stand-in for the low level boto3 DynamoDB client. Implements the subset of the API used by
+    :class:`DynamoDbClient`: ``describe_table``, ``get_item``, ``put_item``, ``update_item``, ``delete_item``,
+    ``batch_get_item``, ``batch_write_item``, ``transact_write_items`` and paginators of ``query`` and ``scan``
+    with key conditions, filter / condition / update expressions, global and local secondary indexes.
+
+    This is a supported backend of DynamoDbClient for local development, tests and benchmarks of the Essentials
+    without AWS. The data is not shared between processes. Point a DynamoDbClient to the shared instance
+    with ``'backend': 'memory'`` in its config. The tables must be created first:
+
+    ..  code-block:: python
+
+        backend = get_memory_dynamo_db()
+        backend.create_sosw_tables()
+        backend.create_table(TableName='my_table', KeySchema=[{'AttributeName': 'hash_col', 'KeyType': 'HASH'}])
+
+        dynamo_db_client = DynamoDbClient(config={'backend': 'memory', 'table_name': 'my_table', ...})
+
+    With ``simulate_throttling`` the tables with ``ProvisionedThroughput`` accept calls only while they have
+    capacity (refilled every second up to ``burst_seconds`` of the provisioned capacity). Otherwise they raise
+    ``ProvisionedThroughputExceededException`` or return unprocessed items / keys for batch calls, as DynamoDB does.
+    """
+
+    def __init__(self, simulate_throttling: bool = False, burst_seconds: float = 1):
+        self.simulate_throttling = simulate_throttling
+        self.burst_seconds = burst_seconds
+
+        self.tables: Dict[str, _Table] = {}
+        self.stats = defaultdict(int)
+
+        self._capacity: Dict[Tuple[str, str], CapacityTokenBucket] = {}
+        self._lock = threading.RLock()
+
+
+    def reset(self):
+        """ Drop all the tables and stats. """
+
+        with self._lock:
+            self.tables = {}
+            self.stats = defaultdict(int)
+            self._capacity = {}
+
+
+    def create_table(self, TableName: str, KeySchema: List[Dict], AttributeDefinitions: Optional[List[Dict]] = None,
+                     GlobalSecondaryIndexes: Optional[List[Dict]] = None,
+                     LocalSecondaryIndexes: Optional[List[Dict]] = None, BillingMode: Optional[str] = None,
+                     ProvisionedThroughput: Optional[Dict] = None, **kwargs) -> Dict:
+        """ Same arguments as ``create_table`` of boto3. ``AttributeDefinitions`` are not validated. """
+
+        with self._lock:
+            if TableName in self.tables:
+                raise _client_error('ResourceInUseException', f"Table already exists: {TableName}", 'CreateTable')
+
+            if BillingMode == 'PAY_PER_REQUEST':
+                ProvisionedThroughput = None
+
+            description = {
+                'TableName':            TableName,
+                'TableStatus':          'ACTIVE',
+                'KeySchema':            deepcopy(KeySchema),
+                'AttributeDefinitions': deepcopy(AttributeDefinitions or []),
+                'BillingModeSummary':   {'BillingMode': 'PROVISIONED' if ProvisionedThroughput else 'PAY_PER_REQUEST'},
+            }
+            if ProvisionedThroughput:
+                description['ProvisionedThroughput'] = {k: v for k, v in ProvisionedThroughput.items()
+                                                        if k in ('ReadCapacityUnits', 'WriteCapacityUnits')}
+            if GlobalSecondaryIndexes:
+                description['GlobalSecondaryIndexes'] = [{**deepcopy(x), 'IndexStatus': 'ACTIVE'}
+                                                         for x in GlobalSecondaryIndexes]
+            if LocalSecondaryIndexes:
+                description['LocalSecondaryIndexes'] = deepcopy(LocalSecondaryIndexes)
+
+            self.tables[TableName] = _Table(TableName, KeySchema,
+                                            (GlobalSecondaryIndexes or []) + (LocalSecondaryIndexes or []),
+                                            description.get('ProvisionedThroughput'), description)
+
+            return {'TableDescription': description}
+
+
+    def create_sosw_tables(self, prefix: str = '', provisioned_throughput: Optional[Dict] = None):
+        """
+        Create the tables of the Essentials from ``SOSW_TABLES``.
+
+        :param prefix:                  Prefix for names of tables and indexes, e.g. ``'autotest_'``
+        :param provisioned_throughput:  Capacity of tables, e.g. ``{'ReadCapacityUnits': 100,
+                                        'WriteCapacityUnits': 100}``. Default: PAY_PER_REQUEST.
+        """
+
+        for name, schema in SOSW_TABLES.items():
+            schema = deepcopy(schema)
+            for index in schema.get('GlobalSecondaryIndexes', []) + schema.get('LocalSecondaryIndexes', []):
+                index['IndexName'] = f"{prefix}{index['IndexName']}"
+            self.create_table(TableName=f"{prefix}{name}", ProvisionedThroughput=provisioned_throughput, **schema)
+
+
+    def describe_table(self, TableName: str) -> Dict:
+        table = self._get_table(TableName, 'DescribeTable')
+        return {'Table': {**deepcopy(table.description), 'ItemCount': len(table.items)}}
+
+
+    def get_item(self, TableName: str, Key: Dict, ConsistentRead: bool = False, ReturnConsumedCapacity=None,
+                 **kwargs) -> Dict:
+        with self._lock:
+            table = self._get_table(TableName, 'GetItem')
+            self._check_capacity(table, 'read', 'GetItem')
+
+            item = table.items.get(table.serialize_key(Key))
+            units = self._read_units(_item_size(item) if item else 0, ConsistentRead)
+            self._consume(table, 'read', units)
+
+            response = {'Item': deepcopy(item)} if item else {}
+            return self._with_capacity(response, ReturnConsumedCapacity, {TableName: units})
+
+
+    def put_item(self, TableName: str, Item: Dict, ConditionExpression: Optional[str] = None,
+                 ExpressionAttributeNames: Optional[Dict] = None, ExpressionAttributeValues: Optional[Dict] = None,
+                 ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        with self._lock:
+            table = self._get_table(TableName, 'PutItem')
+            self._check_capacity(table, 'write', 'PutItem')
+
+            units = self._put(table, Item, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                              'PutItem')
+            return self._with_capacity({}, ReturnConsumedCapacity, {TableName: units})
+
+
+    def update_item(self, TableName: str, Key: Dict, UpdateExpression: str, ConditionExpression: Optional[str] = None,
+                    ExpressionAttributeNames: Optional[Dict] = None, ExpressionAttributeValues: Optional[Dict] = None,
+                    ReturnValues: str = 'NONE', ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        with self._lock:
+            table = self._get_table(TableName, 'UpdateItem')
+            self._check_capacity(table, 'write', 'UpdateItem')
+
+            old, new, units = self._update(table, Key, UpdateExpression, ConditionExpression,
+                                           ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+
+            response = {}
+            if ReturnValues == 'ALL_NEW':
+                response['Attributes'] = deepcopy(new)
+            elif ReturnValues == 'ALL_OLD' and old:
+                response['Attributes'] = deepcopy(old)
+
+            return self._with_capacity(response, ReturnConsumedCapacity, {TableName: units})
+
+
+    def delete_item(self, TableName: str, Key: Dict, ConditionExpression: Optional[str] = None,
+                    ExpressionAttributeNames: Optional[Dict] = None, ExpressionAttributeValues: Optional[Dict] = None,
+                    ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        with self._lock:
+            table = self._get_table(TableName, 'DeleteItem')
+            self._check_capacity(table, 'write', 'DeleteItem')
+
+            units = self._delete(table, Key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                                 'DeleteItem')
+            return self._with_capacity({}, ReturnConsumedCapacity, {TableName: units})
+
+
+    def batch_get_item(self, RequestItems: Dict, ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        if sum(len(x['Keys']) for x in RequestItems.values()) > 100:
+            raise _client_error('ValidationException', "Too many items requested for the BatchGetItem call",
+                                'BatchGetItem')
+
+        responses, unprocessed, consumed = {}, {}, defaultdict(float)
+
+        with self._lock:
+            for table_name, request in RequestItems.items():
+                table = self._get_table(table_name, 'BatchGetItem')
+                responses[table_name] = []
+
+                for key in request['Keys']:
+                    if not self._has_capacity(table, 'read'):
+                        unprocessed.setdefault(table_name, {**request, 'Keys': []})['Keys'].append(key)
+                        continue
+
+                    item = table.items.get(table.serialize_key(key))
+                    units = self._read_units(_item_size(item) if item else 0, request.get('ConsistentRead'))
+                    self._consume(table, 'read', units)
+                    consumed[table_name] += units
+
+                    if item:
+                        responses[table_name].append(deepcopy(item))
+
+            if unprocessed and not consumed:
+                raise self._throttled('BatchGetItem')
+
+        return self._with_capacity({'Responses': responses, 'UnprocessedKeys': unprocessed}, ReturnConsumedCapacity,
+                                   consumed)
+
+
+    def batch_write_item(self, RequestItems: Dict, ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        if sum(len(x) for x in RequestItems.values()) > 25:
+            raise _client_error('ValidationException', "Too many items requested for the BatchWriteItem call",
+                                'BatchWriteItem')
+
+        unprocessed, consumed = {}, defaultdict(float)
+
+        with self._lock:
+            tables = {name: self._get_table(name, 'BatchWriteItem') for name in RequestItems}
+
+            for table_name, requests in RequestItems.items():
+                table = tables[table_name]
+                for request in requests:
+                    if not self._has_capacity(table, 'write'):
+                        unprocessed.setdefault(table_name, []).append(request)
+                        continue
+
+                    if 'PutRequest' in request:
+                        units = self._put(table, request['PutRequest']['Item'], operation='BatchWriteItem')
+                    else:
+                        units = self._delete(table, request['DeleteRequest']['Key'], operation='BatchWriteItem')
+                    consumed[table_name] += units
+
+            if unprocessed and not consumed:
+                raise self._throttled('BatchWriteItem')
+
+        return self._with_capacity({'UnprocessedItems': unprocessed}, ReturnConsumedCapacity, consumed)
+
+
+    def transact_write_items(self, TransactItems: List[Dict], ReturnConsumedCapacity=None, **kwargs) -> Dict:
+        """ All the operations are validated first and applied only if all the conditions are satisfied. """
+
+        if len(TransactItems) > 100:
+            raise _client_error('ValidationException', "Too many items in the TransactWriteItems call",
+                                'TransactWriteItems')
+
+        with self._lock:
+            operations = []
+            for transact_item in TransactItems:
+                action, query = next(iter(transact_item.items()))
+                table = self._get_table(query['TableName'], 'TransactWriteItems')
+                self._check_capacity(table, 'write', 'TransactWriteItems')
+                operations.append((action, query, table))
+
+            reasons, failed = [], False
+            for action, query, table in operations:
+                key = query['Item'] if action == 'Put' else query['Key']
+                current = table.items.get(table.serialize_key(key))
+                if self._condition_holds(query.get('ConditionExpression'), query.get('ExpressionAttributeNames'),
+                                         query.get('ExpressionAttributeValues'), current or {}):
+                    reasons.append({'Code': 'None'})
+                else:
+                    reasons.append({'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                    failed = True
+
+            if failed:
+                raise _client_error('TransactionCanceledException',
+                                    "Transaction cancelled, please refer cancellation reasons for specific reasons",
+                                    'TransactWriteItems', CancellationReasons=reasons)
+
+            consumed = defaultdict(float)
+            for action, query, table in operations:
+                if action == 'Put':
+                    units = self._put(table, query['Item'], operation='TransactWriteItems')
+                elif action == 'Delete':
+                    units = self._delete(table, query['Key'], operation='TransactWriteItems')
+                elif action == 'Update':
+                    units = self._update(table, query['Key'], query['UpdateExpression'], None,
+                                         query.get('ExpressionAttributeNames'), query.get('ExpressionAttributeValues'),
+                                         'TransactWriteItems')[2]
+                else:
+                    units = 0
+
+                # Transactional writes cost twice as much.
+                self._consume(table, 'write', units)
+                consumed[table.name] += 2 * units
+
+        return self._with_capacity({}, ReturnConsumedCapacity, consumed)
+
+
+    def query(self, **kwargs) -> Dict:
+        return self._read_page('query', **kwargs)
+
+
+    def scan(self, **kwargs) -> Dict:
+        return self._read_page('scan', **kwargs)
+
+
+    def get_paginator(self, operation: str) -> '_Paginator':
+        assert operation in ('query', 'scan'), f"Paginator is not supported for {operation}"
+        return _Paginator(getattr(self, operation))
+
+
+    def _read_page(self, operation: str, TableName: str, IndexName: Optional[str] = None,
+                   KeyConditionExpression: Optional[str] = None, FilterExpression: Optional[str] = None,
+                   ExpressionAttributeNames: Optional[Dict] = None, ExpressionAttributeValues: Optional[Dict] = None,
+                   Select: Optional[str] = None, Limit: Optional[int] = None, ExclusiveStartKey: Optional[Dict] = None,
+                   ScanIndexForward: bool = True, ConsistentRead: bool = False, Segment: Optional[int] = None,
+                   TotalSegments: Optional[int] = None, ReturnConsumedCapacity=None, **kwargs) -> Dict:
+
+        api_name = 'Query' if operation == 'query' else 'Scan'
+
+        with self._lock:
+            table = self._get_table(TableName, api_name)
+            self._check_capacity(table, 'read', api_name)
+
+            hash_key = table.get_index_keys(IndexName)[0]
+            key_condition = None
+
+            if operation == 'query':
+                key_condition = _Expression(KeyConditionExpression, ExpressionAttributeNames,
+                                            ExpressionAttributeValues).parse_condition()
+                hash_value = _find_equality(key_condition, hash_key)
+                if hash_value is None:
+                    raise _client_error('ValidationException', f"Query condition missed key schema element: {hash_key}",
+                                        api_name)
+
+                entries = table.partitions[IndexName].get(json.dumps(hash_value, sort_keys=True), [])
+            else:
+                entries = table.scan_order[IndexName]
+
+            # The entries are sorted, so the page starts right after the ``ExclusiveStartKey`` found by bisection.
+            if ExclusiveStartKey:
+                start = table.get_sort_key(IndexName, ExclusiveStartKey)
+                positions = (range(bisect.bisect_right(entries, start), len(entries)) if ScanIndexForward
+                             else range(bisect.bisect_left(entries, start) - 1, -1, -1))
+            else:
+                positions = range(len(entries)) if ScanIndexForward else range(len(entries) - 1, -1, -1)
+
+            filter_condition = _Expression(FilterExpression, ExpressionAttributeNames,
+                                           ExpressionAttributeValues).parse_condition() if FilterExpression else None
+
+            items, scanned, size, last_evaluated, previous = [], 0, 0, None, None
+            for position in positions:
+                key = entries[position][1]
+                if TotalSegments and zlib.crc32(key.encode()) % TotalSegments != Segment:
+                    continue
+
+                item = table.items[key]
+                if key_condition is not None and not _evaluate_condition(key_condition, item):
+                    continue
+
+                if (Limit and scanned >= Limit) or size >= PAGE_MAX_BYTES:
+                    last_evaluated = self._make_last_evaluated_key(table, IndexName, previous)
+                    break
+
+                scanned += 1
+                size += _item_size(item)
+                previous = item
+                if filter_condition is None or _evaluate_condition(filter_condition, item):
+                    items.append(deepcopy(table.project(item, IndexName)))
+
+            units = self._read_units(size, ConsistentRead)
+            self._consume(table, 'read', units)
+            self.stats[f'{operation}_calls'] += 1
+
+        response = {'Count': len(items), 'ScannedCount': scanned}
+        if Select != 'COUNT':
+            response['Items'] = items
+        if last_evaluated:
+            response['LastEvaluatedKey'] = last_evaluated
+
+        return self._with_capacity(response, ReturnConsumedCapacity, {TableName: units})
+
+
+    @staticmethod
+    def _make_last_evaluated_key(table: _Table, index_name: Optional[str], item: Dict) -> Dict:
+        key = table.get_primary_key(item)
+        for name in table.get_index_keys(index_name):
+            if name:
+                key[name] = item[name]
+        return key
+
+
+    def _put(self, table: _Table, item: Dict, condition: Optional[str] = None, names: Optional[Dict] = None,
+             values: Optional[Dict] = None, operation: str = 'PutItem') -> float:
+        key = table.serialize_key(item)
+        current = table.items.get(key)
+
+        if not self._condition_holds(condition, names, values, current or {}):
+            raise _client_error('ConditionalCheckFailedException', "The conditional request failed", operation)
+
+        table.put(deepcopy(item))
+        units = self._write_units(max(_item_size(item), _item_size(current) if current else 0))
+        self._consume(table, 'write', units)
+        self.stats['put_items'] += 1
+        return units
+
+
+    def _update(self, table: _Table, key: Dict, update_expression: str, condition: Optional[str],
+                names: Optional[Dict], values: Optional[Dict], operation: str) -> Tuple[Optional[Dict], Dict, float]:
+
+        current = table.items.get(table.serialize_key(key))
+
+        if not self._condition_holds(condition, names, values, current or {}):
+            raise _client_error('ConditionalCheckFailedException', "The conditional request failed", operation)
+
+        new = deepcopy(current) if current else deepcopy(table.get_primary_key(key))
+
+        for action in _Expression(update_expression, names, values).parse_update():
+            clause, name = action[0], action[1]
+
+            if name in (table.hash_key, table.range_key):
+                raise _client_error('ValidationException', f"Cannot update attribute {name} of the key", operation)
+
+            if clause == 'SET':
+                new[name] = deepcopy(_evaluate_operand(action[2], current or {}))
+            elif clause == 'REMOVE':
+                new.pop(name, None)
+            elif clause == 'ADD':
+                value = action[2][1]
+                if 'N' in value:
+                    new[name] = {'N': _format_number(_python_value(new.get(name, {'N': '0'})) + Decimal(value['N']))}
+                else:
+                    set_type = next(iter(value))
+                    new[name] = {set_type: sorted(set(new.get(name, {set_type: []})[set_type]) | set(value[set_type]))}
+            elif clause == 'DELETE':
+                set_type = next(iter(action[2][1]))
+                remaining = set(new.get(name, {set_type: []})[set_type]) - set(action[2][1][set_type])
+                if remaining:
+                    new[name] = {set_type: sorted(remaining)}
+                else:
+                    new.pop(name, None)
+
+        table.put(new)
+        units = self._write_units(max(_item_size(new), _item_size(current) if current else 0))
+        self._consume(table, 'write', units)
+        self.stats['updated_items'] += 1
+        return current, new, units
+
+
+    def _delete(self, table: _Table, key: Dict, condition: Optional[str] = None, names: Optional[Dict] = None,
+                values: Optional[Dict] = None, operation: str = 'DeleteItem') -> float:
+        serialized_key = table.serialize_key(key)
+        current = table.items.get(serialized_key)
+
+        if not self._condition_holds(condition, names, values, current or {}):
+            raise _client_error('ConditionalCheckFailedException', "The conditional request failed", operation)
+
+        table.delete(serialized_key)
+        units = self._write_units(_item_size(current) if current else 0)
+        self._consume(table, 'write', units)
+        self.stats['deleted_items'] += 1
+        return units
+
+
+    @staticmethod
+    def _condition_holds(condition: Optional[str], names: Optional[Dict], values: Optional[Dict], item: Dict) -> bool:
+        if not condition:
+            return True
+        return _evaluate_condition(_Expression(condition, names, values).parse_condition(), item)
+
+
+    def _get_table(self, table_name: str, operation: str) -> _Table:
+        try:
+            return self.tables[table_name]
+        except KeyError:
+            raise _client_error('ResourceNotFoundException', f"Requested resource not found: Table: {table_name} "
+                                                             f"not found", operation)
+
+
+    @staticmethod
+    def _read_units(size: int, consistent_read: Optional[bool]) -> float:
+        units = max(1, math.ceil(size / 4096))
+        return float(units) if consistent_read else units / 2
+
+
+    @staticmethod
+    def _write_units(size: int) -> float:
+        return float(max(1, math.ceil(size / 1024)))
+
+
+    def _get_bucket(self, table: _Table, action: str) -> Optional[CapacityTokenBucket]:
+        if not self.simulate_throttling or not table.provisioned_throughput:
+            return None
+
+        if (table.name, action) not in self._capacity:
+            rate = table.provisioned_throughput['ReadCapacityUnits' if action == 'read' else 'WriteCapacityUnits']
+            self._capacity[(table.name, action)] = CapacityTokenBucket(rate=rate, burst=rate * self.burst_seconds)
+        return self._capacity[(table.name, action)]
+
+
+    def _has_capacity(self, table: _Table, action: str) -> bool:
+        bucket = self._get_bucket(table, action)
+        return bucket is None or bucket.available() > 0
+
+
+    def _check_capacity(self, table: _Table, action: str, operation: str):
+        if not self._has_capacity(table, action):
+            raise self._throttled(operation)
+
+
+    def _throttled(self, operation: str) -> ClientError:
+        self.stats['throttled_calls'] += 1
+        return _client_error('ProvisionedThroughputExceededException',
+                             "The level of configured provisioned throughput for the table was exceeded", operation)
+
+
+    def _consume(self, table: _Table, action: str, units: float):
+        self.stats[f'consumed_{action}_capacity'] += units
+        bucket = self._get_bucket(table, action)
+        if bucket:
+            bucket.consume(units)
+
+
+    @staticmethod
+    def _with_capacity(response: Dict, return_consumed_capacity: Optional[str], consumed: Dict[str, float]) -> Dict:
+        if return_consumed_capacity in ('TOTAL', 'INDEXES'):
+            entries = [{'TableName': name, 'CapacityUnits': units} for name, units in consumed.items()]
+            response['ConsumedCapacity'] = entries[0] if len(entries) == 1 and 'Count' in response else entries
+        return response
+
+
+class _Paginator:
+    """ Same as botocore paginators of ``query`` and ``scan``. Supports ``MaxItems`` and ``PageSize``. """
+
+    def __init__(self, method: Callable):
+        self.method = method
+
+
+    def paginate(self, PaginationConfig: Optional[Dict] = None, **kwargs) -> Iterator[Dict]:
+        config = PaginationConfig or {}
+        if config.get('PageSize'):
+            kwargs['Limit'] = config['PageSize']
+
+        remaining = config.get('MaxItems')
+
+        while True:
+            page = self.method(**kwargs)
+
+            if remaining is not None and 'Items' in page:
+                page['Items'] = page['Items'][:remaining]
+                remaining -= len(page['Items'])
+
+            yield page
+
+            if not page.get('LastEvaluatedKey') or (remaining is not None and remaining <= 0):
+                return
+
+            kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+_memory_dynamo_db: Optional[MemoryDynamoDb] = None
+
+
+def get_memory_dynamo_db() -> MemoryDynamoDb:
+    """ Returns the shared :class:`MemoryDynamoDb` used by DynamoDbClients with ``'backend': 'memory'`` """
+
+    global _memory_dynamo_db
+
+    if _memory_dynamo_db is None:
+        _memory_dynamo_db = MemoryDynamoDb()
+    return _memory_dynamo_db
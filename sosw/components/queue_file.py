@@ -0,0 +1,328 @@
+"""
+..  hidden-code-block:: text
+    :label: View Licence Agreement <br>
+
+    sosw - Serverless Orchestrator of Serverless Workers
+
+    The MIT License (MIT)
+    Copyright (C) 2024  sosw core contributors <info@sosw.app>
+
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+"""
+
+__all__ = ['QueueFile']
+__author__ = "Nikolay Grishchenko"
+__version__ = "1.0"
+
+try:
+    from aws_lambda_powertools import Logger
+
+    logger = Logger(child=True)
+
+except ImportError:
+    import logging
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import gzip
+import os
+import shutil
+import zlib
+
+from typing import Iterable, List, Optional, Tuple
+
+
+class QueueFile:
+    """
+    Local file with a queue of rows (newline-delimited JSON of tasks for the Scheduler) and a persisted read offset.
+
+    Reading rows does not modify the file. The offset is stored in a sidecar file (``<file_name>.offset``),
+    so reading a batch costs O(batch) regardless of the size of the file. The unread remainder is materialised
+    only by ``compact()``, e.g. before uploading the file to S3 for a sibling.
+
+    The codec is detected from the name of the file:
+
+    - ``*.gz`` - gzip
+    - ``*.zst`` - zstd (requires the optional ``zstandard`` package: ``pip install 'sosw[zstd]'``)
+    - anything else - plain text
+
+    Compressed files are written in independent frames (gzip members / zstd frames) of ``block_rows`` rows.
+    Concatenated frames are still a valid ``.gz`` / ``.zst`` file, so new rows can be appended at any time and
+    the offset points to the frame plus the number of rows of this frame already read.
+
+    ..  code-block:: python
+
+        queue_file = QueueFile('/tmp/tasks_queue.txt.gz')
+        queue_file.append_rows(json.dumps(task) for task in tasks)
+
+        while True:
+            rows = queue_file.read_rows(50)
+            if not rows:
+                break
+            ...
+
+        queue_file.compact()  # Only the unread rows remain in the file.
+    """
+
+    CODECS = {
+        '.gz':  'gzip',
+        '.zst': 'zstd',
+    }
+
+    READ_SIZE = 64 * 1024
+
+
+    def __init__(self, file_name: str, block_rows: int = 1000):
+        self.file_name = file_name
+        self.block_rows = block_rows
+        self.codec = self.get_codec(file_name)
+        if self.codec == 'zstd':
+            self._get_zstandard()
+
+        # The last decompressed frame: (position, end_position, lines). Batches are usually smaller than frames.
+        self._block: Optional[Tuple[int, int, List[bytes]]] = None
+
+
+    @classmethod
+    def get_codec(cls, file_name: str) -> Optional[str]:
+        """ Name of the compression codec by the suffix of ``file_name`` or None for plain files. """
+
+        for suffix, codec in cls.CODECS.items():
+            if file_name.endswith(suffix):
+                return codec
+
+
+    @classmethod
+    def split_codec_suffix(cls, file_name: str) -> Tuple[str, str]:
+        """
+        Split the compression suffix from the ``file_name``.
+
+        Ex: ``'tasks_queue.txt.gz'`` -> ``('tasks_queue.txt', '.gz')``
+        and ``'tasks_queue.txt'`` -> ``('tasks_queue.txt', '')``
+        """
+
+        for suffix in cls.CODECS:
+            if file_name.endswith(suffix):
+                return file_name[:-len(suffix)], suffix
+        return file_name, ''
+
+
+    @property
+    def offset_file_name(self) -> str:
+        """ Name of the sidecar file with the read offset. """
+        return f"{self.file_name}.offset"
+
+
+    def get_read_offset(self) -> Tuple[int, int]:
+        """
+        Current read offset.
+
+        :return: Position in bytes of the next row (plain files) or of the current frame (compressed files)
+                 and the number of rows of this frame already read (always 0 for plain files).
+        """
+
+        try:
+            with open(self.offset_file_name) as f:
+                position, skip = (f.read().split() + ['0', '0'])[:2]
+                return int(position), int(skip)
+        except FileNotFoundError:
+            return 0, 0
+
+
+    def _save_read_offset(self, position: int, skip: int):
+        # Replace the sidecar atomically, so that a crash never leaves a partially written offset.
+        tmp_file = f"{self.offset_file_name}.tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(f"{position} {skip}")
+        os.replace(tmp_file, self.offset_file_name)
+
+
+    def remove_offset_file(self):
+        """ Forget the read offset. The next read starts from the beginning of the file. """
+
+        self._block = None
+        if os.path.isfile(self.offset_file_name):
+            os.remove(self.offset_file_name)
+
+
+    def append_rows(self, rows: Iterable[str]) -> int:
+        """
+        Append the rows to the end of the file. Rows should not contain newlines.
+        Compressed files get a new frame per every ``block_rows`` rows.
+
+        :return: Number of rows written.
+        """
+
+        count = 0
+
+        if not self.codec:
+            with open(self.file_name, 'a') as f:
+                for row in rows:
+                    f.write(f"{row}\n")
+                    count += 1
+            return count
+
+        block = []
+        with open(self.file_name, 'ab') as f:
+            for row in rows:
+                block.append(f"{row}\n".encode('utf-8'))
+                count += 1
+                if len(block) >= self.block_rows:
+                    f.write(self._compress(b''.join(block)))
+                    block = []
+
+            if block:
+                f.write(self._compress(b''.join(block)))
+
+        return count
+
+
+    def read_rows(self, rows: int = 1) -> List[str]:
+        """
+        Read the next rows starting from the persisted read offset and move the offset forward.
+
+        :param int rows:    Number of rows to read. Default: 1
+        :return:            List of rows (with trailing newlines). Empty if the file is missing or fully read.
+        """
+
+        result = []
+        position, skip = self.get_read_offset()
+
+        try:
+            with open(self.file_name, 'rb') as f:
+                if not self.codec:
+                    f.seek(position)
+                    for _ in range(rows):
+                        line = f.readline()
+                        if not line:
+                            break
+                        result.append(line.decode('utf-8'))
+
+                    position = f.tell()
+
+                else:
+                    while len(result) < rows:
+                        end_position, lines = self._read_block(f, position)
+                        if not lines:
+                            break
+
+                        taken = lines[skip:skip + rows - len(result)]
+                        result.extend(x.decode('utf-8') for x in taken)
+                        skip += len(taken)
+
+                        if skip >= len(lines):
+                            position, skip = end_position, 0
+
+        except FileNotFoundError:
+            return result
+
+        self._save_read_offset(position, skip)
+        return result
+
+
+    def compact(self):
+        """
+        Materialise the unread remainder: rewrite the file starting from the read offset and drop the offset.
+        Compressed frames after the current one are copied as is. If nothing remains, the file is removed.
+        """
+
+        position, skip = self.get_read_offset()
+
+        if (position or skip) and os.path.isfile(self.file_name):
+            tmp_file = f"{self.file_name}.compacting"
+            with open(self.file_name, 'rb') as f, open(tmp_file, 'wb') as out:
+                if skip:
+                    end_position, lines = self._read_block(f, position)
+                    if lines[skip:]:
+                        out.write(self._compress(b''.join(lines[skip:])))
+                    position = end_position
+
+                f.seek(position)
+                shutil.copyfileobj(f, out)
+
+            os.replace(tmp_file, self.file_name)
+            logger.debug("Compacted queue file %s from offset %s", self.file_name, (position, skip))
+
+        self.remove_offset_file()
+
+        # If there is no data remaining in the file we remove it.
+        if os.path.isfile(self.file_name) and os.path.getsize(self.file_name) == 0:
+            os.remove(self.file_name)
+
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == 'gzip':
+            return gzip.compress(data)
+
+        return self._get_zstandard().ZstdCompressor().compress(data)
+
+
+    def _get_decompressor(self):
+        if self.codec == 'gzip':
+            # wbits=31 expects the gzip header and stops at the end of the current member.
+            return zlib.decompressobj(wbits=31)
+
+        return self._get_zstandard().ZstdDecompressor().decompressobj()
+
+
+    def _get_zstandard(self):
+        if zstandard is None:
+            raise ImportError(f"Package `zstandard` is required for zstd compressed queue files: {self.file_name}. "
+                              f"Install sosw with the `zstd` extra: pip install 'sosw[zstd]'")
+        return zstandard
+
+
+    def _read_block(self, f, position: int) -> Tuple[int, List[bytes]]:
+        """
+        Decompress a single frame starting at ``position`` of the open file ``f``.
+
+        :return: Position of the next frame and lines of the current one. No lines at the end of the file.
+        """
+
+        if self._block and self._block[0] == position:
+            return self._block[1], self._block[2]
+
+        f.seek(position)
+        decompressor = self._get_decompressor()
+        data, consumed = [], 0
+
+        while not decompressor.eof:
+            chunk = f.read(self.READ_SIZE)
+            if not chunk:
+                if consumed:
+                    raise ValueError(f"Truncated frame at position {position} of queue file {self.file_name}")
+                return position, []
+
+            data.append(decompressor.decompress(chunk))
+            consumed += len(chunk)
+
+        end_position = position + consumed - len(decompressor.unused_data)
+
+        # Rows are always written with trailing newlines, but be tolerant to a frame without the last one.
+        lines = b''.join(data).split(b'\n')
+        lines = [x + b'\n' for x in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+
+        self._block = (position, end_position, lines)
+        return end_position, lines
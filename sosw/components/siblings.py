@@ -46,6 +46,7 @@ import datetime
 import json
 import os
 
+from botocore.exceptions import ClientError
 from math import ceil
 from sosw import Processor
 
@@ -70,11 +71,17 @@ class SiblingsManager(Processor):
           Version: "2012-10-17"
           Statement:
           - Effect: "Allow"
-            Action: "cloudwatch:GetMetricStatistics"
+            Action:
+            - "cloudwatch:GetMetricData"
+            - "cloudwatch:GetMetricStatistics"
             Resource: "*"
           - Effect: "Allow"
             Action: "lambda:InvokeFunction"
             Resource: "arn:aws:lambda:us-west-2:737060422660:function:YOUR_FUNCTION_NAME"
+
+    ..  warning:: The metrics are now fetched with ``cloudwatch:GetMetricData``, add it to the existing Roles.
+                  Roles with only ``cloudwatch:GetMetricStatistics`` still work: after AccessDenied the manager
+                  falls back to the older ``GetMetricStatistics`` calls (two per check) and logs a warning.
     """
 
     DEFAULT_CONFIG = {
@@ -86,6 +93,9 @@ class SiblingsManager(Processor):
     lambda_client: boto3.client = None
     cloudwatch_client: boto3.client = None
 
+    # Set after the Role was denied ``cloudwatch:GetMetricData``, then ``GetMetricStatistics`` is used instead.
+    metric_data_access_denied = False
+
 
     def any_events_rules_enabled(self, lambda_context):
         """
@@ -168,30 +178,60 @@ class SiblingsManager(Processor):
 
         name = name or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'test_function')
         period = 60 * minutes_back
-        st = datetime.datetime.now() - datetime.timedelta(minutes=minutes_back)
         en = datetime.datetime.now()
+        st = en - datetime.timedelta(minutes=minutes_back)
+
+
+        def query(query_id, metric_name, stat):
+            return {
+                'Id':         query_id,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace':  'AWS/Lambda',
+                        'MetricName': metric_name,
+                        'Dimensions': [{"Name": "FunctionName", "Value": name}],
+                    },
+                    'Period': period,
+                    'Stat':   stat,
+                },
+            }
+
 
-        # First we get the average duration.
+        # Both the average duration and the number of invocations are fetched in a single call.
         # Please notice that difference between StartTime and EndTime is exactly equal to `period`.
-        # This makes sure that we get only one aggregated `Datapoint` in the result.
-        response = self.cloudwatch_client.get_metric_statistics(
-                Namespace='AWS/Lambda', MetricName="Duration",
-                StartTime=st, EndTime=en, Period=period, Statistics=['Average'],
-                Dimensions=[{"Name": "FunctionName", "Value": name}])
-
-        # If we had invocations during `period` - we have just one `Datapoint` in response.
-        if response['Datapoints']:
-            average_duration = response['Datapoints'][0]['Average']
-
-            # Now getting the number of invocations with same filters and period.
-            response = self.cloudwatch_client.get_metric_statistics(
-                    Namespace='AWS/Lambda', MetricName="Invocations",
-                    StartTime=st, EndTime=en, Period=period, Statistics=['Sum'],
-                    Dimensions=[{"Name": "FunctionName", "Value": name}])
+        # This makes sure that we get only one aggregated value per metric in the result.
+        values = None
+        if not self.metric_data_access_denied:
+            try:
+                response = self.cloudwatch_client.get_metric_data(
+                        MetricDataQueries=[query('duration', 'Duration', 'Average'),
+                                           query('invocations', 'Invocations', 'Sum')],
+                        StartTime=st, EndTime=en)
+                values = {x['Id']: x.get('Values', []) for x in response.get('MetricDataResults', [])}
+            except ClientError as err:
+                if err.response.get('Error', {}).get('Code') not in ('AccessDenied', 'AccessDeniedException'):
+                    raise
+                logger.warning("The Role is not allowed cloudwatch:GetMetricData, falling back to "
+                               "GetMetricStatistics. Please grant the permission.")
+                self.metric_data_access_denied = True
+
+        if values is None:
+            values = {}
+            for query_id, metric_name, stat in [('duration', 'Duration', 'Average'),
+                                                ('invocations', 'Invocations', 'Sum')]:
+                response = self.cloudwatch_client.get_metric_statistics(
+                        Namespace='AWS/Lambda', MetricName=metric_name,
+                        StartTime=st, EndTime=en, Period=period, Statistics=[stat],
+                        Dimensions=[{"Name": "FunctionName", "Value": name}])
+                values[query_id] = [x[stat] for x in response['Datapoints']]
+
+        # If we had invocations during `period` - we have just one value of each metric in response.
+        if values.get('duration'):
+            average_duration = values['duration'][0]
 
             # We assume that if we have Duration, we definitely have invocations.
             # You may change this if you catch some VALID example where this is not True.
-            number_of_invocations = response['Datapoints'][0]['Sum']
+            number_of_invocations = values['invocations'][0]
 
             return ceil(number_of_invocations * (average_duration / (1000 * period)))
         else:
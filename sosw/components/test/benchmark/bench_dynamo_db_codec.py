@@ -0,0 +1,137 @@
+"""
+Micro-benchmark of row conversion in DynamoDbClient.
+
+Compares the compiled ``RowMapperCodec`` used by ``dynamo_to_dict`` with the previous
+implementation that walked the ``row_mapper`` and the config for every row. The legacy implementation is kept here
+only as a reference for the comparison.
+
+Run: ``python -m sosw.components.test.benchmark.bench_dynamo_db_codec [number_of_rows]``
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+from unittest.mock import patch
+
+logging.getLogger('botocore').setLevel(logging.WARNING)
+
+os.environ["STAGE"] = "test"
+
+from sosw.components.dynamo_db import DynamoDbClient
+from sosw.managers.task import TaskManager
+
+
+CONFIG = {
+    **TaskManager.DEFAULT_CONFIG['dynamo_db_config'],
+    'table_name': 'autotest_sosw_tasks',
+}
+
+
+def legacy_dynamo_to_dict(client, dynamo_row, fetch_all_fields=False):
+    result = {}
+
+    if not fetch_all_fields:
+        for key, key_type in client.row_mapper.items():
+            val_dict = dynamo_row.get(key)
+            if val_dict:
+                val = val_dict.get(key_type)
+
+                if val is None and key_type not in val_dict:
+                    real_type = list(val_dict.keys())[0]
+                    raise ValueError(f"'{key}' is expected to be of type '{key_type}' in row_mapper, "
+                                     f"but real value is of type '{real_type}'")
+
+                if key_type == 'N':
+                    result[key] = float(val) if '.' in val else int(val)
+                elif key_type == 'M':
+                    result[key] = legacy_dynamo_to_dict(client, val, fetch_all_fields=True)
+                elif key_type == 'S':
+                    if val.startswith('{') and val.endswith('}') and not client.config.get('dont_json_loads_results'):
+                        try:
+                            result[key] = json.loads(val)
+                        except ValueError:
+                            result[key] = val
+                    else:
+                        result[key] = val
+                else:
+                    result[key] = client.type_deserializer.deserialize(val_dict)
+
+    else:
+        for key, val_dict in dynamo_row.items():
+            for val_type, val in val_dict.items():
+                if val_type == 'N':
+                    result[key] = float(val) if '.' in val else int(val)
+                elif val_type == 'M':
+                    result[key] = legacy_dynamo_to_dict(client, val, fetch_all_fields=True)
+                elif val_type == 'S':
+                    if val.startswith('{') and val.endswith('}') and not client.config.get('dont_json_loads_results'):
+                        try:
+                            result[key] = json.loads(val)
+                        except ValueError:
+                            result[key] = val
+                    else:
+                        result[key] = val
+                else:
+                    result[key] = client.type_deserializer.deserialize(val_dict)
+
+    assert all(True for x in client.config['required_fields'] if result.get(x)), "Some ``required_fields`` are missing"
+    return result
+
+
+def make_task(i: int):
+    """ Synthetic task similar to the ones in ``sosw_tasks``. """
+
+    now = time.time()
+    return {
+        'task_id':     uuid.uuid4().hex,
+        'labourer_id': 'some_labourer',
+        'created_at':  now,
+        'greenfield':  1000 * i,
+        'attempts':    i % 3,
+        'payload':     json.dumps({'store': i % 100, 'product_ids': list(range(i % 5)), 'date_list': ['2024-01-01']}),
+        'some_extra':  f"not_in_row_mapper_{i}",
+    }
+
+
+def measure(fn, rows, repeat=3):
+    best = None
+    for _ in range(repeat):
+        st = time.perf_counter()
+        for row in rows:
+            fn(row)
+        duration = time.perf_counter() - st
+        best = duration if best is None else min(best, duration)
+    return best
+
+
+def main(number_of_rows: int = 10000):
+    with patch('boto3.client'):
+        client = DynamoDbClient(config=CONFIG)
+
+    tasks = [make_task(i) for i in range(number_of_rows)]
+    dynamo_rows = [client.dict_to_dynamo(task, strict=False) for task in tasks]
+
+    # Make sure both implementations produce the same results before measuring them.
+    for task, row in zip(tasks, dynamo_rows):
+        assert client.dynamo_to_dict(row) == legacy_dynamo_to_dict(client, row)
+        assert client.dynamo_to_dict(row, fetch_all_fields=True) == legacy_dynamo_to_dict(client, row, True)
+
+    cases = [
+        ('dynamo_to_dict', lambda x: legacy_dynamo_to_dict(client, x), client.dynamo_to_dict, dynamo_rows),
+        ('dynamo_to_dict(fetch_all_fields)', lambda x: legacy_dynamo_to_dict(client, x, True),
+         lambda x: client.dynamo_to_dict(x, fetch_all_fields=True), dynamo_rows),
+    ]
+
+    print(f"Rows: {number_of_rows}")
+    for name, legacy, compiled, rows in cases:
+        old = measure(legacy, rows)
+        new = measure(compiled, rows)
+        print(f"{name:<36} legacy: {old:.4f}s  compiled: {new:.4f}s  speedup: {old / new:.2f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
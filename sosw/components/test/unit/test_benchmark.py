@@ -0,0 +1,135 @@
+import os
+import random
+import unittest
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ["STAGE"] = "test"
+os.environ["autotest"] = "True"
+
+from sosw.components.benchmark import benchmark, LatencyHistogram, get_latency_stats, reset_latency_histograms
+
+
+class Benchmarked:
+
+    def __init__(self):
+        self.stats = defaultdict(int)
+
+
+    @benchmark
+    def plain(self, x):
+        return x
+
+
+    @benchmark(histogram=True)
+    def measured(self, x):
+        return x
+
+
+class benchmark_UnitTestCase(unittest.TestCase):
+
+    def test_benchmark__stats(self):
+        obj = Benchmarked()
+
+        self.assertEqual(obj.plain(1), 1)
+        self.assertEqual(obj.measured(2), 2)
+        self.assertEqual(obj.measured(3), 3)
+
+        self.assertEqual(obj.stats['calls_plain'], 1)
+        self.assertEqual(obj.stats['calls_measured'], 2)
+        self.assertGreater(obj.stats['time_measured'], 0)
+        self.assertEqual(list(obj.latency_histograms), ['measured'])
+        self.assertEqual(obj.latency_histograms['measured'].count, 2)
+
+
+    def test_benchmark__histogram_disabled(self):
+        obj = Benchmarked()
+        obj.record_latency_histograms = False
+
+        obj.measured(1)
+
+        self.assertEqual(obj.stats['calls_measured'], 1)
+        self.assertGreater(obj.stats['time_measured'], 0)
+        self.assertIsNone(getattr(obj, 'latency_histograms', None))
+        self.assertEqual(get_latency_stats(obj), {})
+
+
+    def test_benchmark__histogram_from_threads(self):
+        obj = Benchmarked()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(8):
+                executor.submit(lambda: [obj.measured(i) for i in range(5000)])
+
+        self.assertEqual(obj.stats['calls_measured'], 40000)
+        self.assertEqual(obj.latency_histograms['measured'].count, 40000)
+        self.assertEqual(sum(obj.latency_histograms['measured'].counts), 40000)
+
+
+    def test_histogram__percentiles(self):
+        rng = random.Random(42)
+        values = sorted(rng.lognormvariate(-5, 1.5) for _ in range(10000))
+
+        histogram = LatencyHistogram()
+        for v in values:
+            histogram.record(v)
+
+        self.assertEqual(histogram.count, 10000)
+        self.assertEqual(histogram.max, values[-1])
+        for q in (50, 90, 99):
+            expected = values[int(q / 100 * len(values)) - 1]
+            self.assertAlmostEqual(histogram.get_percentile(q) / expected, 1, delta=0.04)
+
+        self.assertEqual(LatencyHistogram().get_percentile(99), 0)
+
+
+    def test_histogram__bucket_bounds(self):
+        histogram = LatencyHistogram()
+
+        # Every recorded value falls below the upper bound of its bucket and not below the previous one.
+        for ns in (0, 1, 31, 63, 64, 65, 1000, 123456789, 10 ** 12):
+            histogram.counts = [0] * len(histogram.counts)
+            histogram.record((ns + 0.5) / 1e9)
+            index = histogram.counts.index(1)
+            self.assertLess(ns, LatencyHistogram.get_bucket_upper_bound(index))
+            if index:
+                self.assertGreaterEqual(ns, LatencyHistogram.get_bucket_upper_bound(index - 1))
+
+        # Too long durations are counted in the last bucket.
+        histogram.record(10 ** 6)
+        self.assertEqual(histogram.counts[-1], 1)
+
+
+    def test_histogram__merge(self):
+        a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for i in range(1, 100):
+            (a if i % 2 else b).record(i / 1000)
+            both.record(i / 1000)
+
+        a.merge(b)
+        self.assertEqual(a.counts, both.counts)
+        self.assertEqual(a.get_stats(), both.get_stats())
+
+
+    def test_reset_latency_histograms(self):
+        obj = Benchmarked()
+        obj.measured(1)
+        expected = {f"{prefix}_{k}_measured" for prefix in ('latency', 'total_latency')
+                    for k in ('p50', 'p90', 'p99', 'max')}
+        self.assertEqual(set(get_latency_stats(obj)), expected)
+
+        reset_latency_histograms(obj)
+        obj.measured(1)
+        reset_latency_histograms(obj)
+
+        self.assertEqual(obj.latency_histograms, {})
+        self.assertEqual(obj.lifetime_latency_histograms['measured'].count, 2)
+
+        # Only the lifetime ones are returned until new calls.
+        self.assertEqual(set(get_latency_stats(obj)), {x for x in expected if x.startswith('total_')})
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,7 +15,7 @@ logging.getLogger('botocore').setLevel(logging.WARNING)
 os.environ["STAGE"] = "test"
 os.environ["autotest"] = "True"
 
-from sosw.components.dynamo_db import DynamoDbClient
+from sosw.components.dynamo_db import CapacityTokenBucket, DynamoDbClient
 
 
 class dynamodb_client_UnitTestCase(unittest.TestCase):
@@ -226,6 +226,62 @@ class dynamodb_client_UnitTestCase(unittest.TestCase):
                          str(e.exception))
 
 
+    def test_codec__compiled_once(self):
+        codec = self.dynamo_client.codec
+
+        self.dynamo_client.dynamo_to_dict({'lambda_name': {'S': 'a'}})
+        self.dynamo_client.dynamo_to_dict({'lambda_name': {'S': 'b'}})
+
+        self.assertIs(self.dynamo_client.codec, codec)
+
+
+    def test_codec__recompiled_if_row_mapper_replaced(self):
+        self.assertEqual(self.dynamo_client.dynamo_to_dict({'brand_new': {'N': '1'}}), {})
+
+        self.dynamo_client.row_mapper = {'brand_new': 'N'}
+
+        self.assertEqual(self.dynamo_client.dynamo_to_dict({'brand_new': {'N': '1'}}), {'brand_new': 1})
+
+
+    def test_codec__invalidated_if_row_mapper_or_config_modified(self):
+        dynamo_client = DynamoDbClient(config=deepcopy(self.TEST_CONFIG))
+        row = {'brand_new': {'N': '1'}, 'other_col': {'S': '{"a": 1}'}}
+        self.assertEqual(dynamo_client.dynamo_to_dict(row), {'other_col': {'a': 1}})
+
+        # The compiled codec is reused until invalidated.
+        codec = dynamo_client.codec
+        dynamo_client.row_mapper['brand_new'] = 'N'
+        self.assertIs(dynamo_client.codec, codec)
+
+        dynamo_client.invalidate_codec()
+        self.assertEqual(dynamo_client.dynamo_to_dict(row), {'brand_new': 1, 'other_col': {'a': 1}})
+
+        dynamo_client.config['dont_json_loads_results'] = True
+        dynamo_client.invalidate_codec()
+        self.assertEqual(dynamo_client.dynamo_to_dict(row), {'brand_new': 1, 'other_col': '{"a": 1}'})
+
+
+    def test_dict_to_dynamo__not_strict__mapped_field_with_none(self):
+        dynamo_row = self.dynamo_client.dict_to_dynamo({'hash_col': 'cat', 'other_col': None}, strict=False)
+
+        self.assertEqual(dynamo_row, {'hash_col': {'S': 'cat'}, 'other_col': {'NULL': True}})
+
+
+    def test_dict_to_dynamo__strict__raises_for_required_field_not_in_row_mapper(self):
+        config = deepcopy(self.TEST_CONFIG)
+        config['required_fields'] = ['unmapped_col']
+        dynamo_client = DynamoDbClient(config=config)
+
+        with self.assertRaises(ValueError):
+            dynamo_client.dict_to_dynamo({'hash_col': 'cat', 'unmapped_col': 'meow'})
+
+
+    def test_dict_to_dynamo__map_uses_row_mapper_for_nested_keys(self):
+        dynamo_row = self.dynamo_client.dict_to_dynamo({'some_map': {'range_col': '5', 'other_col': '42'}})
+
+        self.assertEqual(dynamo_row, {'some_map': {'M': {'range_col': {'N': '5'}, 'other_col': {'S': '42'}}}})
+
+
     def test_get_by_query__validates_comparison(self):
         self.assertRaises(AssertionError, self.dynamo_client.get_by_query, keys={'k': '1'},
                           comparisons={'k': 'unsupported'})
@@ -276,6 +332,200 @@ class dynamodb_client_UnitTestCase(unittest.TestCase):
                       kwargs['KeyConditionExpression'])
 
 
+    def test_get_by_query_generator__yields_pages(self):
+        self.paginator_mock.paginate.return_value = [
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': '1'}}, {'hash_col': {'S': 'a'}, 'range_col': {'N': '2'}}]},
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': '3'}}]},
+        ]
+
+        result = list(self.dynamo_client.get_by_query_generator(keys={'hash_col': 'a'}))
+
+        self.assertEqual(result, [[{'hash_col': 'a', 'range_col': 1}, {'hash_col': 'a', 'range_col': 2}],
+                                  [{'hash_col': 'a', 'range_col': 3}]])
+        self.assertEqual(self.dynamo_client.stats['dynamo_get_queries'], 2)
+
+
+    def test_get_by_query_generator__max_items(self):
+        pages = [
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': '1'}}, {'hash_col': {'S': 'a'}, 'range_col': {'N': '2'}}]},
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': '3'}}, {'hash_col': {'S': 'a'}, 'range_col': {'N': '4'}}]},
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': '5'}}]},
+        ]
+        self.paginator_mock.paginate.return_value = iter(pages)
+
+        result = list(self.dynamo_client.get_by_query_generator(keys={'hash_col': 'a'}, max_items=3))
+
+        self.assertEqual([len(x) for x in result], [2, 1])
+        self.assertEqual(self.dynamo_client.stats['dynamo_get_queries'], 2, "Should not request the third page")
+
+        args, kwargs = self.paginator_mock.paginate.call_args
+        self.assertEqual(kwargs['PaginationConfig'], {'MaxItems': 3, 'PageSize': 3})
+
+
+    def test_get_by_query_generator__max_items_with_filter__default_page_size(self):
+        self.paginator_mock.paginate.return_value = []
+
+        list(self.dynamo_client.get_by_query_generator(keys={'hash_col': 'a'}, max_items=3,
+                                                       filter_expression='other_col = foo'))
+
+        args, kwargs = self.paginator_mock.paginate.call_args
+        self.assertEqual(kwargs['PaginationConfig'], {'MaxItems': 3})
+
+
+    def test_get_by_query_generator__return_count__raises(self):
+        with self.assertRaises(ValueError):
+            next(self.dynamo_client.get_by_query_generator(keys={'hash_col': 'a'}, return_count=True))
+
+
+    def test_get_by_query__max_items(self):
+        self.paginator_mock.paginate.return_value = [
+            {'Items': [{'hash_col': {'S': 'a'}, 'range_col': {'N': str(i)}} for i in range(5)]},
+        ]
+
+        result = self.dynamo_client.get_by_query(keys={'hash_col': 'a'}, max_items=2)
+
+        self.assertEqual(result, [{'hash_col': 'a', 'range_col': 0}, {'hash_col': 'a', 'range_col': 1}])
+
+
+    def test_get_by_scan__total_segments__scans_all_segments(self):
+        self.dynamo_client.get_capacity = MagicMock(return_value=None)
+
+        def paginate(**kwargs):
+            segment = kwargs['Segment']
+            return [{'Items': [{'hash_col': {'S': f"seg_{segment}"}, 'range_col': {'N': str(i)}}]} for i in range(2)]
+
+        self.paginator_mock.paginate.side_effect = paginate
+
+        result = self.dynamo_client.get_by_scan(total_segments=3)
+
+        self.assertEqual(len(result), 6)
+        self.assertEqual({x['hash_col'] for x in result}, {'seg_0', 'seg_1', 'seg_2'})
+        self.assertEqual(self.dynamo_client.stats['dynamo_scan_queries'], 6)
+
+        segments = sorted(kwargs['Segment'] for args, kwargs in self.paginator_mock.paginate.call_args_list)
+        self.assertEqual(segments, [0, 1, 2])
+        for args, kwargs in self.paginator_mock.paginate.call_args_list:
+            self.assertEqual(kwargs['TotalSegments'], 3)
+
+
+    def test_get_by_scan__total_segments__raises_segment_error(self):
+        self.dynamo_client.get_capacity = MagicMock(return_value=None)
+
+        def paginate(**kwargs):
+            if kwargs['Segment'] == 1:
+                raise RuntimeError("Segment failed")
+            return [{'Items': []}]
+
+        self.paginator_mock.paginate.side_effect = paginate
+
+        with self.assertRaises(RuntimeError):
+            self.dynamo_client.get_by_scan(total_segments=2)
+
+
+    def test_get_by_scan__total_segments__share_read_capacity(self):
+        self.dynamo_client.get_capacity = MagicMock(return_value={'read': 10, 'write': 5})
+        self.paginator_mock.paginate.return_value = [
+            {'Items': [], 'ConsumedCapacity': {'CapacityUnits': 2.5}, 'LastEvaluatedKey': {'hash_col': {'S': 'a'}}},
+            {'Items': [], 'ConsumedCapacity': {'CapacityUnits': 2.5}},
+        ]
+
+        self.dynamo_client.get_by_scan(total_segments=2)
+
+        # Segments always share a single bucket of the table even if rate limiting is not enabled in config.
+        self.assertEqual(list(self.dynamo_client._rate_limiters), [(self.table_name, 'read')])
+        self.assertEqual(self.dynamo_client.stats['dynamo_consumed_read_capacity'], 10)
+        for args, kwargs in self.paginator_mock.paginate.call_args_list:
+            self.assertEqual(kwargs['ReturnConsumedCapacity'], 'TOTAL')
+
+
+    def test_get_by_scan__single_segment(self):
+        self.paginator_mock.paginate.return_value = [{'Items': [{'hash_col': {'S': 'a'}}]}]
+
+        self.assertEqual(self.dynamo_client.get_by_scan(), [{'hash_col': 'a'}])
+
+        args, kwargs = self.paginator_mock.paginate.call_args
+        self.assertNotIn('Segment', kwargs)
+
+
+    def test_batch_put__chunks_by_25(self):
+        self.dynamo_mock.batch_write_item.return_value = {'UnprocessedItems': {}}
+        rows = [{'hash_col': f"cat_{i}", 'range_col': i} for i in range(60)]
+
+        self.dynamo_client.batch_put(rows)
+
+        self.assertEqual(self.dynamo_mock.batch_write_item.call_count, 3)
+        sizes = [len(kwargs['RequestItems'][self.table_name])
+                 for args, kwargs in self.dynamo_mock.batch_write_item.call_args_list]
+        self.assertEqual(sizes, [25, 25, 10])
+
+        args, kwargs = self.dynamo_mock.batch_write_item.call_args_list[0]
+        self.assertEqual(kwargs['RequestItems'][self.table_name][0],
+                         {'PutRequest': {'Item': {'hash_col': {'S': 'cat_0'}, 'range_col': {'N': '0'}}}})
+        self.assertEqual(self.dynamo_client.stats['dynamo_batch_put_items'], 60)
+        self.assertEqual(self.dynamo_client.stats['dynamo_batch_write_operations'], 3)
+
+
+    def test_batch_delete(self):
+        self.dynamo_mock.batch_write_item.return_value = {}
+
+        self.dynamo_client.batch_delete([{'hash_col': 'cat', 'range_col': 1}], table_name='autotest_other')
+
+        args, kwargs = self.dynamo_mock.batch_write_item.call_args
+        self.assertEqual(kwargs['RequestItems'],
+                         {'autotest_other': [{'DeleteRequest': {'Key': {'hash_col': {'S': 'cat'},
+                                                                        'range_col': {'N': '1'}}}}]})
+        self.assertEqual(self.dynamo_client.stats['dynamo_batch_delete_items'], 1)
+
+
+    def test_batch_write_items__multiple_tables(self):
+        self.dynamo_mock.batch_write_item.return_value = {}
+
+        self.dynamo_client.batch_write_items(
+                self.dynamo_client.make_put_transaction_item({'hash_col': 'cat'}, table_name='autotest_a'),
+                self.dynamo_client.make_delete_transaction_item({'hash_col': 'cat'}, table_name='autotest_b'))
+
+        self.dynamo_mock.batch_write_item.assert_called_once()
+        args, kwargs = self.dynamo_mock.batch_write_item.call_args
+        self.assertEqual(set(kwargs['RequestItems']), {'autotest_a', 'autotest_b'})
+
+
+    @patch.object(time, 'sleep')
+    def test_batch_write_items__retries_unprocessed(self, mock_sleep):
+        unprocessed = {self.table_name: [{'PutRequest': {'Item': {'hash_col': {'S': 'cat'}}}}]}
+        self.dynamo_mock.batch_write_item.side_effect = [{'UnprocessedItems': unprocessed},
+                                                         {'UnprocessedItems': unprocessed},
+                                                         {'UnprocessedItems': {}}]
+
+        self.dynamo_client.batch_put([{'hash_col': 'cat'}, {'hash_col': 'dog'}])
+
+        self.assertEqual(self.dynamo_mock.batch_write_item.call_count, 3)
+        args, kwargs = self.dynamo_mock.batch_write_item.call_args
+        self.assertEqual(kwargs['RequestItems'], unprocessed)
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(self.dynamo_client.stats['dynamo_batch_write_retries'], 2)
+
+        # Jittered backoff never waits more than the exponential limit
+        for i, (args, kwargs) in enumerate(mock_sleep.call_args_list):
+            self.assertLessEqual(args[0], 0.05 * 2 ** i)
+
+
+    @patch.object(time, 'sleep')
+    def test_batch_write_items__raises_after_max_retries(self, mock_sleep):
+        unprocessed = {self.table_name: [{'PutRequest': {'Item': {'hash_col': {'S': 'cat'}}}}]}
+        self.dynamo_mock.batch_write_item.return_value = {'UnprocessedItems': unprocessed}
+
+        with self.assertRaises(RuntimeError):
+            self.dynamo_client.batch_put([{'hash_col': 'cat'}], max_retries=2)
+
+        self.assertEqual(self.dynamo_mock.batch_write_item.call_count, 3)
+
+
+    def test_batch_write_items__validates_condition(self):
+        item = {'Put': self.dynamo_client.build_put_query({'hash_col': 'cat'}, overwrite_existing=False)}
+
+        self.assertRaises(AssertionError, self.dynamo_client.batch_write_items, item)
+
+
     def test_get_by_query__strongly_consistent_read(self):
         with self.assertRaises(ValueError):
             self.dynamo_client.get_by_query(keys={'test': 'test'}, index_name='autotest_index', consistent_read=True)
@@ -445,6 +695,136 @@ class dynamodb_client_UnitTestCase(unittest.TestCase):
         self.assertEqual(mock_sleep.call_count, 0, "Should not have called time.sleep")
 
 
+    @patch('time.monotonic')
+    @patch.object(time, 'sleep')
+    def test_capacity_token_bucket(self, mock_sleep, mock_monotonic):
+        clock = [100.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda x: clock.__setitem__(0, clock[0] + x)
+
+        bucket = CapacityTokenBucket(rate=10, burst=20)
+
+        # Burst is available at once
+        bucket.consume(20)
+        self.assertEqual(mock_sleep.call_count, 0)
+
+        # Large items drive the bucket to debt which is restored with the rate.
+        self.assertAlmostEqual(bucket.wait(), 0.1)
+        bucket.consume(5)
+        self.assertAlmostEqual(bucket.wait(), 0.5)
+
+        # Never waits for more than the burst
+        clock[0] += 100
+        bucket.consume(100)
+        self.assertAlmostEqual(bucket.wait(50), 10.0)
+
+
+    def test_get_rate_limiter__disabled_by_default(self):
+        self.assertIsNone(self.dynamo_client.get_rate_limiter('write'))
+        self.assertIsInstance(self.dynamo_client.get_rate_limiter('write', force=True), CapacityTokenBucket)
+
+
+    def test_get_rate_limiter__shared(self):
+        config = {**self.TEST_CONFIG, 'rate_limit_to_capacity': True, 'capacity_burst_seconds': 3}
+        dynamo_client = DynamoDbClient(config=config)
+        dynamo_client.get_capacity = MagicMock(return_value={'read': 10, 'write': 5})
+
+        limiter = dynamo_client.get_rate_limiter('write')
+        self.assertEqual(limiter.rate, 5)
+        self.assertEqual(limiter.burst, 15)
+        self.assertIs(dynamo_client.get_rate_limiter('write', table_name=self.table_name), limiter)
+        self.assertIsNot(dynamo_client.get_rate_limiter('read'), limiter)
+
+
+    def test_get_rate_limiter__on_demand(self):
+        config = {**self.TEST_CONFIG, 'rate_limit_to_capacity': True}
+        dynamo_client = DynamoDbClient(config=config)
+        dynamo_client.get_capacity = MagicMock(return_value=None)
+
+        self.assertIsNone(dynamo_client.get_rate_limiter('write'))
+
+
+    def test_put__rate_limited__consumes_capacity(self):
+        config = {**self.TEST_CONFIG, 'rate_limit_to_capacity': True}
+        dynamo_client = DynamoDbClient(config=config)
+        dynamo_client.get_capacity = MagicMock(return_value={'read': 10, 'write': 5})
+        self.dynamo_mock.put_item.return_value = {
+            'ConsumedCapacity': {'TableName': self.table_name, 'CapacityUnits': 3.0}
+        }
+
+        dynamo_client.put({'hash_col': 'cat'})
+
+        args, kwargs = self.dynamo_mock.put_item.call_args
+        self.assertEqual(kwargs['ReturnConsumedCapacity'], 'TOTAL')
+        self.assertEqual(dynamo_client.stats['dynamo_consumed_write_capacity'], 3.0)
+        self.assertLess(dynamo_client.get_rate_limiter('write').tokens, 5 - 3 + 1)
+
+
+    def test_transact_write__chunks(self):
+        items = [self.dynamo_client.make_put_transaction_item({'hash_col': str(i)}, table_name='autotest_a')
+                 for i in range(250)]
+
+        self.dynamo_client.transact_write(*items[:25])
+        self.assertEqual([len(x[1]['TransactItems']) for x in self.dynamo_mock.transact_write_items.call_args_list],
+                         [10, 10, 5])
+
+        self.dynamo_mock.transact_write_items.reset_mock()
+        self.dynamo_client.transact_write(*items, max_items_per_transaction=100)
+        self.assertEqual([len(x[1]['TransactItems']) for x in self.dynamo_mock.transact_write_items.call_args_list],
+                         [100, 100, 50])
+
+        # More than the limit of the API is not allowed.
+        self.dynamo_mock.transact_write_items.reset_mock()
+        self.dynamo_client.transact_write(*items[:150], max_items_per_transaction=1000)
+        self.assertEqual([len(x[1]['TransactItems']) for x in self.dynamo_mock.transact_write_items.call_args_list],
+                         [100, 50])
+
+
+    def test_transact_write__rate_limited__multiple_tables(self):
+        config = {**self.TEST_CONFIG, 'rate_limit_to_capacity': True}
+        dynamo_client = DynamoDbClient(config=config)
+        dynamo_client.get_capacity = MagicMock(return_value={'read': 10, 'write': 5})
+        self.dynamo_mock.transact_write_items.return_value = {
+            'ConsumedCapacity': [{'TableName': 'autotest_a', 'CapacityUnits': 2.0},
+                                 {'TableName': 'autotest_b', 'CapacityUnits': 4.0}]
+        }
+
+        dynamo_client.transact_write(
+                dynamo_client.make_put_transaction_item({'hash_col': 'cat'}, table_name='autotest_a'),
+                dynamo_client.make_delete_transaction_item({'hash_col': 'cat'}, table_name='autotest_b'))
+
+        self.assertEqual(dynamo_client.stats['dynamo_consumed_write_capacity'], 6.0)
+        self.assertEqual(set(dynamo_client._rate_limiters), {('autotest_a', 'write'), ('autotest_b', 'write')})
+
+
+    @patch('time.monotonic')
+    @patch.object(time, 'sleep')
+    def test_get_by_query_generator__rate_limited(self, mock_sleep, mock_monotonic):
+        clock = [100.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda x: clock.__setitem__(0, clock[0] + x)
+
+        config = {**self.TEST_CONFIG, 'rate_limit_to_capacity': True}
+        dynamo_client = DynamoDbClient(config=config)
+        dynamo_client.get_capacity = MagicMock(return_value={'read': 1, 'write': 1})
+        self.paginator_mock.paginate.return_value = [
+            {'Items': [{'hash_col': {'S': 'a'}}], 'ConsumedCapacity': {'CapacityUnits': 2.0},
+             'LastEvaluatedKey': {'hash_col': {'S': 'a'}}},
+            {'Items': [{'hash_col': {'S': 'b'}}], 'ConsumedCapacity': {'CapacityUnits': 0.5}},
+        ]
+
+        result = dynamo_client.get_by_query(keys={'hash_col': 'a'})
+
+        self.assertEqual(len(result), 2)
+        args, kwargs = self.paginator_mock.paginate.call_args
+        self.assertEqual(kwargs['ReturnConsumedCapacity'], 'TOTAL')
+        self.assertEqual(dynamo_client.stats['dynamo_consumed_read_capacity'], 2.5)
+
+        # After the first page the bucket is in debt of 1 RCU, so waits before requesting the second one.
+        mock_sleep.assert_called_once_with(2.0)
+        self.assertEqual(dynamo_client.stats['dynamo_capacity_wait_time'], 2.0)
+
+
     def test_on_demand_provisioned_throughput__get_capacity(self):
         self.dynamo_client.dynamo_client = MagicMock()
         self.dynamo_client.dynamo_client.describe_table.return_value = {'TableName': 'autotest_OnDemand'}
@@ -546,6 +546,13 @@ class helpers_UnitTestCase(unittest.TestCase):
         self.assertIsNone(recursive_update(a, b)['b'])
 
 
+    def test_recursive_update__overwrites_none_with_dict(self):
+        a = {'a': 1, 'b': None}
+        b = {'b': {'b1': 21}}
+
+        self.assertEqual(recursive_update(a, b)['b'], {'b1': 21})
+
+
     def test_recursive_update__unhashable_types_in_lists(self):
 
         # The first element in a list is identical (and should not be duplicated).
@@ -0,0 +1,268 @@
+import os
+import unittest
+
+from botocore.exceptions import ClientError
+from unittest.mock import patch
+
+os.environ["STAGE"] = "test"
+os.environ["autotest"] = "True"
+
+from sosw.components.dynamo_db import DynamoDbClient
+from sosw.components.memory_dynamo_db import MemoryDynamoDb, get_memory_dynamo_db
+
+
+class MemoryDynamoDb_UnitTestCase(unittest.TestCase):
+    TEST_CONFIG = {
+        'row_mapper':      {
+            'hash_col':  'S',
+            'range_col': 'N',
+            'other_col': 'S',
+            'counter':   'N',
+        },
+        'required_fields': ['hash_col', 'range_col'],
+        'table_name':      'autotest_memory',
+        'hash_key':        'hash_col',
+    }
+
+
+    def setUp(self):
+        self.backend = MemoryDynamoDb()
+        self.backend.create_table(
+                TableName='autotest_memory',
+                KeySchema=[{'AttributeName': 'hash_col', 'KeyType': 'HASH'},
+                           {'AttributeName': 'range_col', 'KeyType': 'RANGE'}],
+                GlobalSecondaryIndexes=[{
+                    'IndexName':  'autotest_memory_other',
+                    'KeySchema':  [{'AttributeName': 'other_col', 'KeyType': 'HASH'},
+                                   {'AttributeName': 'range_col', 'KeyType': 'RANGE'}],
+                    'Projection': {'ProjectionType': 'KEYS_ONLY'},
+                }])
+
+        self.dynamo_db_client = DynamoDbClient(config={**self.TEST_CONFIG, 'backend': self.backend})
+
+
+    def put_rows(self, count=10):
+        self.dynamo_db_client.batch_put([{'hash_col': 'cat' if i % 2 else 'dog', 'range_col': i, 'other_col': str(i % 3)}
+                                         for i in range(count)])
+
+
+    def test_backend__memory(self):
+        get_memory_dynamo_db().reset()
+        get_memory_dynamo_db().create_sosw_tables(prefix='autotest_')
+
+        client = DynamoDbClient(config={**self.TEST_CONFIG, 'table_name': 'autotest_sosw_tasks', 'backend': 'memory'})
+        self.assertIs(client.dynamo_client, get_memory_dynamo_db())
+        self.assertEqual(client.get_table_keys(), ('task_id', None))
+        self.assertIn('autotest_sosw_tasks_greenfield', client.get_table_indexes())
+
+        get_memory_dynamo_db().reset()
+
+
+    def test_describe_table__missing(self):
+        with self.assertRaises(ClientError) as e:
+            DynamoDbClient(config={**self.TEST_CONFIG, 'table_name': 'autotest_missing', 'backend': self.backend})
+        self.assertEqual(e.exception.response['Error']['Code'], 'ResourceNotFoundException')
+
+
+    def test_put_and_get_by_query(self):
+        self.put_rows()
+
+        result = self.dynamo_db_client.get_by_query(keys={'hash_col': 'cat', 'range_col': 5},
+                                                    comparisons={'range_col': '<='})
+        self.assertEqual([x['range_col'] for x in result], [1, 3, 5])
+
+        result = self.dynamo_db_client.get_by_query(keys={'hash_col': 'dog'}, desc=True, max_items=2)
+        self.assertEqual([x['range_col'] for x in result], [8, 6])
+
+        result = self.dynamo_db_client.get_by_query(keys={'hash_col': 'dog'}, filter_expression='range_col >= 5')
+        self.assertEqual([x['range_col'] for x in result], [6, 8])
+
+        result = self.dynamo_db_client.get_by_query(keys={'hash_col': 'cat', 'st_between_range_col': 2,
+                                                          'en_between_range_col': 6})
+        self.assertEqual([x['range_col'] for x in result], [3, 5])
+
+        self.assertEqual(self.dynamo_db_client.get_by_query(keys={'hash_col': 'cat'}, return_count=True), 5)
+
+
+    def test_get_by_query__index(self):
+        self.put_rows()
+
+        result = self.dynamo_db_client.get_by_query(keys={'other_col': '1', 'range_col': 4},
+                                                    comparisons={'range_col': '>='}, index_name='autotest_memory_other')
+
+        self.assertEqual([(x['hash_col'], x['range_col']) for x in result], [('dog', 4), ('cat', 7)])
+
+
+    def test_get_by_query__pages(self):
+        self.put_rows(100)
+
+        pages = list(self.dynamo_db_client.get_by_query_generator(keys={'hash_col': 'cat'}, max_items=30))
+
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(pages[0]), 30)
+
+        # Limit of the underlying Query splits the result to pages.
+        pages = list(self.backend.get_paginator('query').paginate(
+                TableName='autotest_memory', KeyConditionExpression='hash_col = :h',
+                ExpressionAttributeValues={':h': {'S': 'cat'}}, PaginationConfig={'PageSize': 20}))
+        self.assertEqual([len(x['Items']) for x in pages], [20, 20, 10])
+
+
+    def test_query__pages_in_both_directions(self):
+        self.put_rows(50)
+        query = dict(TableName='autotest_memory', KeyConditionExpression='hash_col = :h',
+                     ExpressionAttributeValues={':h': {'S': 'cat'}}, PaginationConfig={'PageSize': 7})
+
+        for forward in (True, False):
+            pages = list(self.backend.get_paginator('query').paginate(ScanIndexForward=forward, **query))
+            result = [int(x['range_col']['N']) for page in pages for x in page['Items']]
+            self.assertEqual(result, sorted(range(1, 50, 2), reverse=not forward))
+
+        # The page starts after the ExclusiveStartKey even if that item was deleted meanwhile.
+        page = self.backend.query(TableName='autotest_memory', KeyConditionExpression='hash_col = :h',
+                                  ExpressionAttributeValues={':h': {'S': 'cat'}}, Limit=2)
+        self.dynamo_db_client.delete({'hash_col': 'cat', 'range_col': 3})
+        page = self.backend.query(TableName='autotest_memory', KeyConditionExpression='hash_col = :h',
+                                  ExpressionAttributeValues={':h': {'S': 'cat'}}, Limit=2,
+                                  ExclusiveStartKey=page['LastEvaluatedKey'])
+        self.assertEqual([x['range_col']['N'] for x in page['Items']], ['5', '7'])
+
+
+    def test_sosw_tables__closed_tasks_projection(self):
+        backend = MemoryDynamoDb()
+        backend.create_sosw_tables(prefix='autotest_')
+        backend.put_item(TableName='autotest_sosw_closed_tasks', Item={
+            'task_id': {'S': '1'}, 'labourer_id_task_status': {'S': 'some_lambda_1'}, 'closed_at': {'N': '100'},
+            'completed_at': {'N': '90'}, 'attempts': {'N': '1'}, 'payload': {'S': '{}'}})
+
+        page = backend.query(TableName='autotest_sosw_closed_tasks',
+                             IndexName='autotest_labourer_task_status_with_time', KeyConditionExpression='labourer_id_task_status = :l',
+                             ExpressionAttributeValues={':l': {'S': 'some_lambda_1'}})
+
+        self.assertEqual(set(page['Items'][0]), {'task_id', 'labourer_id_task_status', 'closed_at', 'completed_at',
+                                                 'attempts'})
+
+
+    def test_get_by_scan__segments(self):
+        self.put_rows(50)
+
+        self.assertEqual(len(self.dynamo_db_client.get_by_scan()), 50)
+        self.assertEqual(len(self.dynamo_db_client.get_by_scan(attrs={'hash_col': 'cat'})), 25)
+
+        result = self.dynamo_db_client.get_by_scan(total_segments=4)
+        self.assertEqual(sorted(x['range_col'] for x in result), list(range(50)))
+
+
+    def test_create__conditional(self):
+        row = {'hash_col': 'cat', 'range_col': 1}
+        self.dynamo_db_client.create(row)
+
+        with self.assertRaises(ClientError) as e:
+            self.dynamo_db_client.create(row)
+        self.assertEqual(e.exception.response['Error']['Code'], 'ConditionalCheckFailedException')
+
+
+    def test_update(self):
+        keys = {'hash_col': 'cat', 'range_col': 1}
+
+        self.dynamo_db_client.update(keys, attributes_to_update={'other_col': 'foo'},
+                                     attributes_to_increment={'counter': 2})
+        self.dynamo_db_client.update(keys, attributes_to_increment={'counter': 3})
+
+        row = self.dynamo_db_client.get_by_query(keys=keys)[0]
+        self.assertEqual(row, {'hash_col': 'cat', 'range_col': 1, 'other_col': 'foo', 'counter': 5})
+
+        self.dynamo_db_client.update(keys, attributes_to_remove=['other_col'],
+                                     attributes_to_update={'counter': 0}, condition_expression='counter = 5')
+        self.assertEqual(self.dynamo_db_client.get_by_query(keys=keys)[0], {'hash_col': 'cat', 'range_col': 1,
+                                                                           'counter': 0})
+
+        self.assertRaises(ClientError, self.dynamo_db_client.update, keys, attributes_to_update={'counter': 7},
+                          condition_expression='counter > 1')
+
+        # Patch requires the item to exist.
+        self.assertRaises(ClientError, self.dynamo_db_client.patch, {'hash_col': 'cat', 'range_col': 2},
+                          attributes_to_update={'counter': 1})
+
+
+    def test_batch_get_and_delete(self):
+        self.put_rows()
+
+        keys = [{'hash_col': 'cat', 'range_col': 1}, {'hash_col': 'dog', 'range_col': 2},
+                {'hash_col': 'dog', 'range_col': 3}]
+        result = self.dynamo_db_client.batch_get_items_one_table(keys)
+        self.assertEqual(sorted(x['range_col'] for x in result), [1, 2])
+
+        self.dynamo_db_client.batch_delete(keys[:2])
+        self.dynamo_db_client.delete({'hash_col': 'cat', 'range_col': 3})
+        self.assertEqual(len(self.dynamo_db_client.get_by_scan()), 7)
+
+        # The indexes are updated as well.
+        self.assertEqual(self.dynamo_db_client.get_by_query(keys={'other_col': '1'}, index_name='autotest_memory_other',
+                                                            return_count=True), 2)
+
+
+    def test_transact_write__atomic(self):
+        self.dynamo_db_client.put({'hash_col': 'cat', 'range_col': 1})
+
+        put = self.dynamo_db_client.make_put_transaction_item({'hash_col': 'cat', 'range_col': 2})
+        delete = self.dynamo_db_client.make_delete_transaction_item({'hash_col': 'cat', 'range_col': 1},
+                                                                    'autotest_memory')
+        self.dynamo_db_client.transact_write(put, delete)
+        self.assertEqual([x['range_col'] for x in self.dynamo_db_client.get_by_scan()], [2])
+
+        # One failed condition cancels the whole transaction.
+        create = {'Put': self.dynamo_db_client.build_put_query({'hash_col': 'cat', 'range_col': 2},
+                                                               overwrite_existing=False)}
+        another = self.dynamo_db_client.make_put_transaction_item({'hash_col': 'cat', 'range_col': 3})
+
+        with self.assertRaises(ClientError) as e:
+            self.backend.transact_write_items(TransactItems=[another, create])
+        self.assertEqual(e.exception.response['Error']['Code'], 'TransactionCanceledException')
+        self.assertEqual([x['range_col'] for x in self.dynamo_db_client.get_by_scan()], [2])
+
+
+    def test_throttling(self):
+        clock = [1000.0]
+
+        def sleep(seconds):
+            clock[0] += max(seconds, 0.2)
+
+        with patch('time.monotonic', side_effect=lambda: clock[0]), patch('time.sleep', side_effect=sleep):
+            backend = MemoryDynamoDb(simulate_throttling=True)
+            backend.create_table(TableName='autotest_memory',
+                                 KeySchema=[{'AttributeName': 'hash_col', 'KeyType': 'HASH'}],
+                                 ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5})
+            client = DynamoDbClient(config={**self.TEST_CONFIG, 'backend': backend})
+
+            for i in range(5):
+                client.put({'hash_col': str(i), 'range_col': i})
+
+            with self.assertRaises(ClientError) as e:
+                client.put({'hash_col': 'x', 'range_col': 0})
+            self.assertEqual(e.exception.response['Error']['Code'], 'ProvisionedThroughputExceededException')
+
+            # Half a second restores capacity only for a part of the batch. The rest is retried as unprocessed.
+            clock[0] += 0.5
+            client.batch_put([{'hash_col': str(i), 'range_col': i} for i in range(10, 16)])
+
+        self.assertEqual(len(client.get_by_scan()), 11)
+        self.assertGreater(client.stats['dynamo_batch_write_retries'], 0)
+        self.assertEqual(backend.stats['throttled_calls'], 1)
+
+
+    def test_consumed_capacity__rate_limiter(self):
+        backend = MemoryDynamoDb()
+        backend.create_table(TableName='autotest_memory', KeySchema=[{'AttributeName': 'hash_col', 'KeyType': 'HASH'}],
+                             ProvisionedThroughput={'ReadCapacityUnits': 1000, 'WriteCapacityUnits': 1000})
+        client = DynamoDbClient(config={**self.TEST_CONFIG, 'backend': backend, 'rate_limit_to_capacity': True})
+
+        client.put({'hash_col': 'a', 'range_col': 1})
+        client.get_by_query(keys={'hash_col': 'a'})
+
+        self.assertEqual(client.stats['dynamo_consumed_write_capacity'], 1)
+        self.assertEqual(client.stats['dynamo_consumed_read_capacity'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+os.environ["STAGE"] = "test"
+os.environ["autotest"] = "True"
+
+from sosw.components.queue_file import QueueFile, zstandard
+
+
+class QueueFile_UnitTestCase(unittest.TestCase):
+    SUFFIX = '.txt'
+
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.tmp_dir.name, f"tasks_queue{self.SUFFIX}")
+        self.queue_file = QueueFile(self.file_name, block_rows=3)
+        self.rows = [f"row{i}" for i in range(10)]
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def read_all(self):
+        return [x.rstrip('\n') for x in QueueFile(self.file_name).read_rows(rows=1000)]
+
+
+    def test_get_codec(self):
+        self.assertIsNone(QueueFile.get_codec('tasks_queue.txt'))
+        self.assertEqual(QueueFile.get_codec('tasks_queue.txt.gz'), 'gzip')
+        self.assertEqual(QueueFile.get_codec('tasks_queue.txt.zst'), 'zstd')
+
+
+    def test_split_codec_suffix(self):
+        self.assertEqual(QueueFile.split_codec_suffix('tasks_queue.txt'), ('tasks_queue.txt', ''))
+        self.assertEqual(QueueFile.split_codec_suffix('tasks_queue.txt.gz'), ('tasks_queue.txt', '.gz'))
+
+
+    def test_read_rows(self):
+        self.assertEqual(self.queue_file.append_rows(iter(self.rows)), 10)
+
+        self.assertEqual(self.queue_file.read_rows(rows=4), [f"row{i}\n" for i in range(4)])
+        self.assertEqual(self.queue_file.read_rows(rows=4), [f"row{i}\n" for i in range(4, 8)])
+
+        # The offset is persisted, so a new instance continues from it.
+        self.assertEqual(QueueFile(self.file_name, block_rows=3).read_rows(rows=4), ['row8\n', 'row9\n'])
+        self.assertEqual(self.queue_file.read_rows(rows=4), [])
+
+        # Reading does not modify the file.
+        self.queue_file.remove_offset_file()
+        self.assertEqual(self.read_all(), self.rows)
+
+
+    def test_read_rows__missing_file(self):
+        self.assertEqual(self.queue_file.read_rows(rows=5), [])
+        self.assertFalse(os.path.exists(self.queue_file.offset_file_name))
+
+
+    def test_compact(self):
+        self.queue_file.append_rows(self.rows)
+        self.queue_file.read_rows(rows=4)
+
+        self.queue_file.compact()
+
+        self.assertFalse(os.path.exists(self.queue_file.offset_file_name))
+        self.assertEqual(self.read_all(), self.rows[4:])
+
+
+    def test_compact__fully_read(self):
+        self.queue_file.append_rows(self.rows)
+        self.queue_file.read_rows(rows=20)
+
+        self.queue_file.compact()
+
+        self.assertFalse(os.path.exists(self.file_name))
+
+
+    def test_append_rows__after_read(self):
+        self.queue_file.append_rows(self.rows[:5])
+        self.queue_file.read_rows(rows=2)
+
+        self.queue_file.append_rows(self.rows[5:])
+
+        self.assertEqual(self.queue_file.read_rows(rows=20), [f"{x}\n" for x in self.rows[2:]])
+
+
+class QueueFileGzip_UnitTestCase(QueueFile_UnitTestCase):
+    SUFFIX = '.txt.gz'
+
+
+    def test_file_is_valid_gzip(self):
+        self.queue_file.append_rows(self.rows)
+
+        with gzip.open(self.file_name, 'rt') as f:
+            self.assertEqual(f.read().splitlines(), self.rows)
+
+
+    def test_read_rows__offset_in_frame(self):
+        self.queue_file.append_rows(self.rows)
+
+        self.queue_file.read_rows(rows=4)
+
+        position, skip = self.queue_file.get_read_offset()
+        self.assertGreater(position, 0)
+        self.assertEqual(skip, 1)
+
+
+    def test_read_rows__truncated_frame(self):
+        self.queue_file.append_rows(self.rows)
+        with open(self.file_name, 'rb+') as f:
+            f.truncate(os.path.getsize(self.file_name) - 5)
+
+        with self.assertRaises(ValueError):
+            self.queue_file.read_rows(rows=20)
+
+
+class QueueFileCodec_UnitTestCase(unittest.TestCase):
+
+    @patch('sosw.components.queue_file.zstandard', None)
+    def test_zstd__without_package(self):
+        with self.assertRaises(ImportError) as e:
+            QueueFile('/tmp/tasks_queue.txt.zst')
+        self.assertIn("sosw[zstd]", str(e.exception))
+
+        # Other codecs do not need it.
+        QueueFile('/tmp/tasks_queue.txt.gz')
+
+
+@unittest.skipIf(zstandard is None, "Package `zstandard` is not installed")
+class QueueFileZstd_UnitTestCase(QueueFile_UnitTestCase):
+    SUFFIX = '.txt.zst'
+
+
+if __name__ == '__main__':
+    unittest.main()
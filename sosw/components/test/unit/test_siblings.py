@@ -1,6 +1,7 @@
 import unittest
 import os
 
+from botocore.exceptions import ClientError
 from unittest.mock import MagicMock
 from unittest import mock
 
@@ -76,7 +77,13 @@ class siblings_TestCase(unittest.TestCase):
 
         client = MagicMock()
         for experiment in mock_get_metric_statistics_responses:
-            client.get_metric_statistics = MagicMock(return_value=experiment, side_effect=None)
+            datapoint = experiment['Datapoints'][0]
+            client.get_metric_data = MagicMock(return_value={
+                'MetricDataResults': [
+                    {'Id': 'duration', 'Values': [datapoint['Average']]},
+                    {'Id': 'invocations', 'Values': [datapoint['Sum']]},
+                ]
+            })
             mock_boto_client.return_value = client
 
             # Reimport the component
@@ -84,6 +91,56 @@ class siblings_TestCase(unittest.TestCase):
 
             self.assertEqual(SiblingsManager(custom_config=self.CUSTOM_CONFIG).get_approximate_concurrent_executions(),
                              experiment['function_expected_result'])
+            client.get_metric_data.assert_called_once()
+
+
+    @mock.patch("boto3.client")
+    def test_get_approximate_concurrent_executions__no_data(self, mock_boto_client):
+        client = MagicMock()
+        client.get_metric_data.return_value = {
+            'MetricDataResults': [{'Id': 'duration', 'Values': []}, {'Id': 'invocations', 'Values': []}]
+        }
+        mock_boto_client.return_value = client
+
+        from sosw.components.siblings import SiblingsManager
+
+        self.assertEqual(SiblingsManager(custom_config=self.CUSTOM_CONFIG).get_approximate_concurrent_executions(), 0)
+
+
+    @mock.patch("boto3.client")
+    def test_get_approximate_concurrent_executions__metric_data_access_denied(self, mock_boto_client):
+        client = MagicMock()
+        client.get_metric_data.side_effect = ClientError(
+                {'Error': {'Code': 'AccessDenied', 'Message': "Not authorized"}}, 'GetMetricData')
+        client.get_metric_statistics.side_effect = lambda **kw: {
+            'Datapoints': [{'Average': 65000.0}] if kw['MetricName'] == 'Duration' else [{'Sum': 5}]
+        }
+        mock_boto_client.return_value = client
+
+        from sosw.components.siblings import SiblingsManager
+
+        manager = SiblingsManager(custom_config=self.CUSTOM_CONFIG)
+        self.assertEqual(manager.get_approximate_concurrent_executions(), 2)
+        self.assertEqual(manager.get_approximate_concurrent_executions(), 2)
+
+        # GetMetricData is not retried after AccessDenied.
+        client.get_metric_data.assert_called_once()
+        self.assertEqual(client.get_metric_statistics.call_count, 4)
+
+
+    @mock.patch("boto3.client")
+    def test_get_approximate_concurrent_executions__other_errors_raised(self, mock_boto_client):
+        client = MagicMock()
+        client.get_metric_data.side_effect = ClientError({'Error': {'Code': 'Throttling', 'Message': "Slow down"}},
+                                                         'GetMetricData')
+        mock_boto_client.return_value = client
+
+        from sosw.components.siblings import SiblingsManager
+
+        with self.assertRaises(ClientError):
+            SiblingsManager(custom_config=self.CUSTOM_CONFIG).get_approximate_concurrent_executions()
+
+        client.get_metric_statistics.assert_not_called()
 
 
     @mock.patch("boto3.client")
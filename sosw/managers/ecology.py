@@ -47,6 +47,7 @@ import json
 import operator
 import os
 import random
+import threading
 import time
 
 from collections import defaultdict
@@ -54,10 +55,11 @@ from collections import OrderedDict
 from statistics import mean
 from typing import Dict, List, Optional, Union
 
+from botocore.exceptions import ClientError
 from sosw.app import Processor
 from sosw.labourer import Labourer
 from sosw.components.benchmark import benchmark
-from sosw.components.helpers import make_hash
+from sosw.components.helpers import chunks, make_hash
 from sosw.managers.task import TaskManager
 
 
@@ -71,6 +73,18 @@ ECO_STATUSES = (
 
 
 class EcologyManager(Processor):
+    METRIC_COMPARATORS = {
+        'Average': mean,
+        'Maximum': max,
+        'Minimum': min,
+    }
+
+    # Limit of CloudWatch ``get_metric_data`` for the number of ``MetricDataQueries`` in one call.
+    METRIC_DATA_QUERIES_PER_CALL = 500
+
+    # Set after the Role was denied ``cloudwatch:GetMetricData``, then ``GetMetricStatistics`` is used instead.
+    metric_data_access_denied = False
+
     DEFAULT_CONFIG = {
         'init_clients': ['cloudwatch'],
         'default_metric_values':
@@ -78,7 +92,15 @@ class EcologyManager(Processor):
                             'Period':                     60,
                             'Statistics':                 ['Average'],
                             'MetricAggregationTimeSlice': 300
-                        }
+                        },
+
+        # Fetched values of health metrics survive warm invocations for this number of metric ``Period``-s.
+        # The values are averaged over ``MetricAggregationTimeSlice`` (5 Periods by default), so an Orchestrator
+        # scheduled every minute would mostly fetch the same value again. 3 Periods keep the cache useful for such
+        # schedules while the status still reacts within a part of the aggregation window.
+        # Could be overwritten per metric with ``cache_ttl_periods`` in the health metric config of the Labourer.
+        # With 0 the values are cached only during one invocation (until next ``register_task_manager()``).
+        'health_metrics_cache_ttl_periods': 3,
     }
 
     running_tasks = defaultdict(int)
@@ -90,6 +112,10 @@ class EcologyManager(Processor):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self.health_metrics = dict()
+        self.health_metrics_expire_at = dict()
+        self._stats_lock = threading.Lock()
+
 
     def __call__(self, event):
         raise NotImplementedError
@@ -110,8 +136,44 @@ class EcologyManager(Processor):
         logger.info("Reset cache of running_tasks counter in EcologyManager")
         self.running_tasks = defaultdict(int)
 
-        logger.info("Reset cache of health_metrics in EcologyManager")
-        self.health_metrics = dict()
+        self.evict_expired_health_metrics()
+
+
+    def evict_expired_health_metrics(self):
+        """
+        Remove from the cache of ``health_metrics`` the values that are older than their TTL and the ones cached
+        only for the previous invocation. Values without the recorded expiration time (e.g. set manually) never expire.
+        """
+
+        now = time.monotonic()
+        expired = [k for k, expire_at in self.health_metrics_expire_at.items() if expire_at is None or expire_at <= now]
+
+        for metric_hash in expired:
+            self.health_metrics.pop(metric_hash, None)
+            self.health_metrics_expire_at.pop(metric_hash, None)
+
+        logger.info(f"Evicted {len(expired)} expired values from the cache of health_metrics in EcologyManager. "
+                    f"Remaining: {len(self.health_metrics)}")
+
+
+    def is_health_metric_cached(self, metric_hash: str) -> bool:
+        """ Check that the cache has a value of the metric that is not expired yet. The expired value is evicted. """
+
+        expire_at = self.health_metrics_expire_at.get(metric_hash)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self.health_metrics.pop(metric_hash, None)
+            self.health_metrics_expire_at.pop(metric_hash, None)
+
+        return metric_hash in self.health_metrics
+
+
+    def get_health_metric_ttl(self, health_metric: Dict) -> int:
+        """ Number of seconds to cache the fetched value of the `health_metric`. """
+
+        periods = health_metric.get('cache_ttl_periods', self.config['health_metrics_cache_ttl_periods'])
+        period = health_metric['details'].get('Period') or self.config['default_metric_values']['Period']
+
+        return int(periods * period)
 
 
     @property
@@ -132,12 +194,6 @@ class EcologyManager(Processor):
 
         _cfg = self.config.get
 
-        COMPARATORS = {
-            'Average': mean,
-            'Maximum': max,
-            'Minimum': min,
-        }
-
         params = metric.copy()
 
         # Setting up default metric parameters if unspecified for current metric.
@@ -157,11 +213,142 @@ class EcologyManager(Processor):
         result = self.cloudwatch_client.get_metric_statistics(**params)
 
         comparator_name = params['Statistics'][0]
-        comparator = COMPARATORS[comparator_name]
+        comparator = self.METRIC_COMPARATORS[comparator_name]
 
         return comparator(x[comparator_name] for x in result.get('Datapoints', list()))
 
 
+    def batch_fetch_metric_stats(self, metrics: List[Dict]) -> List[Union[int, float]]:
+        """
+        Batched version of ``fetch_metric_stats``. Fetches the aggregated statistics of many `metrics` with as few
+        calls to CloudWatch get_metric_data_ as possible: up to ``METRIC_DATA_QUERIES_PER_CALL`` metrics per call.
+
+        .. _get_metric_data: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/cloudwatch.html#CloudWatch.Client.get_metric_data
+
+        The `metrics` have the same format as for ``fetch_metric_stats`` and the values are aggregated the same way.
+        Metrics with different ``MetricAggregationTimeSlice`` are fetched in separate calls, because the time range
+        is common for all the queries of a call.
+
+        ..  warning:: Requires the ``cloudwatch:GetMetricData`` permission, older deployments granted only
+                      ``cloudwatch:GetMetricStatistics``. After AccessDenied the metrics are fetched one by one
+                      with ``fetch_metric_stats`` and a warning is logged.
+
+        :return: Values in the same order as `metrics`.
+        """
+
+        if self.metric_data_access_denied:
+            return [self.fetch_metric_stats(metric) for metric in metrics]
+
+        _cfg = self.config.get
+
+        queries_by_time_slice = defaultdict(list)
+        statistics = []
+
+        for i, metric in enumerate(metrics):
+            params = {**_cfg('default_metric_values', {}), **metric}
+
+            assert len(params['Statistics']) == 1, "Complex statistics aggregation is not yet supported"
+            statistics.append(params['Statistics'][0])
+
+            metric_stat = {
+                'Metric': {
+                    'Namespace':  params['Namespace'],
+                    'MetricName': params.get('MetricName') or params['Name'],
+                    'Dimensions': params.get('Dimensions', []),
+                },
+                'Period': int(params['Period']),
+                'Stat':   params['Statistics'][0],
+            }
+            if params.get('Unit'):
+                metric_stat['Unit'] = params['Unit']
+
+            queries_by_time_slice[int(params['MetricAggregationTimeSlice'])].append(
+                    {'Id': f"m{i}", 'MetricStat': metric_stat, 'ReturnData': True})
+
+        values = defaultdict(list)
+        end_time = datetime.datetime.now()
+
+        try:
+            for duration, queries in queries_by_time_slice.items():
+                start_time = end_time - datetime.timedelta(seconds=duration)
+                for batch in chunks(queries, self.METRIC_DATA_QUERIES_PER_CALL):
+                    for query_id, query_values in self.get_metric_data(batch, start_time, end_time).items():
+                        values[query_id].extend(query_values)
+        except ClientError as err:
+            if err.response.get('Error', {}).get('Code') not in ('AccessDenied', 'AccessDeniedException'):
+                raise
+            logger.warning("The Role is not allowed cloudwatch:GetMetricData, falling back to GetMetricStatistics "
+                           "for every metric. Please grant the permission.")
+            self.metric_data_access_denied = True
+            return [self.fetch_metric_stats(metric) for metric in metrics]
+
+        return [self.METRIC_COMPARATORS[statistic](values[f"m{i}"]) for i, statistic in enumerate(statistics)]
+
+
+    def get_metric_data(self, queries: List[Dict], start_time: datetime.datetime,
+                        end_time: datetime.datetime) -> Dict[str, List[float]]:
+        """
+        Call CloudWatch get_metric_data_ for the `queries` and follow the pagination.
+
+        :return: Values of every query by its ``Id``.
+        """
+
+        result = defaultdict(list)
+        params = dict(MetricDataQueries=queries, StartTime=start_time, EndTime=end_time)
+
+        while True:
+            logger.debug(f"Query to CloudWatch `get_metric_data` for {len(queries)} metrics")
+            response = self.cloudwatch_client.get_metric_data(**params)
+            with self._stats_lock:
+                self.stats['cloudwatch_get_metric_data_calls'] += 1
+
+            for metric_result in response.get('MetricDataResults', []):
+                result[metric_result['Id']].extend(metric_result.get('Values', []))
+
+            if not response.get('NextToken'):
+                return dict(result)
+
+            params['NextToken'] = response['NextToken']
+
+
+    def prefetch_health_metrics(self, labourers: List[Labourer]):
+        """
+        Fetch the values of all the health metrics of `labourers` that are missing in the cache
+        with ``batch_fetch_metric_stats``, so that ``get_labourer_status`` finds them in the cache afterwards.
+        """
+
+        missing = {}
+        for labourer in labourers:
+            for health_metric in (getattr(labourer, 'health_metrics', {}) or {}).values():
+                metric_hash = make_hash(health_metric['details'])
+                if not self.is_health_metric_cached(metric_hash):
+                    missing.setdefault(metric_hash, health_metric)
+
+        if not missing:
+            return
+
+        values = self.batch_fetch_metric_stats([x['details'] for x in missing.values()])
+
+        for (metric_hash, health_metric), value in zip(missing.items(), values):
+            self.cache_health_metric(metric_hash, health_metric, value)
+
+        logger.info(f"Prefetched {len(missing)} health metrics for {len(labourers)} Labourers")
+
+
+    def cache_health_metric(self, metric_hash: str, health_metric: Dict, value: Union[int, float]):
+        """ Save the fetched `value` of the `health_metric` to the cache for its TTL. """
+
+        ttl = self.get_health_metric_ttl(health_metric)
+
+        self.health_metrics[metric_hash] = value
+        # Values with TTL 0 stay only until the next ``register_task_manager()``.
+        self.health_metrics_expire_at[metric_hash] = time.monotonic() + ttl if ttl else None
+        logger.info(f"Updated the cache of Ecology metric {metric_hash} - {health_metric} with {value}")
+
+        with self._stats_lock:
+            self.stats['health_metrics_cache_misses'] += 1
+
+
     def get_labourer_status(self, labourer: Labourer) -> int:
         """
         Get the worst (lowest) health status according to preconfigured health metrics of the Labourer.
@@ -185,10 +372,12 @@ class EcologyManager(Processor):
         for health_metric in metrics.values():
 
             metric_hash = make_hash(health_metric['details'])
-            if metric_hash not in self.health_metrics:
-                self.health_metrics[metric_hash] = self.fetch_metric_stats(metric=health_metric['details'])
-                logger.info(f"Updated the cache of Ecology metric {metric_hash} - {health_metric} "
-                            f"with {self.health_metrics[metric_hash]}")
+            if not self.is_health_metric_cached(metric_hash):
+                value = self.fetch_metric_stats(metric=health_metric['details'])
+                self.cache_health_metric(metric_hash, health_metric, value)
+            else:
+                with self._stats_lock:
+                    self.stats['health_metrics_cache_hits'] += 1
 
             value = self.health_metrics[metric_hash]
             logger.debug(f"Ecology metric {metric_hash} has {value}")
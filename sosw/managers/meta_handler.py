@@ -41,23 +41,40 @@ except ImportError:
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
+import queue
+import threading
 import time
 
 
 from sosw.app import global_vars
 from sosw.components.dynamo_db import DynamoDbClient
 from sosw.components.helpers import recursive_update
-from typing import Dict
+from typing import Dict, Iterable, List
 
 
 class MetaHandler:
     """
     MetaHandler is helper class for Essential classes.
     It works with DynamoDB table to store the meta data of operations on Tasks.
+
+    In the ``buffered`` mode ``post`` and ``post_many`` only queue the rows in memory. The buffer is flushed with batch
+    writes when it reaches ``buffer_max_rows``, when the oldest row in it is older than ``buffer_max_age_seconds``
+    (checked by a timer thread, so also if nothing else is posted) or explicitly with ``flush()``. The lambda handler
+    from ``get_lambda_handler`` flushes the buffer before returning. Only this ``flush()`` guarantees delivery:
+    the timer does not run while the Lambda container is frozen between invocations.
+
+    With ``async_write`` the rows are handed to a background writer thread through a queue of at most
+    ``async_queue_max_rows`` rows, so the caller does not wait for DynamoDB. When the queue is full, the caller blocks
+    until the writer catches up. ``flush()`` drains the queue. Can be combined with the ``buffered`` mode.
     """
 
     DEFAULT_CONFIG = {
-        'write_meta_to_ddb': True,
+        'write_meta_to_ddb':      True,
+        'buffered':               False,
+        'buffer_max_rows':        100,
+        'buffer_max_age_seconds': 10,
+        'async_write':            False,
+        'async_queue_max_rows':   1000,
         'dynamo_db_config': {
             'table_name': 'sosw_tasks_meta',
             'hash_key': 'task_id',
@@ -104,6 +121,14 @@ class MetaHandler:
         else:
             self.dynamo_db_client = None
 
+        self._buffer: List[Dict] = []
+        self._buffer_created_at = None
+        self._buffer_lock = threading.Lock()
+        self._age_timer = None
+
+        self._queue = queue.Queue(maxsize=self.config['async_queue_max_rows'])
+        self._writer_thread = None
+
         logger.info("Initialized MetaHandler with config %s and DynamoDbClient %s", self.config, self.dynamo_db_client)
 
 
@@ -119,8 +144,166 @@ class MetaHandler:
          * ``'author'``
          * ``'invocation_id'``
          * ``'log_stream_name'``
+
+        In the ``buffered`` mode the row is only queued. See ``flush()``.
+        """
+
+        row = self._make_row(task_id=task_id, action=action, **kwargs)
+
+        if self.config['buffered']:
+            self._add_to_buffer([row])
+        elif self.config['async_write'] and self.dynamo_db_client:
+            self._enqueue([row])
+        elif self.dynamo_db_client:
+            self.dynamo_db_client.create(row=row)
+        else:
+            logger.info("DynamoDB client/table is not configured for meta_handler. Skip saving task meta data: %s", row)
+
+
+    def post_many(self, task_ids: Iterable[str], action: str, **kwargs):
         """
+        Same as ``post`` for many tasks with the same ``action`` and ``kwargs``.
+        The rows are written with batch writes: one call to DynamoDB per 25 rows.
+
+        ..  warning:: Unlike ``post``, does not validate that the rows do not exist yet.
+        """
+
+        rows = [self._make_row(task_id=task_id, action=action, **kwargs) for task_id in task_ids]
+
+        if self.config['buffered']:
+            self._add_to_buffer(rows)
+        else:
+            self._write_rows(rows)
+
+
+    def flush(self, wait: bool = True):
+        """
+        Write all the buffered rows with batch writes. If writing fails, the rows are returned to the buffer
+        for the next attempt and the exception is raised.
+
+        :param wait:    With ``async_write`` wait until the background writer persists all the queued rows.
+                        Otherwise the buffered rows are only handed to the writer.
+        """
+
+        if wait and self._writer_thread:
+            self._queue.join()
+
+        with self._buffer_lock:
+            rows, self._buffer, self._buffer_created_at = self._buffer, [], None
+            self._cancel_age_timer()
+
+        if not rows:
+            return
+
+        try:
+            # Rows failed by the background writer are also returned to the buffer, so write them synchronously.
+            if wait and self._writer_thread:
+                self._write_rows(rows, allow_async=False)
+            else:
+                self._write_rows(rows)
+        except Exception:
+            with self._buffer_lock:
+                self._buffer[:0] = rows
+                self._buffer_created_at = self._buffer_created_at or time.time()
+            raise
+
+
+    def _write_rows(self, rows: List[Dict], allow_async: bool = True):
+        if not self.dynamo_db_client:
+            logger.info("DynamoDB client/table is not configured for meta_handler. Skip saving tasks meta data: %s",
+                        rows)
+        elif self.config['async_write'] and allow_async:
+            self._enqueue(rows)
+        else:
+            self.dynamo_db_client.batch_put(rows)
+
 
+    def _enqueue(self, rows: List[Dict]):
+        if self._writer_thread is None:
+            with self._buffer_lock:
+                if self._writer_thread is None:
+                    self._writer_thread = threading.Thread(target=self._writer_loop, name='MetaHandlerWriter',
+                                                           daemon=True)
+                    self._writer_thread.start()
+
+        # Blocks while the queue is full. This is the backpressure for the caller.
+        for row in rows:
+            self._queue.put(row)
+
+
+    def _writer_loop(self):
+        """ Body of the background writer thread. Writes the queued rows in batches of up to 25 rows. """
+
+        while True:
+            rows = [self._queue.get()]
+            while len(rows) < 25:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.dynamo_db_client.batch_put(rows)
+            except Exception:
+                logger.exception("Background writer of meta_handler failed to write %s rows", len(rows))
+                # Keep the rows for the next ``flush()``.
+                with self._buffer_lock:
+                    self._buffer.extend(rows)
+                    self._buffer_created_at = self._buffer_created_at or time.time()
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+
+    def _add_to_buffer(self, rows: List[Dict]):
+        with self._buffer_lock:
+            if not self._buffer:
+                self._buffer_created_at = time.time()
+                self._start_age_timer(self.config['buffer_max_age_seconds'])
+            self._buffer.extend(rows)
+
+            should_flush = len(self._buffer) >= self.config['buffer_max_rows'] \
+                           or time.time() - self._buffer_created_at >= self.config['buffer_max_age_seconds']
+
+        if should_flush:
+            self.flush(wait=False)
+
+
+    def _start_age_timer(self, seconds: float):
+        """ Flush the buffer from a timer thread once it gets too old. Call with the ``_buffer_lock`` acquired. """
+
+        self._cancel_age_timer()
+        self._age_timer = threading.Timer(seconds, self._flush_by_age)
+        self._age_timer.daemon = True
+        self._age_timer.start()
+
+
+    def _cancel_age_timer(self):
+        if self._age_timer:
+            self._age_timer.cancel()
+            self._age_timer = None
+
+
+    def _flush_by_age(self):
+        """ Body of the timer thread. """
+
+        with self._buffer_lock:
+            self._age_timer = None
+            if not self._buffer:
+                return
+
+            age = time.time() - self._buffer_created_at
+            if age < self.config['buffer_max_age_seconds']:
+                self._start_age_timer(self.config['buffer_max_age_seconds'] - age)
+                return
+
+        try:
+            self.flush(wait=False)
+        except Exception:
+            logger.exception("Failed to flush the buffer of meta_handler by age. The rows are kept for flush()")
+
+
+    def _make_row(self, task_id: str, action: str, **kwargs) -> Dict:
         row = {
             'task_id': task_id,
             'created_at': time.time(),
@@ -136,10 +319,8 @@ class MetaHandler:
         for field, mapping in self.CONTEXT_FIELDS_MAPPINGS.items():
             row[field] = getattr(global_vars.lambda_context, mapping)
 
-        if self.dynamo_db_client:
-            self.dynamo_db_client.create(row=row)
-        else:
-            logger.info("DynamoDB client/table is not configured for meta_handler. Skip saving task meta data: %s", row)
+        return row
+
 
     def _ma(self, field_name):
         # FIXMEONEDAY: implement mappings for the actions names
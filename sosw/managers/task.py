@@ -43,12 +43,14 @@ except ImportError:
 
 import boto3
 import json
+import threading
 import time
 import uuid
 
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from json.decoder import JSONDecodeError
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 from sosw.app import Processor
 from sosw.components.benchmark import benchmark
@@ -99,6 +101,12 @@ class TaskManager(Processor):
         'sosw_closed_tasks_labourer_status_index': 'labourer_task_status_with_time',
         'sosw_retry_tasks_table':                  'sosw_retry_tasks',
         'sosw_retry_tasks_greenfield_index':       'labourer_id_greenfield',
+
+        # Optional table with atomic counters of running tasks per Labourer (hash key: ``labourer_id``).
+        # If configured, the counter is used instead of querying the running tasks from the index of greenfield.
+        # The counter is reconciled with the full query at least once per ``running_tasks_reconcile_interval``.
+        'sosw_running_tasks_counters_table':       None,
+        'running_tasks_reconcile_interval':        600,
         'greenfield_invocation_delta':             31557600,  # 1 year.
         'greenfield_task_step':                    1000,
         'labourers':                               {
@@ -138,6 +146,17 @@ class TaskManager(Processor):
         'max_attempts':                            3,
         'max_closed_to_analyse_for_duration':      10,
         'max_simultaneous_invocations':            1,
+        # Concurrent invocation of tasks is opt-in. With 1 the tasks are invoked serially in the current thread.
+        'max_invocation_workers':                  1,
+
+        # Attributes of Labourers that require external calls are resolved concurrently during registration
+        # and cached for the given number of seconds across warm invocations. TTL 0 disables the cache.
+        'max_registration_workers':                10,
+        'labourer_attributes_cache_ttl':           {
+            'health':           0,
+            'max_duration':     3600,
+            'average_duration': 300,
+        },
     }
 
     __labourers = None
@@ -149,6 +168,16 @@ class TaskManager(Processor):
     lambda_client: boto3.client = None
 
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # ``invoke_tasks`` updates the stats from the threads of the pool.
+        self._stats_lock = threading.Lock()
+
+        # Cache of expensive Labourer attributes: {(labourer_id, attribute): (expires_at, value)}
+        self._labourer_attributes_cache = {}
+
+
     def get_oldest_greenfield_for_labourer(self, labourer: Labourer, reverse: bool = False) -> int:
         """
         Return value of oldest greenfield in queue.
@@ -226,32 +255,79 @@ class TaskManager(Processor):
             ('start', lambda x: int(time.time())),
             ('invoked', lambda x: x.get_attr('start') + self.config['greenfield_invocation_delta']),
             ('expired', lambda x: x.get_attr('invoked') - (x.duration + x.cooldown)),
-            ('health', lambda x: self.ecology_client.get_labourer_status(x)),
-            ('health_metrics', lambda x: _cfg('labourers')[x.id].get('health_metrics')) or {},
+            ('health_metrics', lambda x: _cfg('labourers')[x.id].get('health_metrics') or {}),
             ('max_attempts', lambda x: self.config.get(f'max_attempts_{x.id}') or self.config['max_attempts']),
-            ('max_duration', lambda x: self.ecology_client.get_max_labourer_duration(x)),
-            ('average_duration', lambda x: self.ecology_client.get_labourer_average_duration(x)),
             ('max_simultaneous_invocations', lambda x: _cfg('labourers')[x.id].get('max_simultaneous_invocations')
                                                        or _cfg('max_simultaneous_invocations')),
         )
 
+        # These require external calls, but do not depend on one another, so they are resolved concurrently
+        # for all the Labourers after the ones above.
+        independent_attributes = (
+            ('health', self.ecology_client.get_labourer_status),
+            ('max_duration', self.ecology_client.get_max_labourer_duration),
+            ('average_duration', self.ecology_client.get_labourer_average_duration),
+        )
+
         # Reset old Labourers and reconstruct them with fresh data.
         self.__labourers = None
         labourers = self.get_labourers()
 
-        result = []
         for labourer in labourers:
-            for k, method in [x for x in custom_attributes]:
-                labourer.set_custom_attribute(k, method(labourer))
-                logger.debug(f"SET for {labourer}: {k} = {method(labourer)}")
-            result.append(labourer)
+            for k, method in custom_attributes:
+                value = method(labourer)
+                labourer.set_custom_attribute(k, value)
+                logger.debug(f"SET for {labourer}: {k} = {value}")
+
+        # Values of all the health metrics are fetched from CloudWatch in batches at once.
+        self.ecology_client.prefetch_health_metrics(labourers)
 
+        jobs = [(labourer, k, method) for labourer in labourers for k, method in independent_attributes]
+        max_workers = min(len(jobs), self.config['max_registration_workers'])
+
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                values = list(executor.map(lambda job: self._get_cached_labourer_attribute(*job), jobs))
+        else:
+            values = [self._get_cached_labourer_attribute(*job) for job in jobs]
+
+        for (labourer, k, _method), value in zip(jobs, values):
+            labourer.set_custom_attribute(k, value)
+            logger.debug(f"SET for {labourer}: {k} = {value}")
+
+        for labourer in labourers:
             for attr, val in _cfg('labourers')[labourer.id].items():
                 labourer.set_custom_attribute(attr, val)
 
-        self.__labourers = result
+        self.__labourers = labourers
 
-        return result
+        return labourers
+
+
+    def _get_cached_labourer_attribute(self, labourer: Labourer, name: str, method: Callable):
+        """
+        Return the value of ``method(labourer)`` from the cache if it is fresh.
+        Otherwise call the method and cache the result for ``config['labourer_attributes_cache_ttl'][name]`` seconds.
+        """
+
+        ttl = self.config['labourer_attributes_cache_ttl'].get(name, 0)
+        key = (labourer.id, name)
+
+        if ttl:
+            cached = self._labourer_attributes_cache.get(key)
+            if cached and cached[0] > time.monotonic():
+                with self._stats_lock:
+                    self.stats['labourer_attributes_cache_hits'] += 1
+                return cached[1]
+
+        value = method(labourer)
+
+        if ttl:
+            self._labourer_attributes_cache[key] = (time.monotonic() + ttl, value)
+            with self._stats_lock:
+                self.stats['labourer_attributes_cache_misses'] += 1
+
+        return value
 
 
     def get_labourers(self) -> List[Labourer]:
@@ -285,6 +361,54 @@ class TaskManager(Processor):
                             and pass custom task properties setting strict = False
         """
 
+        new_task = self.construct_task(labourer=labourer, strict=strict, **kwargs)
+
+        # Saving to DynamoDB.
+        self.dynamo_db_client.put(new_task)
+        logger.debug(f"Created a task: {new_task}")
+
+        return new_task
+
+
+    def create_tasks(self, labourer: Labourer, tasks: List[Dict], strict: bool = True) -> List[Dict]:
+        """
+        Schedule many new tasks for the same Labourer.
+
+        Unlike ``create_task`` in a loop, queries the newest greenfield of the Labourer only once and assigns
+        consecutive greenfields to the tasks locally in the order of ``tasks``. The tasks are saved with batch writes.
+
+        :param labourer:    Labourer object of Lambda to execute the tasks.
+        :param tasks:       List of kwargs for tasks. See ``create_task``.
+        :param bool strict: See ``create_task``.
+        :return:            List of created tasks.
+        """
+
+        if not tasks:
+            return []
+
+        newest_greenfield = self.get_newest_greenfield_for_labourer(labourer)
+        step = int(self.config['greenfield_task_step'])
+
+        new_tasks = [self.construct_task(labourer=labourer, strict=strict, next_greenfield=newest_greenfield + step * i,
+                                         **task)
+                     for i, task in enumerate(tasks, 1)]
+
+        self.dynamo_db_client.batch_put(new_tasks)
+        logger.debug(f"Created {len(new_tasks)} tasks for labourer {labourer.id}")
+
+        return new_tasks
+
+
+    def construct_task(self, labourer: Labourer, strict: bool = True, next_greenfield: Optional[int] = None,
+                       **kwargs) -> Dict:
+        """
+        Construct a new task from kwargs and autogenerated fields without saving it.
+        For the description of arguments see ``create_task``.
+
+        :param int next_greenfield: The greenfield to assign to the task. If not provided, is calculated from the
+                                    newest greenfield of the Labourer in the queue.
+        """
+
         _ = self.get_db_field_name
 
         # Save a copy of kwargs, because we are going to play with them.
@@ -295,8 +419,9 @@ class TaskManager(Processor):
             _('task_id'):     lambda: str(uuid.uuid1().hex),
             _('labourer_id'): lambda: str(labourer.id),
             _('created_at'):  lambda: str(time.time()),
-            _('greenfield'):  lambda: str(self.get_newest_greenfield_for_labourer(labourer)
-                                          + int(self.config['greenfield_task_step'])),
+            _('greenfield'):  lambda: str(next_greenfield) if next_greenfield is not None
+                                      else str(self.get_newest_greenfield_for_labourer(labourer)
+                                               + int(self.config['greenfield_task_step'])),
             _('attempts'):    lambda: '0',
         }
 
@@ -326,10 +451,6 @@ class TaskManager(Processor):
         except Exception:
             raise ValueError(f"Unexpected `payload` or custom attrs for task '{kwargs}'. Should be dict() or JSON.")
 
-        # Saving to DynamoDB.
-        self.dynamo_db_client.put(new_task)
-        logger.debug(f"Created a task: {new_task}")
-
         return new_task
 
 
@@ -372,7 +493,7 @@ class TaskManager(Processor):
         return all(field in task.keys() for field in [_('task_id'), _('labourer_id'), _('created_at')])
 
 
-    def invoke_task(self, labourer: Labourer, task_id: Optional[str] = None, task: Optional[Dict] = None):
+    def invoke_task(self, labourer: Labourer, task_id: Optional[str] = None, task: Optional[Dict] = None) -> bool:
         """
         Invoke the Lambda Function execution for `task`.
         Providing the ID is more expensive, but safer from "task injection" attacks method that prefetches Task
@@ -380,6 +501,8 @@ class TaskManager(Processor):
 
         Skips already running tasks with no exception, thus concurrent Orchestrators (or whoever else)
         should not duplicate invocations.
+
+        :return: True if the task was invoked, False if it was skipped as already invoked.
         """
 
         if not any([task, task_id]) or all([task, task_id]):
@@ -397,8 +520,9 @@ class TaskManager(Processor):
             if err.__class__.__name__ == 'ConditionalCheckFailedException':
                 logger.warning(f"Update failed due to already running task {task}. "
                                f"Probably concurrent Orchestrator already invoked.")
-                self.stats['concurrent_task_invocations_skipped'] += 1
-                return
+                with self._stats_lock:
+                    self.stats['concurrent_task_invocations_skipped'] += 1
+                return False
             else:
                 logger.exception(err)
                 raise RuntimeError(err)
@@ -410,15 +534,14 @@ class TaskManager(Processor):
                 call_payload = json.loads(call_payload)
             except JSONDecodeError as err:
                 logger.exception(f"Failed to decode payload: {call_payload}. Probably invalid task.")
-                self.stats['invalid_tasks_skipped'] += 1
+                with self._stats_lock:
+                    self.stats['invalid_tasks_skipped'] += 1
 
         call_payload.update(task)
 
         # Support for asyncio does not exist for botocore right now. See ticket below:
         # https://github.com/boto/botocore/issues/458
-        # There is another library that makes an async version of botocore, but doesn't
-        # support lambda currently. See below:
-        # https://github.com/aio-libs/aiobotocore
+        # Boto3 clients are thread safe though, so ``invoke_tasks`` overlaps invocations in a pool of threads.
         lambda_response = self.lambda_client.invoke(
                 FunctionName=labourer.arn,
                 InvocationType='Event',
@@ -426,7 +549,52 @@ class TaskManager(Processor):
         )
         logger.debug(lambda_response)
 
-        self.stats['invoked_tasks'] += 1
+        with self._stats_lock:
+            self.stats['invoked_tasks'] += 1
+
+        return True
+
+
+    def invoke_tasks(self, labourer: Labourer, tasks: List[Dict],
+                     max_workers: Optional[int] = None) -> Tuple[List[Dict], List[Exception]]:
+        """
+        Invoke the Lambda Function executions for many `tasks` of the `labourer` in a bounded pool of threads.
+
+        Every task still goes through ``invoke_task``: it is marked as invoked with the conditional update
+        before the Lambda is invoked, so tasks already invoked by a concurrent Orchestrator are skipped.
+        Only the round trips of different tasks overlap.
+
+        Failure to invoke one task does not stop the others. Failed tasks are logged and counted
+        in ``stats['failed_task_invocations']``. The errors are returned together with the invoked tasks, so that
+        the caller can first register the invoked ones (e.g. post the meta) and then raise the errors.
+
+        :param labourer:        Labourer for the tasks.
+        :param tasks:           List of task dictionaries.
+        :param max_workers:     Max number of threads. Default: ``config['max_invocation_workers']``.
+                                With 1 the tasks are invoked serially in the current thread.
+        :return:                Tuple: list of tasks that were actually invoked and list of errors of failed tasks.
+        """
+
+        max_workers = min(len(tasks), max_workers or self.config['max_invocation_workers'])
+        errors = []
+
+        def invoke(task):
+            try:
+                return self.invoke_task(labourer=labourer, task=task)
+            except Exception as err:
+                logger.exception(f"Failed to invoke task {task} for Labourer {labourer.id}: {err}")
+                with self._stats_lock:
+                    self.stats['failed_task_invocations'] += 1
+                    errors.append(err)
+                return False
+
+        if max_workers <= 1:
+            results = [invoke(task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(invoke, tasks))
+
+        return [task for task, invoked in zip(tasks, results) if invoked], errors
 
 
     def mark_task_invoked(self, labourer: Labourer, task: Dict, check_running: Optional[bool] = True):
@@ -457,6 +625,8 @@ class TaskManager(Processor):
                 condition_expression=f"{_('greenfield')} < {labourer.get_attr('start')}"
         )
 
+        self.update_running_tasks_counter(labourer.id, 1)
+
 
     # Deprecated
     # def close_task(self, task_id: str, labourer_id: str):
@@ -472,12 +642,7 @@ class TaskManager(Processor):
 
         # Get task
         task = self.get_task_by_id(task_id)
-
-        # Update labourer_id_task_status field.
-        is_completed = 1 if task.get(_('completed_at')) else 0
-        labourer_id = task.get(_('labourer_id'))
-        task[_('labourer_id_task_status')] = f"{labourer_id}_{is_completed}"
-        task[_('closed_at')] = int(time.time())
+        task = self._make_closed_task(task)
 
         # Add it to completed tasks table:
         self.dynamo_db_client.put(task, table_name=self.config.get('sosw_closed_tasks_table'))
@@ -489,6 +654,59 @@ class TaskManager(Processor):
         self.stats['archived_tasks'] += 1
 
 
+    def archive_tasks(self, tasks: List[Dict], transactional: bool = True):
+        """
+        Archive many already fetched `tasks`: put them to ``sosw_closed_tasks_table`` and delete from the tasks table.
+        Unlike ``archive_task`` does not query the tasks again, so they must be fetched with all the fields.
+
+        :param tasks:           Full tasks, e.g. from ``get_completed_tasks_for_labourer()``.
+        :param transactional:   If True (default) the put and delete of every task are done in the same transaction,
+                                so a task never exists in both tables. Several tasks share one call of
+                                ``transact_write``. Otherwise the tasks are written with batch writes (25 operations
+                                per call) and closed tasks are put before the originals are deleted.
+        """
+
+        _ = self.get_db_field_name
+
+        if not tasks:
+            return
+
+        closed_tasks = [self._make_closed_task(task) for task in tasks]
+        closed_table = self.config.get('sosw_closed_tasks_table')
+        keys_list = [{_('task_id'): task[_('task_id')]} for task in closed_tasks]
+
+        if transactional:
+            tasks_table = self.config['dynamo_db_config']['table_name']
+            items = []
+            for task, keys in zip(closed_tasks, keys_list):
+                items.append(self.dynamo_db_client.make_put_transaction_item(task, table_name=closed_table))
+                items.append(self.dynamo_db_client.make_delete_transaction_item(keys, table_name=tasks_table))
+
+            # Put and delete of the same task always stay in the same chunk, because chunks have even size.
+            self.dynamo_db_client.transact_write(*items)
+
+        else:
+            self.dynamo_db_client.batch_put(closed_tasks, table_name=closed_table)
+            self.dynamo_db_client.batch_delete(keys_list)
+
+        self.stats['archived_tasks'] += len(closed_tasks)
+
+
+    def _make_closed_task(self, task: Dict) -> Dict:
+        """ Return a copy of the `task` with the fields of the closed task table. The `task` is not modified. """
+
+        _ = self.get_db_field_name
+        task = dict(task)
+
+        # Update labourer_id_task_status field.
+        is_completed = 1 if task.get(_('completed_at')) else 0
+        labourer_id = task.get(_('labourer_id'))
+        task[_('labourer_id_task_status')] = f"{labourer_id}_{is_completed}"
+        task[_('closed_at')] = int(time.time())
+
+        return self._jsonify_payload_of_task(task)
+
+
     def get_task_by_id(self, task_id: str) -> Dict:
         """ Fetches the full data of the Task. """
 
@@ -593,11 +811,73 @@ class TaskManager(Processor):
         """
         Returns a number of tasks we assume to be still running.
         Theoretically they can be dead with Exception, but not yet expired.
+
+        If ``sosw_running_tasks_counters_table`` is configured, the value comes from the counter of the Labourer.
         """
 
+        if self.config.get('sosw_running_tasks_counters_table'):
+            return self.get_running_tasks_counter(labourer)
+
         return self.get_running_tasks_for_labourer(labourer=labourer, count=True)
 
 
+    def update_running_tasks_counter(self, labourer_id: str, delta: int):
+        """
+        Atomically add `delta` to the counter of running tasks of the Labourer.
+        Does nothing unless ``sosw_running_tasks_counters_table`` is configured.
+
+        The counter is incremented when tasks are invoked and decremented by WorkerAssistant when they are completed
+        and by Scavenger when they expire.
+        """
+
+        table_name = self.config.get('sosw_running_tasks_counters_table')
+        if not table_name or not delta:
+            return
+
+        self.dynamo_db_client.update({self.get_db_field_name('labourer_id'): labourer_id},
+                                     attributes_to_increment={'running_tasks': delta}, table_name=table_name)
+
+
+    def get_running_tasks_counter(self, labourer: Labourer) -> int:
+        """
+        Read the counter of running tasks of the Labourer.
+        If the counter does not exist yet or was not reconciled for ``running_tasks_reconcile_interval``
+        seconds, it is reconciled with the full query first.
+
+        The counter is read by its key with a single call.
+        """
+
+        rows = self.dynamo_db_client.batch_get_items_one_table(
+                [{self.get_db_field_name('labourer_id'): labourer.id}], fetch_all_fields=True,
+                table_name=self.config['sosw_running_tasks_counters_table'])
+        counter = rows[0] if rows else {}
+
+        reconcile_after = counter.get('reconciled_at', 0) + self.config['running_tasks_reconcile_interval']
+        if 'running_tasks' not in counter or reconcile_after <= time.time():
+            return self.reconcile_running_tasks_counter(labourer)
+
+        # Duplicate notifications of completion may drive the counter below zero until the next reconciliation.
+        return max(int(counter['running_tasks']), 0)
+
+
+    def reconcile_running_tasks_counter(self, labourer: Labourer) -> int:
+        """
+        Count the running tasks of the Labourer with the full query and overwrite the counter with the result.
+        Changes of the counter made concurrently with the query may be lost, but the next reconciliation fixes them.
+        """
+
+        count = self.get_running_tasks_for_labourer(labourer=labourer, count=True)
+
+        self.dynamo_db_client.update({self.get_db_field_name('labourer_id'): labourer.id},
+                                     attributes_to_update={'running_tasks': count, 'reconciled_at': int(time.time())},
+                                     table_name=self.config['sosw_running_tasks_counters_table'])
+
+        self.stats['running_tasks_counters_reconciled'] += 1
+        logger.info(f"Reconciled the counter of running tasks for Labourer {labourer.id}: {count}")
+
+        return count
+
+
     def get_completed_tasks_for_labourer(self, labourer: Labourer) -> List[Dict]:
         """
         Return a list of tasks of the Labourer marked as completed.
@@ -605,6 +885,9 @@ class TaskManager(Processor):
 
         In order to be able to use the already existing `index_greenfield`, we sort tasks only in invoked stages
         (`greenfield > now()`). This number is supposed to be small, so filtering by an un-indexed field will be fast.
+
+        The tasks are fetched with all their fields (not only the ones of the ``row_mapper``), because they are
+        archived by ``archive_tasks()`` as they are, e.g. with the stats and results of the Workers.
         """
 
         _ = self.get_db_field_name
@@ -617,6 +900,7 @@ class TaskManager(Processor):
             'comparisons':       {_('greenfield'): '>='},
             'index_name':        self.config['dynamo_db_config']['index_greenfield'],
             'filter_expression': f"attribute_exists {_('completed_at')}",
+            'fetch_all_fields':  True,
         }
 
         return self.dynamo_db_client.get_by_query(**query_args)
@@ -675,19 +959,60 @@ class TaskManager(Processor):
         self.stats['scheduled_for_retry_later_tasks'] += 1
 
 
+    def move_tasks_to_retry_table(self, tasks: List[Dict], wanted_delays: List[int]):
+        """
+        Bulk version of ``move_task_to_retry_table``. Tasks are put to the retry table with batch writes
+        and only then deleted from the tasks table also with batch writes (25 operations per call).
+
+        :param tasks:           Full tasks, e.g. from ``get_expired_tasks_for_labourer()``.
+        :param wanted_delays:   Delay in seconds for every task in the same order.
+        """
+
+        _ = self.get_db_field_name
+
+        if not tasks:
+            return
+
+        now = int(time.time())
+        retry_rows = []
+        for task, wanted_delay in zip(tasks, wanted_delays):
+            retry_row = task.copy()
+            retry_row[_('desired_launch_time')] = now + wanted_delay
+            retry_rows.append(self._jsonify_payload_of_task(retry_row))
+
+        self.dynamo_db_client.batch_put(retry_rows, table_name=self.config.get('sosw_retry_tasks_table'))
+        self.dynamo_db_client.batch_delete([{_('task_id'): task[_('task_id')]} for task in tasks])
+
+        self.stats['scheduled_for_retry_later_tasks'] += len(tasks)
+
+
     def get_tasks_to_retry_for_labourer(self, labourer: Labourer, limit: int = None) -> List[Dict]:
+        attrs = self._get_tasks_to_retry_query(labourer)
+        if limit:
+            attrs['max_items'] = limit
+        tasks = self.dynamo_db_client.get_by_query(**attrs)
+        return tasks
+
+
+    def get_tasks_to_retry_for_labourer_generator(self, labourer: Labourer) -> Iterator[List[Dict]]:
+        """
+        Same as ``get_tasks_to_retry_for_labourer``, but yields all the tasks due for retry page by page.
+        Tasks are fetched with all the fields, so that nothing is lost when they are moved back to the tasks table.
+        """
+
+        yield from self.dynamo_db_client.get_by_query_generator(**self._get_tasks_to_retry_query(labourer),
+                                                                fetch_all_fields=True)
+
+
+    def _get_tasks_to_retry_query(self, labourer: Labourer) -> Dict:
         _ = self.get_db_field_name
 
-        attrs = {
+        return {
             'keys':        {_('labourer_id'): labourer.id, _('desired_launch_time'): str(labourer.get_attr('start'))},
             'comparisons': {_('desired_launch_time'): "<="},
             'table_name':  self.config['sosw_retry_tasks_table'],
             'index_name':  self.config['sosw_retry_tasks_greenfield_index'],
         }
-        if limit:
-            attrs['max_items'] = limit
-        tasks = self.dynamo_db_client.get_by_query(**attrs)
-        return tasks
 
 
     def retry_task(self, task: Dict, labourer_id: str, greenfield: int):
@@ -696,6 +1021,39 @@ class TaskManager(Processor):
         This method is called by Scavenger.
         """
 
+        # If boto supports DynamoDB transaction, use them to add task to tasks_table and delete from retry_table
+        self.dynamo_db_client.transact_write(*self._make_retry_transaction_items(task, labourer_id, greenfield))
+
+        self.stats['due_for_retry_tasks'] += 1
+
+
+    def retry_tasks(self, labourer: Labourer, tasks: List[Dict], greenfield: int) -> int:
+        """
+        Bulk version of ``retry_task``. Moves `tasks` to the beginning of the queue in the given order:
+        the first task gets ``greenfield - 1``, the next one ``greenfield - 2`` and so on.
+
+        The put and delete of every task are written in the same transaction. Several tasks share one call
+        of ``transact_write``: up to ``DynamoDbClient.TRANSACT_WRITE_MAX_ITEMS`` items (50 tasks) per call.
+
+        :return: The lowest assigned greenfield. Pass it as `greenfield` for the next batch of tasks.
+        """
+
+        items = []
+        for task in tasks:
+            greenfield -= 1
+            items.extend(self._make_retry_transaction_items(task, labourer.id, greenfield))
+
+        if items:
+            self.dynamo_db_client.transact_write(*items,
+                                                 max_items_per_transaction=DynamoDbClient.TRANSACT_WRITE_MAX_ITEMS)
+
+        self.stats['due_for_retry_tasks'] += len(tasks)
+        return greenfield
+
+
+    def _make_retry_transaction_items(self, task: Dict, labourer_id: str, greenfield: int) -> List[Dict]:
+        """ Put of the `task` with new `greenfield` to the tasks table and delete from the retry table. """
+
         _ = self.get_db_field_name
 
         assert task[_('labourer_id')] == labourer_id, f"Task labourer_id must be {labourer_id}, " \
@@ -708,13 +1066,11 @@ class TaskManager(Processor):
 
         delete_keys = {_('labourer_id'): labourer_id, _('task_id'): task[_('task_id')]}
 
-        # If boto supports DynamoDB transaction, use them to add task to tasks_table and delete from retry_table
         put_query = self.dynamo_db_client.make_put_transaction_item(task)
         delete_query = self.dynamo_db_client.make_delete_transaction_item(
                 delete_keys, table_name=self.config.get('sosw_retry_tasks_table'))
-        self.dynamo_db_client.transact_write(put_query, delete_query)
 
-        self.stats['due_for_retry_tasks'] += 1
+        return [put_query, delete_query]
 
 
     @benchmark
@@ -5,6 +5,7 @@ import time
 import unittest
 import os
 
+from botocore.exceptions import ClientError
 from copy import deepcopy
 from dateutil.tz import tzlocal
 from unittest.mock import MagicMock, patch
@@ -232,6 +233,187 @@ class ecology_manager_UnitTestCase(unittest.TestCase):
                          f"Fetcher was supposed to be called only for 2 metrics. One is in cache.")
 
 
+    def test_get_labourer_status__cache_survives_register_task_manager(self):
+        self.manager.get_health = MagicMock(return_value=4)
+        self.manager.fetch_metric_stats = MagicMock(return_value=42)
+
+        labourer = deepcopy(self.LABOURER)
+        setattr(labourer, 'health_metrics', self.SAMPLE_HEALTH_METRICS)
+
+        with patch('time.monotonic', MagicMock(return_value=1000)):
+            self.manager.register_task_manager(MagicMock())
+            self.manager.get_labourer_status(labourer)
+
+            # Next warm invocation within TTL.
+            self.manager.register_task_manager(MagicMock())
+            self.manager.get_labourer_status(labourer)
+
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 3)
+        self.assertEqual(self.manager.stats['health_metrics_cache_misses'], 3)
+        self.assertEqual(self.manager.stats['health_metrics_cache_hits'], 3)
+
+        # Default TTL is 3 Periods of the metric.
+        with patch('time.monotonic', MagicMock(return_value=1000 + 179)):
+            self.manager.register_task_manager(MagicMock())
+            self.manager.get_labourer_status(labourer)
+
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 3)
+
+        with patch('time.monotonic', MagicMock(return_value=1000 + 180)):
+            self.manager.register_task_manager(MagicMock())
+            self.manager.get_labourer_status(labourer)
+
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 6)
+
+
+    def test_get_labourer_status__ttl_checked_on_read(self):
+        self.manager.get_health = MagicMock(return_value=4)
+        self.manager.fetch_metric_stats = MagicMock(return_value=42)
+
+        labourer = deepcopy(self.LABOURER)
+        setattr(labourer, 'health_metrics', self.SAMPLE_HEALTH_METRICS)
+
+        with patch('time.monotonic', MagicMock(return_value=1000)):
+            self.manager.register_task_manager(MagicMock())
+            self.manager.get_labourer_status(labourer)
+
+        # Same long invocation, without register_task_manager().
+        with patch('time.monotonic', MagicMock(return_value=1000 + 180)):
+            self.manager.get_labourer_status(labourer)
+
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 6)
+
+
+    def test_get_labourer_status__ttl_zero__cached_during_invocation(self):
+        self.manager.get_health = MagicMock(return_value=4)
+        self.manager.fetch_metric_stats = MagicMock(return_value=42)
+        self.manager.config['health_metrics_cache_ttl_periods'] = 0
+
+        labourer = deepcopy(self.LABOURER)
+        setattr(labourer, 'health_metrics', self.SAMPLE_HEALTH_METRICS)
+
+        self.manager.register_task_manager(MagicMock())
+        self.manager.get_labourer_status(labourer)
+        self.manager.get_labourer_status(labourer)
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 3)
+
+        self.manager.register_task_manager(MagicMock())
+        self.manager.get_labourer_status(labourer)
+        self.assertEqual(self.manager.fetch_metric_stats.call_count, 6)
+
+
+    def test_get_health_metric_ttl(self):
+        self.assertEqual(self.manager.get_health_metric_ttl({'details': {'Period': 300}}), 900)
+        self.assertEqual(self.manager.get_health_metric_ttl({'details': {}}), 180)
+        self.assertEqual(self.manager.get_health_metric_ttl({'details': {'Period': 60}, 'cache_ttl_periods': 5}), 300)
+        self.assertEqual(self.manager.get_health_metric_ttl({'details': {'Period': 60}, 'cache_ttl_periods': 0}), 0)
+
+
+    def test_batch_fetch_metric_stats(self):
+        self.manager.cloudwatch_client = MagicMock()
+        self.manager.cloudwatch_client.get_metric_data.return_value = {
+            'MetricDataResults': [
+                {'Id': 'm0', 'Values': [10.0, 20.0, 30.0]},
+                {'Id': 'm1', 'Values': [10.0, 50.0]},
+            ]
+        }
+
+        metrics = [
+            {'Name': 'CPUUtilization', 'Namespace': 'AWS/RDS'},
+            {'MetricName': 'FreeableMemory', 'Namespace': 'AWS/RDS', 'Statistics': ['Maximum'], 'Period': 300},
+        ]
+
+        result = self.manager.batch_fetch_metric_stats(metrics)
+
+        self.assertEqual(result, [20.0, 50.0])
+        self.manager.cloudwatch_client.get_metric_data.assert_called_once()
+
+        _, kwargs = self.manager.cloudwatch_client.get_metric_data.call_args
+        queries = kwargs['MetricDataQueries']
+        self.assertEqual(queries[0]['MetricStat']['Metric']['MetricName'], 'CPUUtilization')
+        self.assertEqual(queries[0]['MetricStat']['Period'], 60)
+        self.assertEqual(queries[0]['MetricStat']['Stat'], 'Average')
+        self.assertEqual(queries[1]['MetricStat']['Period'], 300)
+        self.assertEqual(queries[1]['MetricStat']['Stat'], 'Maximum')
+        self.assertEqual(kwargs['EndTime'] - kwargs['StartTime'], datetime.timedelta(seconds=300))
+
+
+    def test_batch_fetch_metric_stats__chunks_and_paginates(self):
+        self.manager.cloudwatch_client = MagicMock()
+
+
+        def get_metric_data(MetricDataQueries, StartTime, EndTime, NextToken=None):
+            # Every query gets one value in the first page and one more in the second page.
+            return {
+                'MetricDataResults': [{'Id': x['Id'], 'Values': [2.0 if NextToken else 1.0]} for x in MetricDataQueries],
+                **({} if NextToken else {'NextToken': 'next'}),
+            }
+
+        self.manager.cloudwatch_client.get_metric_data.side_effect = get_metric_data
+
+        metrics = [{'Name': f'Metric{i}', 'Namespace': 'AWS/RDS'} for i in range(501)]
+
+        result = self.manager.batch_fetch_metric_stats(metrics)
+
+        self.assertEqual(result, [1.5] * 501)
+        self.assertEqual(self.manager.cloudwatch_client.get_metric_data.call_count, 4)
+        self.assertEqual(self.manager.stats['cloudwatch_get_metric_data_calls'], 4)
+
+
+    def test_batch_fetch_metric_stats__access_denied__fallback(self):
+        self.manager.cloudwatch_client = MagicMock()
+        self.manager.cloudwatch_client.get_metric_data.side_effect = ClientError(
+                {'Error': {'Code': 'AccessDenied', 'Message': "Not authorized"}}, 'GetMetricData')
+        self.manager.fetch_metric_stats = MagicMock(side_effect=[20.0, 50.0, 1.0, 2.0])
+
+        metrics = [{'MetricName': 'CPUUtilization', 'Namespace': 'AWS/RDS'},
+                   {'MetricName': 'FreeableMemory', 'Namespace': 'AWS/RDS'}]
+
+        self.assertEqual(self.manager.batch_fetch_metric_stats(metrics), [20.0, 50.0])
+        self.assertEqual(self.manager.batch_fetch_metric_stats(metrics), [1.0, 2.0])
+
+        # GetMetricData is not retried after AccessDenied.
+        self.manager.cloudwatch_client.get_metric_data.assert_called_once()
+        self.manager.fetch_metric_stats.assert_any_call(metrics[1])
+
+
+    def test_batch_fetch_metric_stats__other_errors_raised(self):
+        self.manager.cloudwatch_client = MagicMock()
+        self.manager.cloudwatch_client.get_metric_data.side_effect = ClientError(
+                {'Error': {'Code': 'Throttling', 'Message': "Slow down"}}, 'GetMetricData')
+        self.manager.fetch_metric_stats = MagicMock()
+
+        with self.assertRaises(ClientError):
+            self.manager.batch_fetch_metric_stats([{'MetricName': 'CPUUtilization', 'Namespace': 'AWS/RDS'}])
+
+        self.manager.fetch_metric_stats.assert_not_called()
+        self.assertFalse(self.manager.metric_data_access_denied)
+
+
+    def test_prefetch_health_metrics(self):
+        self.manager.register_task_manager(MagicMock())
+        self.manager.batch_fetch_metric_stats = MagicMock(return_value=[1, 2, 3])
+        self.manager.fetch_metric_stats = MagicMock()
+        self.manager.get_health = MagicMock(return_value=4)
+
+        labourers = [deepcopy(self.LABOURER), Labourer(id='other_function')]
+        for labourer in labourers:
+            setattr(labourer, 'health_metrics', self.SAMPLE_HEALTH_METRICS)
+
+        self.manager.prefetch_health_metrics(labourers)
+
+        # Shared metrics are fetched once for all the Labourers.
+        self.manager.batch_fetch_metric_stats.assert_called_once_with(
+                [x['details'] for x in self.SAMPLE_HEALTH_METRICS.values()])
+
+        for labourer in labourers:
+            self.manager.get_labourer_status(labourer)
+
+        self.manager.fetch_metric_stats.assert_not_called()
+        self.assertEqual(self.manager.stats['health_metrics_cache_misses'], 3)
+        self.assertEqual(self.manager.stats['health_metrics_cache_hits'], 6)
+
+
     def test_fetch_metric_stats__calls_boto(self):
         self.manager.cloudwatch_client = MagicMock()
         self.manager.cloudwatch_client.get_metric_statistics.return_value = self.SAMPLE_GET_METRICS_STATISTICS_RESPONSE
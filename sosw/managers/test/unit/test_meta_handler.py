@@ -1,5 +1,7 @@
 import logging
 import os
+import queue
+import threading
 import unittest
 
 from copy import deepcopy
@@ -89,3 +91,160 @@ class meta_handler_UnitTestCase(unittest.TestCase):
 
 
         self.assertEqual(type(self.manager._ma(123)), str)
+
+
+    def test_post_many__batch_put(self):
+        self.manager.post_many(task_ids=['t1', 't2'], action='created', labourer='some_function')
+
+        self.manager.dynamo_db_client.create.assert_not_called()
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+
+        rows = self.manager.dynamo_db_client.batch_put.call_args[0][0]
+        self.assertEqual([x['task_id'] for x in rows], ['t1', 't2'])
+        for row in rows:
+            self.assertEqual(row['action'], 'created')
+            self.assertEqual(row['labourer'], 'some_function')
+            self.assertEqual(row['author'], 'author')
+
+
+    def test_post__buffered(self):
+        self.manager.config['buffered'] = True
+
+        self.manager.post(**TEST_META_HANDLER_POST_ARGS)
+        self.manager.post_many(task_ids=['t1', 't2'], action='created')
+
+        self.manager.dynamo_db_client.create.assert_not_called()
+        self.manager.dynamo_db_client.batch_put.assert_not_called()
+
+        self.manager.flush()
+
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+        rows = self.manager.dynamo_db_client.batch_put.call_args[0][0]
+        self.assertEqual([x['task_id'] for x in rows], [TEST_META_HANDLER_POST_ARGS['task_id'], 't1', 't2'])
+
+        # Buffer is empty after the flush.
+        self.manager.flush()
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+
+
+    def test_post__buffered__flush_when_full(self):
+        self.manager.config['buffered'] = True
+        self.manager.config['buffer_max_rows'] = 3
+
+        self.manager.post_many(task_ids=['t1', 't2'], action='created')
+        self.manager.dynamo_db_client.batch_put.assert_not_called()
+
+        self.manager.post(task_id='t3', action='created')
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+        self.assertEqual(len(self.manager.dynamo_db_client.batch_put.call_args[0][0]), 3)
+
+
+    def test_post__buffered__flush_by_age(self):
+        self.manager.config['buffered'] = True
+        self.manager.config['buffer_max_age_seconds'] = 10
+
+        with patch('time.time') as t:
+            t.return_value = 1000
+            self.manager.post(task_id='t1', action='created')
+            self.manager.dynamo_db_client.batch_put.assert_not_called()
+
+            t.return_value = 1010
+            self.manager.post(task_id='t2', action='created')
+
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+        self.assertEqual(len(self.manager.dynamo_db_client.batch_put.call_args[0][0]), 2)
+
+
+    def test_post__buffered__flush_by_age_timer(self):
+        self.manager.config['buffered'] = True
+        self.manager.config['buffer_max_age_seconds'] = 0.05
+        written = threading.Event()
+        self.manager.dynamo_db_client.batch_put.side_effect = lambda rows: written.set()
+
+        self.manager.post(task_id='t1', action='created')
+        self.manager.dynamo_db_client.batch_put.assert_not_called()
+
+        # Nothing else is posted, but the timer flushes the old buffer.
+        self.assertTrue(written.wait(5))
+        self.assertEqual([x['task_id'] for x in self.manager.dynamo_db_client.batch_put.call_args[0][0]], ['t1'])
+        self.assertEqual(self.manager._buffer, [])
+
+
+    def test_flush__cancels_age_timer(self):
+        self.manager.config['buffered'] = True
+
+        self.manager.post(task_id='t1', action='created')
+        timer = self.manager._age_timer
+        self.assertTrue(timer.is_alive())
+
+        self.manager.flush()
+
+        timer.join(1)
+        self.assertFalse(timer.is_alive())
+        self.assertIsNone(self.manager._age_timer)
+        self.manager.dynamo_db_client.batch_put.assert_called_once()
+
+
+    def test_flush__failure_keeps_rows(self):
+        self.manager.config['buffered'] = True
+        self.manager.post_many(task_ids=['t1', 't2'], action='created')
+
+        self.manager.dynamo_db_client.batch_put.side_effect = RuntimeError("Failed")
+        self.assertRaises(RuntimeError, self.manager.flush)
+
+        self.manager.dynamo_db_client.batch_put.side_effect = None
+        self.manager.flush()
+
+        rows = self.manager.dynamo_db_client.batch_put.call_args[0][0]
+        self.assertEqual([x['task_id'] for x in rows], ['t1', 't2'])
+
+
+    def test_post__async_write(self):
+        self.manager.config['async_write'] = True
+
+        self.manager.post(**TEST_META_HANDLER_POST_ARGS)
+        self.manager.post_many(task_ids=['t1', 't2'], action='created')
+        self.manager.dynamo_db_client.create.assert_not_called()
+
+        self.manager.flush()
+
+        self.assertTrue(self.manager._writer_thread.daemon)
+        self.assertEqual(self.manager._queue.qsize(), 0)
+
+        written = [row['task_id'] for c in self.manager.dynamo_db_client.batch_put.call_args_list for row in c[0][0]]
+        self.assertEqual(written, [TEST_META_HANDLER_POST_ARGS['task_id'], 't1', 't2'])
+
+
+    def test_post__async_write__backpressure(self):
+        self.manager.config['async_write'] = True
+        self.manager._queue = queue.Queue(maxsize=1)
+
+        # The writer is blocked, so the last rows wait for a free slot in the queue.
+        release = threading.Event()
+        self.manager.dynamo_db_client.batch_put.side_effect = lambda rows: release.wait(5)
+
+        poster = threading.Thread(target=self.manager.post_many, kwargs={'task_ids': ['t1', 't2', 't3', 't4'],
+                                                                         'action': 'created'})
+        poster.start()
+        poster.join(0.2)
+        self.assertTrue(poster.is_alive())
+
+        release.set()
+        poster.join(5)
+        self.assertFalse(poster.is_alive())
+
+        self.manager.flush()
+        written = [row['task_id'] for c in self.manager.dynamo_db_client.batch_put.call_args_list for row in c[0][0]]
+        self.assertEqual(sorted(written), ['t1', 't2', 't3', 't4'])
+
+
+    def test_post__async_write__failed_rows_retried_on_flush(self):
+        self.manager.config['async_write'] = True
+        self.manager.dynamo_db_client.batch_put.side_effect = [RuntimeError("Failed"), None]
+
+        self.manager.post_many(task_ids=['t1', 't2'], action='created')
+        self.manager.flush()
+
+        self.assertEqual(self.manager.dynamo_db_client.batch_put.call_count, 2)
+        rows = self.manager.dynamo_db_client.batch_put.call_args[0][0]
+        self.assertEqual([x['task_id'] for x in rows], ['t1', 't2'])
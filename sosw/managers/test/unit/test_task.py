@@ -97,6 +97,68 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.assertEqual(round(gf, -2), round(time.time() + delta, -2)), "Greenfield was not updated"
 
 
+    def test_mark_task_invoked__increments_running_tasks_counter(self):
+        self.manager.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        self.manager.get_labourers = MagicMock(return_value=[self.labourer])
+        self.manager.register_labourers()
+
+        task = {self.HASH_KEY[0]: 'task_id_1', self.RANGE_KEY[0]: self.labourer.id}
+
+        self.manager.mark_task_invoked(self.labourer, task)
+
+        self.assertEqual(self.manager.dynamo_db_client.update.call_count, 2)
+        self.manager.dynamo_db_client.update.assert_called_with(
+                {'labourer_id': self.labourer.id}, attributes_to_increment={'running_tasks': 1},
+                table_name='autotest_sosw_running_tasks_counters')
+
+
+    def test_get_count_of_running_tasks_for_labourer__counter(self):
+        self.manager.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        labourer = self.manager.register_labourers()[0]
+        self.manager.dynamo_db_client.batch_get_items_one_table.return_value = [
+            {'labourer_id': labourer.id, 'running_tasks': 7, 'reconciled_at': 1000}
+        ]
+
+        with patch('time.time', MagicMock(return_value=1000 + 60)):
+            self.assertEqual(self.manager.get_count_of_running_tasks_for_labourer(labourer), 7)
+
+        self.manager.dynamo_db_client.batch_get_items_one_table.assert_called_once_with(
+                [{'labourer_id': labourer.id}], fetch_all_fields=True,
+                table_name='autotest_sosw_running_tasks_counters')
+        self.manager.dynamo_db_client.get_by_query.assert_not_called()
+        self.manager.dynamo_db_client.update.assert_not_called()
+
+
+    def test_update_running_tasks_counter__custom_field_names(self):
+        self.manager.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        self.manager.config['dynamo_db_config']['field_names'] = {'labourer_id': 'lambda_name'}
+
+        self.manager.update_running_tasks_counter('some_lambda', -2)
+
+        self.manager.dynamo_db_client.update.assert_called_once_with(
+                {'lambda_name': 'some_lambda'}, attributes_to_increment={'running_tasks': -2},
+                table_name='autotest_sosw_running_tasks_counters')
+
+
+    def test_get_count_of_running_tasks_for_labourer__counter_reconciled(self):
+        self.manager.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        labourer = self.manager.register_labourers()[0]
+        self.manager.get_running_tasks_for_labourer = MagicMock(return_value=3)
+
+        for counter in [[], [{'labourer_id': labourer.id, 'running_tasks': 7, 'reconciled_at': 1000}]]:
+            self.manager.dynamo_db_client.batch_get_items_one_table.return_value = counter
+            self.manager.dynamo_db_client.update.reset_mock()
+
+            with patch('time.time', MagicMock(return_value=1000 + 600)):
+                self.assertEqual(self.manager.get_count_of_running_tasks_for_labourer(labourer), 3)
+
+            self.manager.dynamo_db_client.update.assert_called_once_with(
+                    {'labourer_id': labourer.id}, attributes_to_update={'running_tasks': 3, 'reconciled_at': 1600},
+                    table_name='autotest_sosw_running_tasks_counters')
+
+        self.assertEqual(self.manager.stats['running_tasks_counters_reconciled'], 2)
+
+
     def test_invoke_task__validates_task(self):
         self.assertRaises(AttributeError, self.manager.invoke_task, labourer=self.labourer), "Missing task and task_id"
         self.assertRaises(AttributeError, self.manager.invoke_task, labourer=self.labourer, task_id='qwe',
@@ -180,6 +242,67 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.manager.get_task_by_id.assert_not_called()
 
 
+    def test_invoke_tasks(self):
+        tasks = [{'task_id': str(i), 'labourer_id': self.labourer.id, 'created_at': 1000} for i in range(20)]
+        self.manager.mark_task_invoked = MagicMock()
+
+        result, errors = self.manager.invoke_tasks(labourer=self.labourer, tasks=tasks, max_workers=5)
+
+        self.assertEqual(result, tasks)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.manager.mark_task_invoked.call_count, 20)
+        self.assertEqual(self.manager.lambda_client.invoke.call_count, 20)
+        self.assertEqual(self.manager.stats['invoked_tasks'], 20)
+
+
+    def test_invoke_tasks__skips_concurrent_invocations(self):
+        tasks = [{'task_id': str(i), 'labourer_id': self.labourer.id, 'created_at': 1000} for i in range(6)]
+
+
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+
+        def mark_task_invoked(labourer, task):
+            if int(task['task_id']) % 2:
+                raise ConditionalCheckFailedException("Boom")
+
+        self.manager.mark_task_invoked = MagicMock(side_effect=mark_task_invoked)
+
+        result, errors = self.manager.invoke_tasks(labourer=self.labourer, tasks=tasks, max_workers=3)
+
+        self.assertEqual([x['task_id'] for x in result], ['0', '2', '4'])
+        self.assertEqual(self.manager.lambda_client.invoke.call_count, 3)
+        self.assertEqual(self.manager.stats['concurrent_task_invocations_skipped'], 3)
+
+
+    def test_invoke_tasks__failure_does_not_stop_others__and_is_returned(self):
+        tasks = [{'task_id': str(i), 'labourer_id': self.labourer.id, 'created_at': 1000} for i in range(3)]
+        self.manager.mark_task_invoked = MagicMock()
+        self.manager.lambda_client.invoke.side_effect = [None, Exception("Boom"), None]
+
+        result, errors = self.manager.invoke_tasks(labourer=self.labourer, tasks=tasks, max_workers=1)
+
+        self.assertEqual([x['task_id'] for x in result], ['0', '2'])
+        self.assertEqual([str(x) for x in errors], ["Boom"])
+        self.assertEqual(self.manager.lambda_client.invoke.call_count, 3)
+        self.assertEqual(self.manager.stats['failed_task_invocations'], 1)
+        self.assertEqual(self.manager.stats['invoked_tasks'], 2)
+
+
+    def test_invoke_tasks__many_failures(self):
+        tasks = [{'task_id': str(i), 'labourer_id': self.labourer.id, 'created_at': 1000} for i in range(4)]
+        self.manager.mark_task_invoked = MagicMock()
+        self.manager.lambda_client.invoke.side_effect = ValueError("Boom")
+
+        result, errors = self.manager.invoke_tasks(labourer=self.labourer, tasks=tasks, max_workers=2)
+
+        self.assertEqual(result, [])
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(x, ValueError) for x in errors))
+        self.assertEqual(self.manager.stats['failed_task_invocations'], 4)
+
+
     def test_register_labourers(self):
         with patch('time.time') as t:
             t.return_value = 123
@@ -196,6 +319,39 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.assertEqual(lab.get_attr('max_attempts'), 3)
 
 
+    def test_register_labourers__evaluates_attributes_once(self):
+        self.manager.ecology_client.get_max_labourer_duration.return_value = 900
+        self.manager.ecology_client.get_labourer_average_duration.return_value = 300
+
+        labourers = self.manager.register_labourers()
+
+        self.assertEqual(self.manager.ecology_client.get_labourer_status.call_count, len(labourers))
+        self.assertEqual(self.manager.ecology_client.get_max_labourer_duration.call_count, len(labourers))
+        self.assertEqual(self.manager.ecology_client.get_labourer_average_duration.call_count, len(labourers))
+        self.assertEqual(labourers[0].get_attr('max_duration'), 900)
+        self.assertEqual(labourers[0].get_attr('average_duration'), 300)
+
+
+    def test_register_labourers__caches_attributes(self):
+        self.manager.config['labourer_attributes_cache_ttl'] = {'max_duration': 60, 'average_duration': 60}
+
+        with patch('time.monotonic', MagicMock(return_value=1000)):
+            self.manager.register_labourers()
+            labourers = self.manager.register_labourers()
+
+        # Health is not cached by default, others are fetched once per Labourer.
+        self.assertEqual(self.manager.ecology_client.get_labourer_status.call_count, 2 * len(labourers))
+        self.assertEqual(self.manager.ecology_client.get_max_labourer_duration.call_count, len(labourers))
+        self.assertEqual(self.manager.ecology_client.get_labourer_average_duration.call_count, len(labourers))
+        self.assertEqual(self.manager.stats['labourer_attributes_cache_hits'], 2 * len(labourers))
+
+        # The cache expires after TTL.
+        with patch('time.monotonic', MagicMock(return_value=1061)):
+            self.manager.register_labourers()
+
+        self.assertEqual(self.manager.ecology_client.get_max_labourer_duration.call_count, 2 * len(labourers))
+
+
     def test_register_labourers__calls_register_task_manager(self):
 
         self.manager.register_labourers()
@@ -242,16 +398,97 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.manager.get_task_by_id = Mock(return_value=task)
 
         # Call
-        self.manager.archive_task(task_id)
+        with patch('time.time', MagicMock(return_value=222)):
+            self.manager.archive_task(task_id)
 
         # Check calls
         expected_completed_task = task.copy()
         expected_completed_task['labourer_id_task_status'] = 'some_lambda_1'
+        expected_completed_task['closed_at'] = 222
         self.manager.dynamo_db_client.put.assert_called_once_with(expected_completed_task, table_name=self.TEST_CONFIG[
             'sosw_closed_tasks_table'])
         self.manager.dynamo_db_client.delete.assert_called_once_with({'task_id': task_id})
 
 
+    def test_archive_tasks(self):
+        tasks = [
+            {'labourer_id': 'some_lambda', 'task_id': str(i), 'payload': {'a': i}, 'completed_at': 1551962375}
+            for i in range(3)
+        ]
+        self.manager.dynamo_db_client = MagicMock()
+        self.manager.dynamo_db_client.make_put_transaction_item.side_effect = lambda row, table_name: ('put', row)
+        self.manager.dynamo_db_client.make_delete_transaction_item.side_effect = lambda row, table_name: ('del', row)
+        self.manager.get_task_by_id = Mock()
+
+        with patch('time.time', MagicMock(return_value=1000)):
+            self.manager.archive_tasks(tasks)
+
+        self.manager.dynamo_db_client.transact_write.assert_called_once()
+
+        items = self.manager.dynamo_db_client.transact_write.call_args[0]
+        self.assertEqual(len(items), 6)
+        self.assertEqual(items[0], ('put', {'labourer_id': 'some_lambda', 'task_id': '0', 'payload': '{"a": 0}',
+                                            'completed_at': 1551962375, 'closed_at': 1000,
+                                            'labourer_id_task_status': 'some_lambda_1'}))
+        self.assertEqual(items[1], ('del', {'task_id': '0'}))
+        self.manager.get_task_by_id.assert_not_called()
+        self.assertEqual(self.manager.stats['archived_tasks'], 3)
+        self.assertEqual(tasks[0]['payload'], {'a': 0})
+        self.assertNotIn('closed_at', tasks[0])
+
+
+    def test_archive_tasks__not_transactional(self):
+        tasks = [{'labourer_id': 'some_lambda', 'task_id': str(i), 'payload': '{}'} for i in range(3)]
+        self.manager.dynamo_db_client = MagicMock()
+
+        self.manager.archive_tasks(tasks, transactional=False)
+
+        self.manager.dynamo_db_client.transact_write.assert_not_called()
+        closed_tasks, = self.manager.dynamo_db_client.batch_put.call_args[0]
+        self.assertEqual(self.manager.dynamo_db_client.batch_put.call_args[1],
+                         {'table_name': self.TEST_CONFIG['sosw_closed_tasks_table']})
+        self.assertEqual([x['task_id'] for x in closed_tasks], ['0', '1', '2'])
+        self.assertEqual(closed_tasks[0]['labourer_id_task_status'], 'some_lambda_0')
+        self.manager.dynamo_db_client.batch_delete.assert_called_once_with([{'task_id': '0'}, {'task_id': '1'},
+                                                                            {'task_id': '2'}])
+
+        # The tasks of the caller are not modified.
+        self.assertEqual(tasks[0], {'labourer_id': 'some_lambda', 'task_id': '0', 'payload': '{}'})
+
+
+    def test_get_completed_tasks_for_labourer__fetches_all_fields(self):
+        self.manager.dynamo_db_client = MagicMock()
+
+        self.manager.get_completed_tasks_for_labourer(self.labourer)
+
+        kwargs = self.manager.dynamo_db_client.get_by_query.call_args[1]
+        self.assertTrue(kwargs['fetch_all_fields'])
+        self.assertEqual(kwargs['filter_expression'], "attribute_exists completed_at")
+
+
+    def test_retry_tasks(self):
+        tasks = [{'labourer_id': self.labourer.id, 'task_id': str(i), 'desired_launch_time': 1000, 'payload': {'a': i}}
+                 for i in range(60)]
+        self.manager.dynamo_db_client = MagicMock()
+        self.manager.dynamo_db_client.make_put_transaction_item.side_effect = lambda row: ('put', row)
+        self.manager.dynamo_db_client.make_delete_transaction_item.side_effect = lambda row, table_name: ('del', row)
+
+        result = self.manager.retry_tasks(self.labourer, tasks, greenfield=5000)
+
+        self.assertEqual(result, 5000 - 60)
+        self.manager.dynamo_db_client.transact_write.assert_called_once()
+        self.assertEqual(self.manager.dynamo_db_client.transact_write.call_args[1],
+                         {'max_items_per_transaction': 100})
+
+        items = self.manager.dynamo_db_client.transact_write.call_args[0]
+        self.assertEqual(len(items), 120)
+        self.assertEqual(items[0], ('put', {'labourer_id': self.labourer.id, 'task_id': '0', 'greenfield': 4999,
+                                            'payload': '{"a": 0}'}))
+        self.assertEqual(items[1], ('del', {'labourer_id': self.labourer.id, 'task_id': '0'}))
+        self.assertEqual(items[-2][1]['greenfield'], 4940)
+        self.assertEqual(self.manager.stats['due_for_retry_tasks'], 60)
+
+
     def test__jsonify_payload_of_task(self):
         TESTS = [
             ({'foo': 'some_lambda', 'payload': '{"bar": 42}'}, {'foo': 'some_lambda', 'payload': '{"bar": 42}'}),
@@ -293,6 +530,27 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.assertEqual(json.dumps(TEST['payload']), params['row']['payload'], "Payload was JSON-nified")
 
 
+    def test_move_tasks_to_retry_table(self):
+        TASKS = [{'labourer_id': 'foo', 'task_id': '1', 'payload': {'bar': 42}},
+                 {'labourer_id': 'foo', 'task_id': '2', 'payload': '{"bar": 43}'}]
+
+        with patch('time.time') as t:
+            t.return_value = 1000
+            self.manager.move_tasks_to_retry_table(TASKS, [10, 20])
+
+        self.manager.dynamo_db_client.put.assert_not_called()
+        self.manager.dynamo_db_client.delete.assert_not_called()
+
+        rows = self.manager.dynamo_db_client.batch_put.call_args[0][0]
+        self.assertEqual([x['desired_launch_time'] for x in rows], [1010, 1020])
+        self.assertEqual(rows[0]['payload'], json.dumps({'bar': 42}))
+        self.assertEqual(self.manager.dynamo_db_client.batch_put.call_args[1]['table_name'],
+                         self.config['sosw_retry_tasks_table'])
+
+        self.manager.dynamo_db_client.batch_delete.assert_called_once_with([{'task_id': '1'}, {'task_id': '2'}])
+        self.assertEqual(self.manager.stats['scheduled_for_retry_later_tasks'], 2)
+
+
     def test_get_tasks_to_retry_for_labourer(self):
 
         with patch('time.time') as t:
@@ -406,6 +664,23 @@ class task_manager_UnitTestCase(unittest.TestCase):
         self.assertEqual(payload['lloyd'], 'green ninja')
 
 
+    def test_create_tasks(self):
+        self.manager.get_newest_greenfield_for_labourer = MagicMock(return_value=5000)
+        tasks = [{'payload': {'foo': i}} for i in range(3)]
+
+        result = self.manager.create_tasks(labourer=self.LABOURER, tasks=tasks)
+
+        self.manager.get_newest_greenfield_for_labourer.assert_called_once()
+        self.manager.dynamo_db_client.put.assert_not_called()
+        self.manager.dynamo_db_client.batch_put.assert_called_once_with(result)
+
+        self.assertEqual([x['greenfield'] for x in result], ['6000', '7000', '8000'])
+        self.assertEqual([json.loads(x['payload'])['foo'] for x in result], [0, 1, 2])
+        self.assertEqual(len(set(x['task_id'] for x in result)), 3)
+        for field in self.manager.config['dynamo_db_config']['required_fields']:
+            self.assertIn(field, result[0])
+
+
     def test_construct_payload_for_task(self):
         TESTS = [
             (dict(payload={'foo': 42}), {'foo': 42}),  # Dictionary
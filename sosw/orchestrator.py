@@ -43,6 +43,7 @@ except ImportError:
 
 import math
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from sosw.essential import Essential
@@ -65,7 +66,10 @@ class Orchestrator(Essential):
             3: 0.75,
             4: 1
         },
-        'default_simultaneous_invocations': 2
+        'default_simultaneous_invocations': 2,
+
+        # Number of Labourers to process concurrently. With 1 the Labourers are processed one after another.
+        'max_labourer_workers':             1,
     }
 
     task_client: TaskManager = None
@@ -75,8 +79,33 @@ class Orchestrator(Essential):
 
         labourers = self.task_client.register_labourers()
 
-        for labourer in labourers:
+        max_workers = min(len(labourers), self.config['max_labourer_workers'])
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self._invoke_for_labourer_isolated, labourers))
+        else:
+            results = [self._invoke_for_labourer_isolated(labourer) for labourer in labourers]
+
+        failed = [labourer.id for labourer, success in zip(labourers, results) if not success]
+
+        self.stats['labourers_processed'] += len(labourers) - len(failed)
+        if failed:
+            self.stats['labourers_failed'] += len(failed)
+            raise RuntimeError(f"Failed to invoke tasks for Labourers: {failed}")
+
+
+    def _invoke_for_labourer_isolated(self, labourer: Labourer) -> bool:
+        """
+        Call ``invoke_for_labourer`` so that a failure for one Labourer does not affect the others.
+        The error is logged and the result is returned as a boolean.
+        """
+
+        try:
             self.invoke_for_labourer(labourer)
+            return True
+        except Exception:
+            logger.exception(f"Failed to invoke tasks for Labourer: {labourer.id}")
+            return False
 
 
     def invoke_for_labourer(self, labourer: Labourer):
@@ -96,9 +125,18 @@ class Orchestrator(Essential):
         if tasks_to_process:
             logger.info(f"Decided to invoke the following tasks for {labourer.id}: {tasks_to_process}")
 
-            for task in tasks_to_process:
-                self.task_client.invoke_task(task=task, labourer=labourer)
-                self.meta_handler.post(task_id=task[_('task_id')], labourer_id=task[_('labourer_id')], action='invoked')
+            # Tasks may be invoked concurrently, see ``TaskManager.invoke_tasks`` and its ``max_invocation_workers``.
+            invoked_tasks, errors = self.task_client.invoke_tasks(labourer=labourer, tasks=tasks_to_process)
+            if invoked_tasks:
+                self.meta_handler.post_many(task_ids=[task[_('task_id')] for task in invoked_tasks],
+                                            labourer_id=labourer.id, action='invoked')
+
+            # Raise the failures only after the meta of the tasks that really ran is posted.
+            if len(errors) == 1:
+                raise errors[0]
+            elif errors:
+                raise RuntimeError(f"Failed to invoke {len(errors)} of {len(tasks_to_process)} tasks "
+                                   f"for Labourer {labourer.id}. First error: {errors[0]}") from errors[0]
 
 
     def get_desired_invocation_number_for_labourer(self, labourer: Labourer) -> int:
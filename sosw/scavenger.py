@@ -41,7 +41,10 @@ except ImportError:
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-from typing import Dict
+import time
+
+from collections import defaultdict
+from typing import Dict, List, Optional
 
 from sosw.essential import Essential
 from sosw.labourer import Labourer
@@ -63,7 +66,17 @@ class Scavenger(Essential):
             'recipient': 'arn:aws:sns:us-west-2:000000000000:sosw_info',
             'subject':   '``sosw`` Info'
         },
-        'retry_tasks_limit': 20  # TODO: What's the optimal number?
+        'retry_tasks_limit': 20,  # TODO: What's the optimal number?
+
+        # In bulk mode all the tasks due for retry are moved back to the queue in batches of ``retry_tasks_bulk_size``
+        # until the time budget of the run (seconds, shared by all Labourers) is spent.
+        # ``retry_tasks_limit`` is ignored in this mode.
+        'retry_tasks_bulk_mode':   False,
+        'retry_tasks_bulk_size':   50,
+        'retry_tasks_time_budget': 60,
+
+        # Max number of IDs of dead tasks per Labourer listed in the SNS digest. The rest are just counted.
+        'dead_tasks_digest_max_ids': 100,
     }
 
     # these clients will be initialized by Processor constructor
@@ -71,29 +84,70 @@ class Scavenger(Essential):
     sns_client = None
 
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # IDs of dead tasks closed during the run by Labourer ID. Reported in a single SNS digest.
+        self.dead_tasks_digest = defaultdict(list)
+
+
     def __call__(self, *args, **kwargs):
         logger.info(f"Called Scavenger.__call__ with args={args}, kwargs={kwargs}")
 
         labourers = self.task_client.register_labourers()
 
-        for labourer in labourers:
-            self.archive_tasks(labourer)
-            self.handle_expired_tasks(labourer)
-            self.retry_tasks(labourer)
+        retry_deadline = time.monotonic() + self.config['retry_tasks_time_budget']
+
+        # The dead tasks already archived are reported even if some later Labourer fails.
+        try:
+            for labourer in labourers:
+                self.archive_tasks(labourer)
+                self.handle_expired_tasks(labourer, send_digest=False)
+                self.retry_tasks(labourer, deadline=retry_deadline)
+        finally:
+            self.send_dead_tasks_digest()
 
 
-    def handle_expired_tasks(self, labourer: Labourer):
+    def handle_expired_tasks(self, labourer: Labourer, send_digest: bool = True):
+        """
+        Process all the expired tasks of the `labourer` in batches. The ones that still have attempts left are moved
+        to the retry table, the others are archived as dead.
+
+        :param send_digest: Send the SNS digest of dead tasks immediately. ``__call__`` sends one digest per run.
+        """
+
         logger.debug(f"Called Scavenger.handle_expired_tasks with labourer={labourer}")
         expired_tasks = self.task_client.get_expired_tasks_for_labourer(labourer)
         logger.debug(f"expired_tasks: {expired_tasks}")
+
+        if not expired_tasks:
+            return
+
+        # The tasks are not running any more whatever happens to them next.
+        self.task_client.update_running_tasks_counter(labourer.id, -len(expired_tasks))
+
+        to_retry, dead = [], []
         for task in expired_tasks:
-            self.process_expired_task(labourer, task)
+            (to_retry if self.should_retry_task(labourer, task) else dead).append(task)
+
+        try:
+            if to_retry:
+                self.move_tasks_to_retry_table(to_retry, labourer)
+
+            if dead:
+                self.close_dead_tasks(dead, labourer)
+        finally:
+            if send_digest:
+                self.send_dead_tasks_digest()
 
 
     def process_expired_task(self, labourer: Labourer, task: Dict):
         logger.debug(f"Called Scavenger.process_expired_task with labourer={labourer}, task={task}")
         _ = self.get_db_field_name
 
+        # The task is not running any more whatever happens to it next.
+        self.task_client.update_running_tasks_counter(labourer.id, -1)
+
         if self.should_retry_task(labourer, task):
             self.move_task_to_retry_table(task, labourer)
         else:
@@ -105,6 +159,41 @@ class Scavenger(Essential):
             self.stats['closed_dead_tasks'] += 1
 
 
+    def close_dead_tasks(self, tasks: List[Dict], labourer: Labourer):
+        """ Archive the expired `tasks` that have no attempts left and add them to the digest of dead tasks. """
+
+        _ = self.get_db_field_name
+
+        task_ids = [task[_('task_id')] for task in tasks]
+        logger.info(f"Closing {len(tasks)} dead tasks of {labourer.id}: {task_ids}")
+
+        self.task_client.archive_tasks(tasks)
+        self.dead_tasks_digest[labourer.id].extend(task_ids)
+        self.stats['closed_dead_tasks'] += len(tasks)
+
+        self.meta_handler.post_many(task_ids=task_ids, labourer_id=labourer.id, action='archived_dead')
+
+
+    def send_dead_tasks_digest(self):
+        """ Send a single SNS message about all the dead tasks closed since the previous digest. """
+
+        if not self.dead_tasks_digest:
+            return
+
+        max_ids = self.config['dead_tasks_digest_max_ids']
+        total = sum(len(x) for x in self.dead_tasks_digest.values())
+
+        lines = [f"Closing {total} dead tasks."]
+        for labourer_id, task_ids in self.dead_tasks_digest.items():
+            line = f"{labourer_id} ({len(task_ids)}): {', '.join(task_ids[:max_ids])}"
+            if len(task_ids) > max_ids:
+                line += f" and {len(task_ids) - max_ids} more"
+            lines.append(line)
+
+        self.sns_client.send_message('\n'.join(lines), subject='``sosw`` Dead Tasks', forse_commit=True)
+        self.dead_tasks_digest = defaultdict(list)
+
+
     def should_retry_task(self, labourer: Labourer, task: Dict) -> bool:
         logger.debug(f"Called Scavenger.should_retry_task with labourer={labourer}, task={task}")
         attempts = task.get(self.get_db_field_name('attempts'))
@@ -125,6 +214,17 @@ class Scavenger(Essential):
                                action='scheduled_for_retry')
 
 
+    def move_tasks_to_retry_table(self, tasks: List[Dict], labourer: Labourer):
+        """ Bulk version of ``move_task_to_retry_table``. """
+
+        _ = self.get_db_field_name
+
+        wanted_delays = [self.calculate_delay_for_task_retry(labourer, task) for task in tasks]
+        self.task_client.move_tasks_to_retry_table(tasks, wanted_delays)
+        self.meta_handler.post_many(task_ids=[task[_('task_id')] for task in tasks], labourer_id=labourer.id,
+                                    action='scheduled_for_retry')
+
+
     def calculate_delay_for_task_retry(self, labourer: Labourer, task: Dict) -> int:
         logger.debug(f"Called Scavenger.calculate_delay_for_task_retry with labourer={labourer}, task={task}")
         attempts = task[self.get_db_field_name('attempts')]
@@ -132,13 +232,19 @@ class Scavenger(Essential):
         return wanted_delay
 
 
-    def retry_tasks(self, labourer: Labourer):
+    def retry_tasks(self, labourer: Labourer, deadline: Optional[float] = None):
         """
         Read from dynamo table `sosw_retry_tasks`, get tasks with retry_time <= now, and put them to `sosw_tasks` in the
         beginning of the queue (with greenfield of a task that will be invoked next).
+
+        :param deadline:    Value of ``time.monotonic()`` to stop at in bulk mode.
+                            Default: now + ``config['retry_tasks_time_budget']``.
         """
         _ = self.get_db_field_name
 
+        if self.config['retry_tasks_bulk_mode']:
+            return self.retry_tasks_in_bulk(labourer, deadline=deadline)
+
         logger.debug(f"Running Scavenger.retry_tasks")
         tasks_to_retry = self.task_client.get_tasks_to_retry_for_labourer(labourer=labourer,
                                                                           limit=self.config.get('retry_tasks_limit'))
@@ -152,6 +258,33 @@ class Scavenger(Essential):
                                    action='ready_for_retry')
 
 
+    def retry_tasks_in_bulk(self, labourer: Labourer, deadline: Optional[float] = None):
+        """
+        Bulk mode of ``retry_tasks``. Pages through all the tasks due for retry and moves them back to the queue
+        in batches of ``config['retry_tasks_bulk_size']`` tasks per transaction until the `deadline`.
+        """
+
+        _ = self.get_db_field_name
+
+        if deadline is None:
+            deadline = time.monotonic() + self.config['retry_tasks_time_budget']
+
+        batch_size = self.config['retry_tasks_bulk_size']
+        lowest_greenfield = self.task_client.get_oldest_greenfield_for_labourer(labourer)
+
+        for page in self.task_client.get_tasks_to_retry_for_labourer_generator(labourer):
+            for i in range(0, len(page), batch_size):
+                if time.monotonic() >= deadline:
+                    logger.info(f"Time budget for retrying tasks is spent. Stop retrying for {labourer.id}")
+                    self.stats['retry_tasks_time_budget_exceeded'] += 1
+                    return
+
+                tasks = page[i:i + batch_size]
+                lowest_greenfield = self.task_client.retry_tasks(labourer, tasks, greenfield=lowest_greenfield)
+                self.meta_handler.post_many(task_ids=[task[_('task_id')] for task in tasks],
+                                            labourer_id=labourer.id, action='ready_for_retry')
+
+
     def archive_tasks(self, labourer: Labourer):
         """
         Read from `sosw_tasks` the ones successfully marked as completed by Workers and archive them.
@@ -162,11 +295,13 @@ class Scavenger(Essential):
         logger.debug(f"Running Scavenger.archive_tasks for {labourer.id}")
 
         tasks = self.task_client.get_completed_tasks_for_labourer(labourer)
+        if not tasks:
+            return
 
-        for task in tasks:
-            logger.info(f"Archiving completed_task: {task}")
-            self.task_client.archive_task(task[_('task_id')])
-            self.meta_handler.post(task_id=task[_('task_id')], labourer_id=task[_('labourer_id')], action='archived')
+        logger.info(f"Archiving {len(tasks)} completed tasks of {labourer.id}: {[x[_('task_id')] for x in tasks]}")
+        self.task_client.archive_tasks(tasks)
+        self.meta_handler.post_many(task_ids=[task[_('task_id')] for task in tasks], labourer_id=labourer.id,
+                                    action='archived')
 
 
     def get_db_field_name(self, key: str) -> str:
@@ -47,13 +47,16 @@ import os
 import re
 import time
 
-from typing import Iterable
+from collections import defaultdict
 from copy import deepcopy
-from typing import List, Set, Tuple, Union, Optional, Dict
+from typing import Iterable
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 from sosw.essential import Essential
 from sosw.app import LambdaGlobals
+from sosw.components.dynamo_db import CapacityTokenBucket
 from sosw.components.helpers import get_list_of_multiple_or_one_or_empty_from_dict, trim_arn_to_name, chunks
+from sosw.components.queue_file import QueueFile
 from sosw.components.siblings import SiblingsManager
 from sosw.managers.task import TaskManager
 
@@ -97,6 +100,11 @@ class Scheduler(Essential):
                 #     'max_simultaneous_invocations': 10,
                 # }
             },
+            'dynamo_db_config': {
+                # Set to True in the custom config of the Scheduler to throttle writing of tasks to the real
+                # consumed capacity of the table instead of the fixed sleep. See `_sleeptime_for_dynamo`.
+                'rate_limit_to_capacity': False,
+            },
         },
         's3_prefix':       'sosw/scheduler',
         'queue_file':      'tasks_queue.txt',
@@ -114,6 +122,8 @@ class Scheduler(Essential):
             }
         },
         'task_operational_overhead_for_ddb': 0.03,
+        'batch_create_tasks': False,
+        'queue_file_block_rows': 1000,
     }
 
     # these clients will be initialized by Processor constructor
@@ -202,13 +212,21 @@ class Scheduler(Essential):
         if not all([self.chunkable_attrs, self.needs_chunking(plural(self.chunkable_attrs[0]), job)]):
             data = [{'labourer_id': labourer.id, **job}]
 
-        # Else there is much more logic how to chunk the job to tasks.
+        # Else there is much more logic how to chunk the job to tasks. Tasks are written as soon as they are chunked.
         else:
-            data = self.construct_job_data(job, skeleton={'labourer_id': labourer.id})
+            data = self.construct_job_data_generator(job, skeleton={'labourer_id': labourer.id})
+
+        queue_file = self.get_queue_file()
 
-        with open(self.local_queue_file, 'w') as f:
-            for row in data:
-                f.write(f"{json.dumps(row)}\n")
+        # The new file is read from the beginning.
+        queue_file.remove_offset_file()
+
+        try:
+            queue_file.append_rows(json.dumps(row) for row in data)
+        except Exception:
+            # Chunking is lazy, so an invalid job may fail after some tasks are written. Do not leave a partial queue.
+            self.clean_tmp()
+            raise
 
         logger.info("Finished step: parse_job_to_file()")
 
@@ -333,11 +351,23 @@ class Scheduler(Essential):
     def chunk_dates(self, job: Dict, skeleton: Dict = None) -> List[Dict]:
         """
         There is a support for multiple not nested parameters to chunk. Dates is one very specific of them.
+
+        The tasks are deep copies, they do not share any values with the ``job`` or with each other.
         """
 
-        data = []
-        skeleton = deepcopy(skeleton) or {}
-        job = deepcopy(job)
+        return [deepcopy(task) for task in self.chunk_dates_generator(job=job, skeleton=skeleton)]
+
+
+    def chunk_dates_generator(self, job: Dict, skeleton: Dict = None) -> Iterator[Dict]:
+        """
+        Same as ``chunk_dates``, but yields the tasks lazily.
+
+        Neither ``job`` nor ``skeleton`` are modified. Tasks are new dictionaries on the top level, but share
+        the nested values with the ``job`` (copy-on-write), so the consumer must not modify nested values of tasks.
+        """
+
+        skeleton = skeleton or {}
+        job = dict(job)
 
         period = job.pop('period', None)
         isolate = job.pop('isolate_days', None)
@@ -383,18 +413,16 @@ class Scheduler(Essential):
                 assert len(date_list) > 0, f"The chunking period: {period} did not generate date_list. Bad."
 
                 for d in date_list:
-                    data.append({**job, **skeleton, 'date_list': [d]})
+                    yield {**job, **skeleton, 'date_list': [d]}
             else:
                 if len(date_list) > 1:
                     logger.debug("Running chunking for multiple days, but without date isolation. "
                                  "Your workers might feel bad.")
-                data.append({**job, **skeleton, 'date_list': date_list})
+                yield {**job, **skeleton, 'date_list': date_list}
 
         else:
             logger.debug("No `period` chunking requested in job %s", job)
-            data.append({**job, **skeleton})
-
-        return data
+            yield {**job, **skeleton}
 
 
     def construct_job_data(self, job: Dict, skeleton: Dict = None) -> List[Dict]:
@@ -408,44 +436,73 @@ class Scheduler(Essential):
         - Date list chunking
         - Recursive chunking for `chunkable_attrs`
 
+        The tasks do not share any values with the ``job`` or with each other. For large jobs use
+        ``construct_job_data_generator`` that does not keep all the tasks in memory.
         """
 
-        CHUNKERS = [self.chunk_dates, self.chunk_job]
+        return [deepcopy(task) for task in self._apply_chunkers([self.chunk_dates, self.chunk_job], job=job,
+                                                                skeleton=skeleton)]
 
-        data = [job]
-        skeleton = deepcopy(skeleton) or {}
 
-        for chunker in CHUNKERS:
-            chunked = []  # Container for results of current chunker method.
-            for task in data:
+    def construct_job_data_generator(self, job: Dict, skeleton: Dict = None) -> Iterator[Dict]:
+        """
+        Same as ``construct_job_data``, but the tasks stream lazily through the generator versions of chunkers:
+        ``chunk_dates_generator`` -> ``chunk_job_generator``. Every task is yielded as soon as it is chunked.
+        """
+
+        return self._apply_chunkers([self.chunk_dates_generator, self.chunk_job_generator], job=job, skeleton=skeleton)
+
+
+    @staticmethod
+    def _apply_chunkers(chunkers: List[Callable], job: Dict, skeleton: Dict = None) -> Iterator[Dict]:
+        """ Chains the ``chunkers``: every task yielded by a chunker is chunked further by the next one. """
+
+
+        def chain(chunker, tasks):
+            for task in tasks:
                 logger.debug("Chunking %s with %s", task, chunker)
-                chunked.extend(chunker(job=task))
+                yield from chunker(job=task)
+
 
-            data = deepcopy(chunked)
+        data = iter([job])
+        for chunker in chunkers:
+            data = chain(chunker, data)
 
         # Inject the skeleton to the resulting tasks
+        skeleton = skeleton or {}
         for task in data:
-            task.update(skeleton)
-
-        return data
+            yield {**task, **skeleton}
 
 
     def chunk_job(self, job: dict, skeleton: Dict = None, attr: str = None) -> List[Dict]:
         """
         Recursively parses a job, validates everything and chunks to simple tasks what should be chunked.
         The Scenario of chunking and isolation is worth another story, so you should put a link here once it is ready.
+
+        The tasks are deep copies, they do not share any values with the ``job`` or with each other.
+        """
+
+        return [deepcopy(task) for task in self.chunk_job_generator(job=job, skeleton=skeleton, attr=attr)]
+
+
+    def chunk_job_generator(self, job: dict, skeleton: Dict = None, attr: str = None) -> Iterator[Dict]:
+        """
+        Same as ``chunk_job``, but yields the tasks lazily, including the ones of recursive calls.
+
+        Neither ``job`` nor ``skeleton`` are modified. Tasks are new dictionaries on the top level, but share
+        the nested values with the ``job`` (copy-on-write), so the consumer must not modify nested values of tasks.
         """
 
-        data = []
-        skeleton = deepcopy(skeleton) or {}
-        job = deepcopy(job)
+        skeleton = skeleton or {}
+        job = dict(job)
 
         # The current attribute we are looking for in this iteration or the first one of preconfigured chunkables.
         attr = attr or self.chunkable_attrs[0] if self.chunkable_attrs else None
 
         # We have to return here the full job to let it work correctly with recursive calls.
         if not attr:
-            return [{**job, **skeleton}]
+            yield {**job, **skeleton}
+            return
 
         # If we shall need batching of flat vals of this attr we find out the batch size.
         # First we search in job (means the current level of recursive subdata being chunked.
@@ -455,10 +512,10 @@ class Scheduler(Essential):
                                  skeleton.get(f'max_{plural(attr)}_per_batch', MAX_BATCH)))
 
 
-        def push_list_chunks():
-            """ Appends chunks of lists using current skeleton and vals to chunk. """
+        def list_chunks(task_skeleton, vals):
+            """ Yields chunks of lists using current skeleton and vals to chunk. """
             for v in chunks(vals, batch_size):
-                data.append({**task_skeleton, **{plural(attr): v}})
+                yield {**task_skeleton, **{plural(attr): v}}
 
 
         logger.debug(f"Testing for chunking %s from %s with skeleton %s", attr, job, skeleton)
@@ -487,7 +544,7 @@ class Scheduler(Essential):
                 logger.debug("For %s we got current_vals: %s from %s, leaving job_skeleton: %s", possible_attr,
                              current_vals, job, job_skeleton)
 
-                task_skeleton = {**deepcopy(skeleton), **job_skeleton}
+                task_skeleton = {**skeleton, **job_skeleton}
 
                 # For dictionaries we have to either go deeper recursively, or just flatten keys if values are None-s.
                 if all(isinstance(v, dict) for v in current_vals):
@@ -496,7 +553,7 @@ class Scheduler(Essential):
                         if all(x is None for x in val.values()):
                             logger.debug("Value %s is all a dict of Nones. Need to flatten", val)
                             vals = self.validate_list_of_vals(val)
-                            push_list_chunks()
+                            yield from list_chunks(task_skeleton, vals)
 
                         else:
                             logger.debug("Real dictionary with values. Can't flatten it to dict: %s", val)
@@ -504,23 +561,24 @@ class Scheduler(Essential):
                                 logger.debug("SubIterating `%s` with %s", name, subdata)
 
                                 # Merge parts of task
-                                task = {**deepcopy(task_skeleton), **{plural(attr): [name]}}
+                                task = {**task_skeleton, **{plural(attr): [name]}}
                                 logger.debug("Task sample:  %s", task)
 
                                 if isinstance(subdata, dict):
                                     if not next_attr:
                                         # If there is no lower level configured to chunk, just keep this subdata in payload
                                         task.update(subdata)
-                                        data.append(task)
+                                        yield task
                                     else:
                                         logger.debug("Call recursive for %s from subdata: %s", next_attr, subdata)
-                                        data.extend(self.chunk_job(job=subdata, skeleton=task, attr=next_attr))
+                                        yield from self.chunk_job_generator(job=subdata, skeleton=task,
+                                                                            attr=next_attr)
 
                                 # If None-s we just add a task. `Name` (which is actually a value in this scenario)
                                 # was already added when creating task skeleton.
                                 elif subdata is None:
                                     logger.debug("Appending task to data for %s from %s", name, val)
-                                    data.append(task)
+                                    yield task
                                 else:
                                     raise InvalidJob(
                                         f"Unsupported type of val: {subdata} for attribute {possible_attr}")
@@ -528,21 +586,21 @@ class Scheduler(Essential):
                 # If current vals are not dictionaries, we just validate that they are flat supported values
                 else:
                     vals = self.validate_list_of_vals(current_vals)
-                    push_list_chunks()
+                    yield from list_chunks(task_skeleton, vals)
 
         else:
             logger.debug("No need for chunking for attr: %s in job: %s. Current skeleton is: %s", attr, job, skeleton)
-            task_skeleton = {**deepcopy(skeleton)}
+            task_skeleton = {**skeleton}
             for a in single_or_plural(attr):
                 if a in job:
                     attr_value = job.pop(a, None)
                     if attr_value:
                         try:
                             vals = self.validate_list_of_vals(attr_value)
-                            push_list_chunks()
 
                             # We are done here for not-chunkable attr. Return now.
-                            return data
+                            yield from list_chunks(task_skeleton, vals)
+                            return
 
                         except InvalidJob:
                             logger.warning("Caught InvalidJob exception.")
@@ -554,9 +612,7 @@ class Scheduler(Essential):
                 logger.error("Did not find values for %s in job: %s", attr, job)
             # Populate the remaining parts of the job back to task.
             task_skeleton.update(job)
-            data.append(task_skeleton)
-
-        return data
+            yield task_skeleton
 
 
     @staticmethod
@@ -657,6 +713,7 @@ class Scheduler(Essential):
         Process a file for creating tasks, then uploading it to S3.
         In case of execution time reached its limit, spawning a new sibling to continue the processing.
 
+        With ``config['batch_create_tasks']`` every popped batch of rows is created with ``create_tasks_in_batch``.
         """
 
         _ = self.get_db_field_name
@@ -668,14 +725,19 @@ class Scheduler(Essential):
 
         else:
             logger.info("Processing a file: %s", file_name)
+            queue_file = self.get_queue_file(file_name)
             while self.sufficient_execution_time_left:
                 logger.debug(f"Execution time left: {global_vars.lambda_context.get_remaining_time_in_millis()}ms "
                              f"Working next batch of {self._rows_to_process} tasks from file {file_name}")
-                data = self.pop_rows_from_file(file_name, rows=self._rows_to_process)
+                data = queue_file.read_rows(rows=self._rows_to_process)
                 if not data:
                     logger.info("No rows in file: %s", file_name)
                     break
 
+                if self.config.get('batch_create_tasks'):
+                    self.create_tasks_in_batch(data)
+                    continue
+
                 for raw_task in data:
                     logger.debug("Pushing task to DynamoDB: %s", raw_task)
                     task = json.loads(raw_task)
@@ -700,6 +762,32 @@ class Scheduler(Essential):
             self.clean_tmp()
 
 
+    def create_tasks_in_batch(self, raw_tasks: List[str]):
+        """
+        Create tasks from the rows of the queue file grouping them by Labourer.
+
+        For every Labourer the newest greenfield is fetched only once and the following tasks get consecutive
+        greenfields in the order of rows. Tasks and their meta rows are saved with batch writes.
+
+        :param raw_tasks: JSON rows of the queue file.
+        """
+
+        _ = self.get_db_field_name
+
+        tasks_by_labourer = defaultdict(list)
+        for raw_task in raw_tasks:
+            task = json.loads(raw_task)
+            tasks_by_labourer[task[_('labourer_id')]].append(task)
+
+        for labourer_id, tasks in tasks_by_labourer.items():
+            logger.debug("Pushing %s tasks of labourer %s to DynamoDB", len(tasks), labourer_id)
+            labourer = self.task_client.get_labourer(labourer_id)
+            new_tasks = self.task_client.create_tasks(labourer=labourer, tasks=tasks)
+            self.meta_handler.post_many(task_ids=[x[_('task_id')] for x in new_tasks], action='created',
+                                        labourer=labourer_id)
+            self.stats['tasks_created_in_batch'] += len(new_tasks)
+
+
     @property
     def _sleeptime_for_dynamo(self) -> float:
         """
@@ -711,9 +799,18 @@ class Scheduler(Essential):
         several versions this should probably be removed from config.
 
         For on-demand billing of the DynamoDB table returns zero.
+
+        If the DynamoDbClient of TaskManager has ``rate_limit_to_capacity`` also returns zero.
+        The client itself waits for the write capacity consumed by the previous calls. This is disabled by default,
+        enable it with ``config['task_config']['dynamo_db_config']['rate_limit_to_capacity'] = True``.
         """
+
+        dynamo_db_client = self.task_client.dynamo_db_client
+        if isinstance(dynamo_db_client.get_rate_limiter('write'), CapacityTokenBucket):
+            return 0
+
         try:
-            write_throughput = 1 / self.task_client.dynamo_db_client.get_capacity()['write']
+            write_throughput = 1 / dynamo_db_client.get_capacity()['write']
         except ZeroDivisionError:
             return 0
 
@@ -726,6 +823,9 @@ class Scheduler(Essential):
         """
         Reads the rows from the top of file. Along the way removes them from original file.
 
+        ..  warning:: DEPRECATED. Rewrites the whole remainder of the file on every call.
+                      ``process_file`` reads rows with ``QueueFile.read_rows`` instead.
+
         :param str file_name:    File to read.
         :param int rows:        Number of rows to read. Default: 1
         :return:                List of strings read from file top.
@@ -759,12 +859,24 @@ class Scheduler(Essential):
         return result
 
 
+    def get_queue_file(self, file_name: Optional[str] = None) -> QueueFile:
+        """
+        Queue file with a persisted read offset. The compression codec is detected from the name of the file,
+        so you can enable gzip or zstd compression just by adding the suffix to ``config['queue_file']``.
+        Ex: ``'tasks_queue.txt.gz'``
+        """
+
+        return QueueFile(file_name or self.local_queue_file, block_rows=self.config['queue_file_block_rows'])
+
+
     def clean_tmp(self, file_name=None):
         file_to_remove = file_name or self.local_queue_file
 
         if os.path.isfile(file_to_remove):
             os.remove(file_to_remove)
 
+        self.get_queue_file(file_to_remove).remove_offset_file()
+
 
     @property
     def _rows_to_process(self):
@@ -789,6 +901,8 @@ class Scheduler(Essential):
         """
 
         if not os.path.isfile(self.local_queue_file):
+            # The remote file is always uploaded compacted, so a stale offset must not be applied to it.
+            self.get_queue_file().remove_offset_file()
             try:
                 self.s3_client.download_file(Bucket=self._queue_bucket, Key=self.remote_queue_file,
                                              Filename=self.local_queue_file)
@@ -817,8 +931,11 @@ class Scheduler(Essential):
     def upload_and_unlock_queue_file(self):
         """
         Upload the local queue file to S3 and remove the `locked_` by prefix copy if it exists.
+        The rows already read from the local file are dropped before the upload.
         """
 
+        self.get_queue_file().compact()
+
         # If there is data left unprocessed in the file, upload it for future processing by siblings or someone else.
         if os.path.isfile(self.local_queue_file):
             self.s3_client.upload_file(Filename=self.local_queue_file, Bucket=self._queue_bucket,
@@ -843,10 +960,12 @@ class Scheduler(Essential):
         """
 
         if name is None:
-            filename_parts = self.config['queue_file'].rsplit('.', 1)
+            # The suffix of compression codec (if any) is kept at the end of the name. Ex: `tasks_queue_ID.txt.gz`
+            file_name, codec_suffix = QueueFile.split_codec_suffix(self.config['queue_file'])
+            filename_parts = file_name.rsplit('.', 1)
             assert len(filename_parts) == 2, "Got bad file name"
             self._queue_file_name = \
-                f"{filename_parts[0]}_{global_vars.lambda_context.aws_request_id}.{filename_parts[1]}"
+                f"{filename_parts[0]}_{global_vars.lambda_context.aws_request_id}.{filename_parts[1]}{codec_suffix}"
         else:
             self._queue_file_name = name
 
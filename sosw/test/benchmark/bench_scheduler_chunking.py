@@ -0,0 +1,341 @@
+"""
+Benchmark of chunking a wide job to tasks in Scheduler.
+
+Compares the streaming pipeline ``construct_job_data_generator`` (``chunk_dates_generator`` -> ``chunk_job_generator``)
+used by ``parse_job_to_file`` with the previous implementation that built the full list of tasks and deep-copied
+the job, the skeletons and the chunked lists on every level. The legacy implementation is kept here only as
+a reference for the comparison. Both variants write the tasks as JSON rows to a temporary file, like
+``parse_job_to_file`` does, and report the time and the peak of allocated memory.
+
+Run: ``python -m sosw.test.benchmark.bench_scheduler_chunking [sections] [stores] [products]``
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+from copy import deepcopy
+from typing import Dict, List
+from unittest.mock import patch
+
+logging.getLogger('botocore').setLevel(logging.WARNING)
+
+os.environ["STAGE"] = "test"
+
+from sosw.components.helpers import chunks, get_list_of_multiple_or_one_or_empty_from_dict
+from sosw.scheduler import InvalidJob, Scheduler, global_vars, logger, plural, single_or_plural
+from sosw.test.variables import TEST_SCHEDULER_CONFIG
+
+
+class LegacyScheduler(Scheduler):
+    """ Scheduler with the list-based chunkers as they were before the streaming pipeline. """
+
+
+    def chunk_dates(self, job: Dict, skeleton: Dict = None) -> List[Dict]:
+        """
+        There is a support for multiple not nested parameters to chunk. Dates is one very specific of them.
+        """
+
+        data = []
+        skeleton = deepcopy(skeleton) or {}
+        job = deepcopy(job)
+
+        period = job.pop('period', None)
+        isolate = job.pop('isolate_days', None)
+
+        period_patterns = ['last_[0-9]+_days', '[0-9]+_days_back', 'yesterday', 'today', 'previous_[0-9]+_days',
+                           'last_week']
+
+        # Adding custom methods for creating date list found in config of child classes
+        custom_period_patterns = self.config.get('custom_period_patterns')
+        if custom_period_patterns:
+            if isinstance(custom_period_patterns, (list, tuple)):
+                for method in custom_period_patterns:
+                    if isinstance(method, str):
+                        period_patterns.append(method)
+                    else:
+                        raise TypeError(f"Pattern '{method}' expected to be str, got {type(method)}")
+            else:
+                raise TypeError(f"'custom_period_patterns' expected to be (list, tuple), "
+                                f"got {type(custom_period_patterns)}")
+
+        if period:
+
+            date_list = []
+            for pattern in period_patterns:
+                if re.match(pattern, period):
+                    # Call the appropriate method with given value from job.
+                    logger.debug(f"Found period '%s' for job %s", period, job)
+                    method_name = pattern.replace('[0-9]+', 'x', 1)
+                    try:
+                        date_list = getattr(self, method_name)(period)
+
+                    except TypeError:
+                        # For methods without parameter
+                        date_list = getattr(self, method_name)()
+
+                    break
+            else:
+                raise ValueError(f"Unsupported period requested: {period}. Valid (basic) options are: "
+                                 f"'last_X_days', 'X_days_back', 'yesterday', 'today', 'previous_[0-9]+_days', "
+                                 f"'last_week'")
+
+            if isolate:
+                assert len(date_list) > 0, f"The chunking period: {period} did not generate date_list. Bad."
+
+                for d in date_list:
+                    data.append({**job, **skeleton, 'date_list': [d]})
+            else:
+                if len(date_list) > 1:
+                    logger.debug("Running chunking for multiple days, but without date isolation. "
+                                 "Your workers might feel bad.")
+                data.append({**job, **skeleton, 'date_list': date_list})
+
+        else:
+            logger.debug("No `period` chunking requested in job %s", job)
+            data.append({**job, **skeleton})
+
+        return data
+
+
+    def construct_job_data(self, job: Dict, skeleton: Dict = None) -> List[Dict]:
+        """
+        Chunks the job to tasks using several layers. Each layer is represented with a `chunker` method.
+        All chunkers should accept `job` and optional `skeleton` for tasks and return a list of tasks.
+        If there is nothing to chunk for some chunker, return same `job` (with injected `skeleton`) wrapped in a list.
+
+        Default chunkers:
+
+        - Date list chunking
+        - Recursive chunking for `chunkable_attrs`
+
+        """
+
+        CHUNKERS = [self.chunk_dates, self.chunk_job]
+
+        data = [job]
+        skeleton = deepcopy(skeleton) or {}
+
+        for chunker in CHUNKERS:
+            chunked = []  # Container for results of current chunker method.
+            for task in data:
+                logger.debug("Chunking %s with %s", task, chunker)
+                chunked.extend(chunker(job=task))
+
+            data = deepcopy(chunked)
+
+        # Inject the skeleton to the resulting tasks
+        for task in data:
+            task.update(skeleton)
+
+        return data
+
+
+    def chunk_job(self, job: dict, skeleton: Dict = None, attr: str = None) -> List[Dict]:
+        """
+        Recursively parses a job, validates everything and chunks to simple tasks what should be chunked.
+        The Scenario of chunking and isolation is worth another story, so you should put a link here once it is ready.
+        """
+
+        data = []
+        skeleton = deepcopy(skeleton) or {}
+        job = deepcopy(job)
+
+        # The current attribute we are looking for in this iteration or the first one of preconfigured chunkables.
+        attr = attr or self.chunkable_attrs[0] if self.chunkable_attrs else None
+
+        # We have to return here the full job to let it work correctly with recursive calls.
+        if not attr:
+            return [{**job, **skeleton}]
+
+        # If we shall need batching of flat vals of this attr we find out the batch size.
+        # First we search in job (means the current level of recursive subdata being chunked.
+        # If not specified per job, we try the setting inherited from level(s) upper probably even the root of main job.
+        MAX_BATCH = 1000000  # This is not configurable!
+        batch_size = int(job.get(f'max_{plural(attr)}_per_batch',
+                                 skeleton.get(f'max_{plural(attr)}_per_batch', MAX_BATCH)))
+
+
+        def push_list_chunks():
+            """ Appends chunks of lists using current skeleton and vals to chunk. """
+            for v in chunks(vals, batch_size):
+                data.append({**task_skeleton, **{plural(attr): v}})
+
+
+        logger.debug(f"Testing for chunking %s from %s with skeleton %s", attr, job, skeleton)
+        # First of all decide whether we need to chunk current job (or a sub-job if called recursively).
+        if self.needs_chunking(plural(attr), {**job, **skeleton}):
+
+            # Force batches to isolate if we shall be dealing with flat data.
+            # But we still respect the `max_PARAM_per_batch` if it is provided in job.
+            # Having batch_size == MAX_BATCH asserts that we had
+            batch_size = 1 if batch_size == MAX_BATCH else batch_size
+
+            # Next attribute is either name of attribute according to config, or None if we are already in last level.
+            next_attr = self.get_next_chunkable_attr(attr)
+            logger.debug("Next attr: %s", next_attr)
+
+            # Here and many places further we support both single and plural versions of attribute names.
+            for possible_attr in single_or_plural(attr):
+                logger.debug("Iterating possible: %s", possible_attr)
+                current_vals = get_list_of_multiple_or_one_or_empty_from_dict(job, possible_attr)
+                if not current_vals:
+                    continue
+
+                # This is not the `skeleton` received during the call, but the remaining parts of the `job`,
+                # not related to current `attr`
+                job_skeleton = {k: v for k, v in job.items() if k not in [possible_attr]}
+                logger.debug("For %s we got current_vals: %s from %s, leaving job_skeleton: %s", possible_attr,
+                             current_vals, job, job_skeleton)
+
+                task_skeleton = {**deepcopy(skeleton), **job_skeleton}
+
+                # For dictionaries we have to either go deeper recursively, or just flatten keys if values are None-s.
+                if all(isinstance(v, dict) for v in current_vals):
+                    for val in current_vals:
+
+                        if all(x is None for x in val.values()):
+                            logger.debug("Value %s is all a dict of Nones. Need to flatten", val)
+                            vals = self.validate_list_of_vals(val)
+                            push_list_chunks()
+
+                        else:
+                            logger.debug("Real dictionary with values. Can't flatten it to dict: %s", val)
+                            for name, subdata in val.items():
+                                logger.debug("SubIterating `%s` with %s", name, subdata)
+
+                                # Merge parts of task
+                                task = {**deepcopy(task_skeleton), **{plural(attr): [name]}}
+                                logger.debug("Task sample:  %s", task)
+
+                                if isinstance(subdata, dict):
+                                    if not next_attr:
+                                        # If there is no lower level configured to chunk, just keep this subdata in payload
+                                        task.update(subdata)
+                                        data.append(task)
+                                    else:
+                                        logger.debug("Call recursive for %s from subdata: %s", next_attr, subdata)
+                                        data.extend(self.chunk_job(job=subdata, skeleton=task, attr=next_attr))
+
+                                # If None-s we just add a task. `Name` (which is actually a value in this scenario)
+                                # was already added when creating task skeleton.
+                                elif subdata is None:
+                                    logger.debug("Appending task to data for %s from %s", name, val)
+                                    data.append(task)
+                                else:
+                                    raise InvalidJob(
+                                        f"Unsupported type of val: {subdata} for attribute {possible_attr}")
+
+                # If current vals are not dictionaries, we just validate that they are flat supported values
+                else:
+                    vals = self.validate_list_of_vals(current_vals)
+                    push_list_chunks()
+
+        else:
+            logger.debug("No need for chunking for attr: %s in job: %s. Current skeleton is: %s", attr, job, skeleton)
+            task_skeleton = {**deepcopy(skeleton)}
+            for a in single_or_plural(attr):
+                if a in job:
+                    attr_value = job.pop(a, None)
+                    if attr_value:
+                        try:
+                            vals = self.validate_list_of_vals(attr_value)
+                            push_list_chunks()
+
+                            # We are done here for not-chunkable attr. Return now.
+                            return data
+
+                        except InvalidJob:
+                            logger.warning("Caught InvalidJob exception.")
+                            # If a custom payload is not following the chunking convention - just translate it as is.
+                            # And return the pop-ed value back to the job.
+                            job[a] = attr_value
+                        break
+            else:
+                logger.error("Did not find values for %s in job: %s", attr, job)
+            # Populate the remaining parts of the job back to task.
+            task_skeleton.update(job)
+            data.append(task_skeleton)
+
+        return data
+
+
+def make_job(sections: int, stores: int, products: int) -> Dict:
+    """ Wide synthetic job: every product of every store of every section is isolated for each of 7 days. """
+
+    return {
+        'period':           'last_7_days',
+        'isolate_days':     True,
+        'isolate_sections': True,
+        'sections':         {
+            f"section_{i}": {
+                'isolate_stores': True,
+                'stores':         {
+                    f"store_{i}_{j}": {
+                        'isolate_products': True,
+                        'products':         [f"product_{i}_{j}_{k}" for k in range(products)],
+                    } for j in range(stores)
+                },
+            } for i in range(sections)
+        },
+    }
+
+
+def write_tasks(tasks, file_name: str) -> int:
+    count = 0
+    with open(file_name, 'w') as f:
+        for row in tasks:
+            f.write(f"{json.dumps(row)}\n")
+            count += 1
+    return count
+
+
+def measure(fn, job: Dict, file_name: str):
+    st = time.perf_counter()
+    count = write_tasks(fn(deepcopy(job), skeleton={'labourer_id': 'some_function'}), file_name)
+    duration = time.perf_counter() - st
+
+    tracemalloc.start()
+    write_tasks(fn(deepcopy(job), skeleton={'labourer_id': 'some_function'}), file_name)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return count, duration, peak
+
+
+def main(sections: int = 10, stores: int = 50, products: int = 20):
+    global_vars.lambda_context = types.SimpleNamespace(aws_request_id='bench')
+
+    with patch('boto3.client'), patch('sosw.app.get_config', return_value={}):
+        legacy = LegacyScheduler(custom_config=deepcopy(TEST_SCHEDULER_CONFIG))
+        streaming = Scheduler(custom_config=deepcopy(TEST_SCHEDULER_CONFIG))
+
+    job = make_job(sections, stores, products)
+
+    # Make sure both implementations produce the same tasks before measuring them.
+    small_job = make_job(2, 3, 4)
+    assert legacy.construct_job_data(deepcopy(small_job)) == list(streaming.construct_job_data_generator(small_job))
+
+    file_name = os.path.join(tempfile.mkdtemp(), 'bench_queue.txt')
+    try:
+        print(f"Job: {sections} sections x {stores} stores x {products} products x 7 days")
+        results = {}
+        for name, fn in [('legacy', legacy.construct_job_data), ('streaming', streaming.construct_job_data_generator)]:
+            count, duration, peak = measure(fn, job, file_name)
+            results[name] = duration, peak
+            print(f"{name:<10} tasks: {count}  time: {duration:.2f}s  peak memory: {peak / 2 ** 20:.1f} MiB")
+
+        print(f"speedup: {results['legacy'][0] / results['streaming'][0]:.2f}x  "
+              f"memory: {results['legacy'][1] / results['streaming'][1]:.1f}x less")
+    finally:
+        os.remove(file_name)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:4]])
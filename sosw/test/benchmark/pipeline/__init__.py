@@ -0,0 +1,10 @@
+"""
+End-to-end throughput benchmark of the Essentials: Scheduler -> Orchestrator -> Worker -> WorkerAssistant ->
+Scavenger with local stand-ins of the AWS services. See ``runner`` for the details and ``DEFAULT_SHAPE``
+for the parameters of the job.
+
+Run: ``python -m sosw.test.benchmark.pipeline [--shape '{"labourers": 4}'] [--output results.json]
+[--compare baseline.json]``
+"""
+
+from sosw.test.benchmark.pipeline.runner import DEFAULT_SHAPE, PipelineBenchmark, compare_results, format_results
@@ -0,0 +1,82 @@
+"""
+Run the pipeline benchmark, save the results as JSON and compare them with the results of another version.
+
+Example of checking a change for regressions. The baseline is measured in a separate worktree of the commit
+the branch is based on. If that commit does not have the benchmark yet, only the benchmark package and the
+MemoryDynamoDb backend it runs on are checked out there from the branch:
+
+..  code-block:: bash
+
+    git worktree add /tmp/sosw-baseline $(git merge-base master my_branch)
+    cd /tmp/sosw-baseline
+    git checkout my_branch -- sosw/test/benchmark sosw/components/memory_dynamo_db.py
+    python -m sosw.test.benchmark.pipeline --output /tmp/baseline.json
+    cd - && git worktree remove --force /tmp/sosw-baseline
+    python -m sosw.test.benchmark.pipeline --output /tmp/results.json --compare /tmp/baseline.json
+
+The MemoryDynamoDb backend requires the ``CapacityTokenBucket`` of DynamoDbClient, so older trees can not run the
+benchmark. Compare with the first commit having it instead.
+
+The exit code is 1 if there are regressions bigger than the ``--tolerance`` (``--latency-tolerance`` for latencies).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+os.environ["STAGE"] = "test"
+
+from sosw.test.benchmark.pipeline.runner import PipelineBenchmark, compare_results, format_results
+
+
+def load_shape(value: str) -> dict:
+    """ The shape is either a JSON string or a path to a JSON file. """
+
+    if os.path.isfile(value):
+        with open(value) as f:
+            return json.load(f)
+
+    return json.loads(value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m sosw.test.benchmark.pipeline', description=__doc__.split('\n')[1])
+    parser.add_argument('--shape', type=load_shape, default={}, help="Updates of DEFAULT_SHAPE: JSON or path to file")
+    parser.add_argument('--output', help="Path to save the results as JSON")
+    parser.add_argument('--compare', help="Path to the JSON results of the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed relative change of throughput and API calls. Default: 0.1")
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help="Allowed relative growth of p99 latencies. Default: 0.5")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Same shape as the baseline unless the shape is given explicitly.
+        args.shape = args.shape or baseline['shape']
+
+    results = PipelineBenchmark(args.shape).run()
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if baseline:
+        regressions = compare_results(baseline, results, tolerance=args.tolerance,
+                                      latency_tolerance=args.latency_tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions compared to {args.compare}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,450 @@
+"""
+Runner of the end-to-end benchmark of the Essentials pipeline.
+
+The real Scheduler, Orchestrator, Worker, WorkerAssistant and Scavenger are called with their lambda handlers from
+``get_lambda_handler`` against ``AwsStandIns``. The Scheduler creates the tasks of one job per Labourer. After that
+every cycle runs the Orchestrator, delivers the invocations of Workers and their reports to the WorkerAssistant, runs
+the Scavenger and moves the virtual clock (``time.time``) forward by ``cycle_seconds``. The run is over when there
+are no tasks left in the queue or the retry table.
+
+Latencies are measured with the real clock. The percentiles of stages are calculated for the warm runs, the cold
+starts of functions are reported separately. ``tasks_per_second`` is the number of closed tasks divided by the sum
+of durations of all the function runs, so it does not depend on how long the virtual time has to wait for retries.
+"""
+
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import time
+
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import boto3
+
+import sosw
+
+from sosw.app import get_lambda_handler, global_vars
+from sosw.components.helpers import recursive_update
+from sosw.orchestrator import Orchestrator
+from sosw.scavenger import Scavenger
+from sosw.scheduler import Scheduler, plural
+from sosw.test.benchmark.pipeline.stand_ins import AwsStandIns
+from sosw.worker import Worker
+from sosw.worker_assistant import WorkerAssistant
+
+
+DEFAULT_SHAPE = {
+    # Number of Labourers. The Scheduler gets one job for each of them.
+    'labourers':                    4,
+    # Chunkable attributes of the job with the number of values of each. Every combination becomes a task.
+    'chunkable_attrs':              [('section', 5), ('store', 50)],
+    # Share of Worker invocations that report the task as failed. These tasks expire and are retried.
+    'failure_rate':                 0.05,
+    'max_attempts':                 3,
+    'max_simultaneous_invocations': 100,
+    # Number of health metrics of every Labourer fetched from CloudWatch.
+    'health_metrics':               1,
+    'batch_create_tasks':           True,
+    'running_tasks_counters':       False,
+    # One of: 'lambda', 'dynamo_db', 'sqs'. See ``Worker.report_to_worker_assistant``.
+    'completion_transport':         'lambda',
+    # Updates for the config of MetaHandler of all the Essentials, e.g. ``{'buffered': True}``.
+    'meta_handler_config':          {},
+    # Timeout of the Labourer Lambdas. Defines the delay of retries.
+    'lambda_timeout':               300,
+    # Virtual seconds between cycles (the schedule of the Orchestrator and the Scavenger).
+    'cycle_seconds':                60,
+    'max_cycles':                   500,
+    'seed':                         42,
+}
+
+STAGES = ('scheduler', 'orchestrator', 'worker', 'worker_assistant', 'scavenger')
+
+PREFIX = 'autotest_'
+WORKER_ASSISTANT_QUEUE_URL = 'https://sqs.us-west-2.amazonaws.com/000000000000/sosw_worker_assistant'
+
+
+class VirtualClock:
+    """ Replacement of ``time.time`` that can be moved forward. """
+
+
+    def __init__(self):
+        self._time = time.time
+        self.offset = 0
+
+
+    def time(self) -> float:
+        return self._time() + self.offset
+
+
+    def advance(self, seconds: float):
+        self.offset += seconds
+
+
+class BenchmarkWorker(Worker):
+    """ Worker that does nothing, but reports ``config['failure_rate']`` of the tasks as failed. """
+
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.random = random.Random(self.config.get('seed'))
+
+
+    def __call__(self, event, reset_result: bool = True):
+        if event.get('task_id') and self.random.random() < self.config.get('failure_rate', 0):
+            self.mark_task_as_failed(event['task_id'])
+            event = {k: v for k, v in event.items() if k != 'task_id'}
+
+        super().__call__(event, reset_result)
+
+
+class BenchmarkScavenger(Scavenger):
+    """ In the ``test`` stage SnsManager does not create a client, so the local stand-in is given to it. """
+
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sns_client.client = boto3.client('sns')
+
+
+def make_job(labourer_id: str, chunkable_attrs: List) -> Dict:
+    """ Job with isolated values of every one of `chunkable_attrs`, so every combination of values becomes a task. """
+
+
+    def level(i: int, path: str):
+        attr, count = chunkable_attrs[i]
+        values = [f"{attr}_{path}{k}" for k in range(count)]
+        if i == len(chunkable_attrs) - 1:
+            return {f"isolate_{plural(attr)}": True, plural(attr): values}
+
+        return {f"isolate_{plural(attr)}": True, plural(attr): {v: level(i + 1, f"{path}{k}_")
+                                                                for k, v in enumerate(values)}}
+
+
+    return {'lambda_name': labourer_id, **level(0, '')} if chunkable_attrs else {'lambda_name': labourer_id}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """ Nearest-rank percentile `q` (0 - 100) of `values`. """
+
+    if not values:
+        return 0
+
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class PipelineBenchmark:
+    """
+    Benchmark of the Essentials with the job shape from ``DEFAULT_SHAPE`` updated by the given `shape`.
+
+    .. code-block:: python
+
+       results = PipelineBenchmark({'labourers': 1, 'failure_rate': 0}).run()
+       print(results['summary']['tasks_per_second'])
+    """
+
+
+    def __init__(self, shape: Optional[Dict] = None):
+        self.shape = recursive_update(DEFAULT_SHAPE, shape or {})
+        # The lists of the shape are replaced, not merged.
+        for k, v in (shape or {}).items():
+            if isinstance(v, (list, tuple)):
+                self.shape[k] = v
+
+        self.labourer_ids = [f"bench_labourer_{i}" for i in range(self.shape['labourers'])]
+        self.clock = None
+        self.stand_ins = None
+
+
+    def get_meta_handler_config(self) -> Dict:
+        return recursive_update({'dynamo_db_config': {'table_name': f"{PREFIX}sosw_tasks_meta"}},
+                                self.shape['meta_handler_config'])
+
+
+    def get_tasks_table_config(self) -> Dict:
+        return {
+            'table_name':       f"{PREFIX}sosw_tasks",
+            'index_greenfield': f"{PREFIX}sosw_tasks_greenfield",
+        }
+
+
+    def get_task_config(self) -> Dict:
+        labourers = {}
+        for labourer_id in self.labourer_ids:
+            labourers[labourer_id] = {
+                'arn':                          f"arn:aws:lambda:us-west-2:000000000000:function:{labourer_id}",
+                'max_simultaneous_invocations': self.shape['max_simultaneous_invocations'],
+                'health_metrics':               {
+                    f"metric_{i}": {
+                        'details':                     {
+                            'Name':       f"metric_{i}",
+                            'Namespace':  'AWS/Lambda',
+                            'Dimensions': [{'Name': 'FunctionName', 'Value': labourer_id}],
+                        },
+                        'feelings':                    {3: 50, 4: 25},
+                        'feeling_comparison_operator': 'le',
+                    } for i in range(self.shape['health_metrics'])
+                },
+            }
+
+        config = {
+            'dynamo_db_config':                        self.get_tasks_table_config(),
+            'sosw_closed_tasks_table':                 f"{PREFIX}sosw_closed_tasks",
+            'sosw_closed_tasks_labourer_status_index': f"{PREFIX}labourer_task_status_with_time",
+            'sosw_retry_tasks_table':                  f"{PREFIX}sosw_retry_tasks",
+            'sosw_retry_tasks_greenfield_index':       f"{PREFIX}labourer_id_greenfield",
+            'max_attempts':                            self.shape['max_attempts'],
+            'labourers':                               labourers,
+        }
+
+        if self.shape['running_tasks_counters']:
+            config['sosw_running_tasks_counters_table'] = f"{PREFIX}sosw_running_tasks_counters"
+
+        return config
+
+
+    def get_configs(self) -> Dict[str, Dict]:
+        """ Custom configs of the functions by the name of the stage. """
+
+        task_config = self.get_task_config()
+        meta_handler_config = self.get_meta_handler_config()
+        counters_table = task_config.get('sosw_running_tasks_counters_table')
+
+        essential = {'task_config': task_config, 'meta_handler_config': meta_handler_config}
+        job_schema = {'chunkable_attrs': [(attr, {}) for attr, _ in self.shape['chunkable_attrs']]}
+
+        return {
+            'scheduler':        {
+                **essential,
+                'batch_create_tasks':  self.shape['batch_create_tasks'],
+                'job_schema':          job_schema,
+                'job_schema_variants': {'default': job_schema},
+            },
+            'orchestrator':     essential,
+            'scavenger':        essential,
+            'worker':           {
+                'completion_transport':              self.shape['completion_transport'],
+                'sosw_worker_assistant_queue_url':   WORKER_ASSISTANT_QUEUE_URL,
+                'completion_dynamo_db_config':       {**WorkerAssistant.DEFAULT_CONFIG['dynamo_db_config'],
+                                                      **self.get_tasks_table_config()},
+                'sosw_running_tasks_counters_table': counters_table,
+                'failure_rate':                      self.shape['failure_rate'],
+            },
+            'worker_assistant': {
+                'dynamo_db_config':                  self.get_tasks_table_config(),
+                'meta_handler_config':               meta_handler_config,
+                'sosw_running_tasks_counters_table': counters_table,
+            },
+        }
+
+
+    def register_functions(self):
+        configs = self.get_configs()
+
+        for name, processor_class in [('scheduler', Scheduler), ('orchestrator', Orchestrator),
+                                      ('scavenger', BenchmarkScavenger), ('worker_assistant', WorkerAssistant)]:
+            self.stand_ins.register_function(f"sosw_{name}", get_lambda_handler(
+                    processor_class, global_vars=global_vars, custom_config=configs[name]))
+
+        for i, labourer_id in enumerate(self.labourer_ids):
+            self.stand_ins.register_function(labourer_id, get_lambda_handler(
+                    BenchmarkWorker, global_vars=global_vars,
+                    custom_config={**configs['worker'], 'seed': f"{self.shape['seed']}_{i}"}))
+
+        self.stand_ins.sqs.subscribe(WORKER_ASSISTANT_QUEUE_URL, 'sosw_worker_assistant')
+
+
+    def count_items(self, table: str) -> int:
+        with self.stand_ins.not_counted():
+            return self.stand_ins.dynamodb.describe_table(TableName=f"{PREFIX}{table}")['Table']['ItemCount']
+
+
+    def count_closed_tasks(self) -> Counter:
+        """ Number of closed tasks by status: ``'completed'`` or ``'dead'``. """
+
+        result = Counter()
+        with self.stand_ins.not_counted():
+            for page in self.stand_ins.dynamodb.get_paginator('scan').paginate(
+                    TableName=f"{PREFIX}sosw_closed_tasks"):
+                for item in page['Items']:
+                    result['completed' if item['labourer_id_task_status']['S'].endswith('_1') else 'dead'] += 1
+
+        return result
+
+
+    def run(self) -> Dict:
+        """ Run the pipeline until all the tasks are closed and return the results. """
+
+        self.clock = VirtualClock()
+        self.stand_ins = AwsStandIns(lambda_timeout=self.shape['lambda_timeout'])
+        self.stand_ins.dynamodb.create_sosw_tables(prefix=PREFIX)
+
+        stages = {'sosw_scheduler': 'scheduler', 'sosw_orchestrator': 'orchestrator',
+                  'sosw_worker_assistant': 'worker_assistant', 'sosw_scavenger': 'scavenger',
+                  **{x: 'worker' for x in self.labourer_ids}}
+
+        logging.disable(logging.WARNING)
+        try:
+            with patch('boto3.client', new=self.stand_ins.client), patch('sosw.app.get_config', return_value={}), \
+                    patch('time.time', new=self.clock.time):
+                self.register_functions()
+
+                st = time.perf_counter()
+                for labourer_id in self.labourer_ids:
+                    job = make_job(labourer_id, self.shape['chunkable_attrs'])
+                    self.stand_ins.run_function('sosw_scheduler', {'job': job}, stage='scheduler')
+                tasks = self.count_items('sosw_tasks')
+
+                cycles = 0
+                while cycles < self.shape['max_cycles'] \
+                        and self.count_items('sosw_tasks') + self.count_items('sosw_retry_tasks'):
+                    cycles += 1
+                    self.stand_ins.run_function('sosw_orchestrator', {}, stage='orchestrator')
+                    self.stand_ins.drain(stages)
+                    self.stand_ins.run_function('sosw_scavenger', {}, stage='scavenger')
+                    self.stand_ins.drain(stages)
+                    self.clock.advance(self.shape['cycle_seconds'])
+
+                wall_seconds = time.perf_counter() - st
+                closed = self.count_closed_tasks()
+        finally:
+            logging.disable(logging.NOTSET)
+
+        return self.make_results(tasks=tasks, closed=closed, cycles=cycles, wall_seconds=wall_seconds)
+
+
+    def make_results(self, tasks: int, closed: Counter, cycles: int, wall_seconds: float) -> Dict:
+        closed_tasks = sum(closed.values())
+        per_task = lambda x: round(x / closed_tasks, 3) if closed_tasks else None
+
+        stages = {}
+        for stage in STAGES:
+            durations = self.stand_ins.durations.get(stage, [])
+            cold_durations = self.stand_ins.cold_durations.get(stage, [])
+            api_calls = self.stand_ins.calls.get(stage, Counter())
+            stages[stage] = {
+                'invocations':         len(durations) + len(cold_durations),
+                'cold_starts':         len(cold_durations),
+                'seconds':             round(sum(durations) + sum(cold_durations), 6),
+                'cold_start_ms':       round(max(cold_durations, default=0) * 1000, 3),
+                'p50_ms':              round(percentile(durations, 50) * 1000, 3),
+                'p99_ms':              round(percentile(durations, 99) * 1000, 3),
+                'max_ms':              round(max(durations, default=0) * 1000, 3),
+                'api_calls':           sum(api_calls.values()),
+                'api_calls_per_task':  per_task(sum(api_calls.values())),
+                'api_calls_by_method': dict(sorted(api_calls.items())),
+            }
+
+        busy_seconds = sum(x['seconds'] for x in stages.values())
+        api_calls = sum(x['api_calls'] for x in stages.values())
+
+        return {
+            'environment': {
+                'sosw_version': get_sosw_version(),
+                'git_revision': get_git_revision(),
+                'python':       platform.python_version(),
+                'platform':     platform.platform(),
+                'created_at':   datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            },
+            # Same as loaded from JSON for comparison with saved results.
+            'shape':       json.loads(json.dumps(self.shape)),
+            'summary':     {
+                'tasks':              tasks,
+                'completed':          closed['completed'],
+                'dead':               closed['dead'],
+                'unfinished':         tasks - closed_tasks,
+                'cycles':             cycles,
+                'busy_seconds':       round(busy_seconds, 6),
+                'wall_seconds':       round(wall_seconds, 6),
+                'tasks_per_second':   round(closed_tasks / busy_seconds, 3) if busy_seconds else None,
+                'api_calls':          api_calls,
+                'api_calls_per_task': per_task(api_calls),
+            },
+            'stages':      stages,
+        }
+
+
+def get_sosw_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version
+        return version('sosw')
+    except Exception:
+        return None
+
+
+def get_git_revision() -> Optional[str]:
+    """ Revision of the working copy if sosw is run from the sources. """
+
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=os.path.dirname(sosw.__file__),
+                              capture_output=True, text=True, check=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare_results(baseline: Dict, current: Dict, tolerance: float = 0.1,
+                    latency_tolerance: float = 0.5) -> List[str]:
+    """
+    Compare the `current` results with the `baseline` ones of the same shape.
+
+    :param tolerance:           Allowed relative change of the throughput and API calls. E.g. with 0.1 the throughput
+                                may drop by 10% and the number of API calls per task may grow by 10%.
+    :param latency_tolerance:   Allowed relative growth of the p99 latency of stages. Percentiles of short runs are
+                                noisy, so the default is higher.
+    :return:                    Descriptions of regressions. Empty list if there are none.
+    """
+
+    if baseline['shape'] != current['shape']:
+        raise ValueError("Can not compare the results of different shapes")
+
+    regressions = []
+
+
+    def check(name: str, old, new, higher_is_better: bool = False, allowed: float = tolerance):
+        if not old or new is None:
+            return
+
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > allowed:
+            regressions.append(f"{name}: {old} -> {new} ({change:+.1%})")
+
+
+    check('tasks_per_second', baseline['summary']['tasks_per_second'], current['summary']['tasks_per_second'],
+          higher_is_better=True)
+    check('api_calls_per_task', baseline['summary']['api_calls_per_task'], current['summary']['api_calls_per_task'])
+
+    for stage, old in baseline['stages'].items():
+        new = current['stages'].get(stage, {})
+        check(f"{stage}.api_calls_per_task", old['api_calls_per_task'], new.get('api_calls_per_task'))
+        check(f"{stage}.p99_ms", old['p99_ms'], new.get('p99_ms'), allowed=latency_tolerance)
+
+    return regressions
+
+
+def format_results(results: Dict) -> str:
+    """ Human readable table of the results. """
+
+    summary = results['summary']
+    lines = [
+        f"Tasks: {summary['tasks']}  completed: {summary['completed']}  dead: {summary['dead']}  "
+        f"unfinished: {summary['unfinished']}  cycles: {summary['cycles']}",
+        f"Throughput: {summary['tasks_per_second']} tasks/s  busy: {summary['busy_seconds']:.2f}s  "
+        f"wall: {summary['wall_seconds']:.2f}s  API calls per task: {summary['api_calls_per_task']}",
+        f"{'stage':<18}{'runs':>8}{'seconds':>10}{'cold ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        f"{'calls/task':>12}",
+    ]
+
+    for stage, x in results['stages'].items():
+        lines.append(f"{stage:<18}{x['invocations']:>8}{x['seconds']:>10.3f}{x['cold_start_ms']:>10.2f}"
+                     f"{x['p50_ms']:>10.2f}{x['p99_ms']:>10.2f}{x['max_ms']:>10.2f}"
+                     f"{x['api_calls_per_task'] or 0:>12.2f}")
+
+    return '\n'.join(lines)
@@ -0,0 +1,343 @@
+"""
+Local stand-ins for the AWS services used by the Essentials: DynamoDB, Lambda, SQS, S3, CloudWatch, SNS
+and EventBridge.
+
+``AwsStandIns.client`` replaces ``boto3.client``. DynamoDB is the in-process ``MemoryDynamoDb``. Asynchronous Lambda
+invocations (and SQS messages) are queued and delivered to the registered handlers by ``drain()``, so that the runner
+controls the order of the stages. Every API call is counted per stage: ``'<service>.<method>'``.
+"""
+
+import json
+import threading
+import time
+import uuid
+
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from sosw.app import global_vars
+from sosw.components.memory_dynamo_db import MemoryDynamoDb
+
+
+class LocalContext:
+    """ Context of the Lambda invocation with the attributes used by sosw. """
+
+
+    def __init__(self, function_name: str, timeout: int = 900):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self.log_stream_name = f"local/{function_name}"
+        self.invoked_function_arn = f"arn:aws:lambda:us-west-2:000000000000:function:{function_name}"
+        self._deadline = time.perf_counter() + timeout
+
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int((self._deadline - time.perf_counter()) * 1000)
+
+
+class LocalService:
+    """
+    Base of the stand-ins. ``exceptions.ClientError`` mimics the attribute of boto3 clients.
+    Calls of the ``API_METHODS`` are counted by ``AwsStandIns``.
+    """
+
+    API_METHODS = ()
+
+    class exceptions:
+        ClientError = ClientError
+
+
+    def __init__(self, stand_ins: 'AwsStandIns'):
+        self.stand_ins = stand_ins
+
+
+class LocalLambda(LocalService):
+    """
+    Functions are registered with their handlers. ``'Event'`` invocations are queued for ``AwsStandIns.drain()``,
+    the other ones are called immediately.
+    """
+
+    API_METHODS = ('invoke', 'get_function_configuration')
+
+
+    def __init__(self, stand_ins: 'AwsStandIns', timeout: int = 900):
+        super().__init__(stand_ins)
+        self.timeout = timeout
+        self.handlers: Dict[str, Callable] = {}
+        self.queue = deque()
+
+
+    def invoke(self, FunctionName: str, InvocationType: str = 'RequestResponse', Payload: str = '{}', **kwargs):
+        name = FunctionName.split(':')[-1]
+        if name not in self.handlers:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': f"Not found: {name}"}},
+                              'Invoke')
+
+        if InvocationType == 'Event':
+            self.queue.append((name, Payload))
+            return {'StatusCode': 202}
+
+        return {'StatusCode': 200, 'Payload': self.stand_ins.run_function(name, Payload)}
+
+
+    def get_function_configuration(self, FunctionName: str, **kwargs) -> Dict:
+        return {'FunctionName': FunctionName.split(':')[-1], 'Timeout': self.timeout}
+
+
+class LocalSqs(LocalService):
+    """ Queues with subscribed functions. The messages are delivered in batches like by an event source mapping. """
+
+    API_METHODS = ('send_message_batch',)
+
+
+    def __init__(self, stand_ins: 'AwsStandIns'):
+        super().__init__(stand_ins)
+        self.messages = defaultdict(deque)
+        self.subscriptions: Dict[str, tuple] = {}
+
+
+    def subscribe(self, queue_url: str, function_name: str, batch_size: int = 10):
+        self.subscriptions[queue_url] = (function_name, batch_size)
+
+
+    def send_message_batch(self, QueueUrl: str, Entries: List[Dict], **kwargs) -> Dict:
+        for entry in Entries:
+            self.messages[QueueUrl].append({
+                'messageId':   str(uuid.uuid4()),
+                'body':        entry['MessageBody'],
+                'eventSource': 'aws:sqs',
+            })
+
+        return {'Successful': [{'Id': x['Id']} for x in Entries], 'Failed': []}
+
+
+    def receive_event(self, queue_url: str) -> Optional[Dict]:
+        """ Pop the next batch of messages as an SQS event for the subscribed function. """
+
+        _, batch_size = self.subscriptions[queue_url]
+        messages = self.messages[queue_url]
+        records = [messages.popleft() for _ in range(min(batch_size, len(messages)))]
+
+        return {'Records': records} if records else None
+
+
+class LocalS3(LocalService):
+    """ Objects are kept in memory by ``(Bucket, Key)``. """
+
+    API_METHODS = ('upload_file', 'download_file', 'copy_object', 'delete_object')
+
+
+    def __init__(self, stand_ins: 'AwsStandIns'):
+        super().__init__(stand_ins)
+        self.objects: Dict[tuple, bytes] = {}
+
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs):
+        with open(Filename, 'rb') as f:
+            self.objects[(Bucket, Key)] = f.read()
+
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, **kwargs):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+
+        with open(Filename, 'wb') as f:
+            f.write(self.objects[(Bucket, Key)])
+
+
+    def copy_object(self, Bucket: str, CopySource: str, Key: str, **kwargs):
+        source_bucket, source_key = CopySource.split('/', 1)
+        self.objects[(Bucket, Key)] = self.objects[(source_bucket, source_key)]
+
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        self.objects.pop((Bucket, Key), None)
+
+
+class LocalCloudWatch(LocalService):
+    """ Every metric has the same constant ``value``. """
+
+    API_METHODS = ('get_metric_data', 'get_metric_statistics')
+
+
+    def __init__(self, stand_ins: 'AwsStandIns', value: float = 0):
+        super().__init__(stand_ins)
+        self.value = value
+
+
+    def get_metric_data(self, MetricDataQueries: List[Dict], **kwargs) -> Dict:
+        return {'MetricDataResults': [{'Id': x['Id'], 'Values': [self.value]} for x in MetricDataQueries]}
+
+
+    def get_metric_statistics(self, Statistics: List[str], **kwargs) -> Dict:
+        return {'Datapoints': [{x: self.value for x in Statistics}]}
+
+
+class LocalSns(LocalService):
+    API_METHODS = ('publish',)
+
+
+    def __init__(self, stand_ins: 'AwsStandIns'):
+        super().__init__(stand_ins)
+        self.messages = []
+
+
+    def publish(self, **kwargs) -> Dict:
+        self.messages.append(kwargs)
+        return {'MessageId': str(uuid.uuid4())}
+
+
+class LocalEvents(LocalService):
+    """ There are no scheduled rules. """
+
+    API_METHODS = ('list_rules', 'list_targets_by_rule')
+
+
+    def list_rules(self, **kwargs) -> Dict:
+        return {'Rules': []}
+
+
+    def list_targets_by_rule(self, Rule: str, **kwargs) -> Dict:
+        return {'Targets': []}
+
+
+class AwsStandIns:
+    """
+    Registry of the stand-ins. Use ``client`` as the ``side_effect`` for the patched ``boto3.client``.
+
+    The calls are counted for the current ``stage`` in ``calls``. Latencies of function runs in seconds are collected
+    by stage in ``durations``. The first runs of functions that also initialize the Processor are collected separately
+    in ``cold_durations``.
+    """
+
+    # DynamoDB API methods of MemoryDynamoDb to count.
+    DYNAMO_DB_METHODS = ('describe_table', 'get_item', 'put_item', 'update_item', 'delete_item', 'batch_get_item',
+                         'batch_write_item', 'transact_write_items', 'query', 'scan')
+
+
+    def __init__(self, lambda_timeout: int = 300, metric_value: float = 0):
+        self.calls = defaultdict(Counter)
+        self.durations = defaultdict(list)
+        self.cold_durations = defaultdict(list)
+        self.containers = {}
+        self.stage = None
+        self._counting = True
+        self._lock = threading.Lock()
+
+        self.dynamodb = MemoryDynamoDb()
+        self.services = {
+            'dynamodb':   self.dynamodb,
+            'lambda':     LocalLambda(self, timeout=lambda_timeout),
+            'sqs':        LocalSqs(self),
+            's3':         LocalS3(self),
+            'cloudwatch': LocalCloudWatch(self, value=metric_value),
+            'sns':        LocalSns(self),
+            'events':     LocalEvents(self),
+        }
+
+        for name, service in self.services.items():
+            for method in self.DYNAMO_DB_METHODS if name == 'dynamodb' else service.API_METHODS:
+                # Instance attributes are found also by the internal calls, e.g. pages of the DynamoDB paginator.
+                setattr(service, method, self._counted(f"{name}.{method}", getattr(service, method)))
+
+
+    def client(self, service_name: str, *args, **kwargs):
+        """ Replacement of ``boto3.client``. """
+
+        if service_name not in self.services:
+            raise RuntimeError(f"No local stand-in for AWS service: {service_name}")
+
+        return self.services[service_name]
+
+
+    def _counted(self, name: str, method: Callable) -> Callable:
+
+        def wrapper(*args, **kwargs):
+            if self._counting:
+                with self._lock:
+                    self.calls[self.stage][name] += 1
+            return method(*args, **kwargs)
+
+        return wrapper
+
+
+    @contextmanager
+    def not_counted(self):
+        """ Calls of the benchmark itself (e.g. to check the progress) are not counted. """
+
+        self._counting = False
+        try:
+            yield
+        finally:
+            self._counting = True
+
+
+    @property
+    def lambda_(self) -> LocalLambda:
+        return self.services['lambda']
+
+
+    @property
+    def sqs(self) -> LocalSqs:
+        return self.services['sqs']
+
+
+    def register_function(self, name: str, handler: Callable):
+        self.lambda_.handlers[name] = handler
+
+
+    def run_function(self, name: str, event, stage: Optional[str] = None):
+        """
+        Call the handler of the function `name` with a new context and record the latency for the `stage`.
+
+        The ``global_vars`` of sosw are shared by the whole process, so every function gets its own warm container:
+        the Processor kept in the ``global_vars`` by ``get_lambda_handler`` is swapped between the runs.
+        """
+
+        context = LocalContext(name, timeout=self.lambda_.timeout)
+        previous = global_vars.processor, global_vars.lambda_context, self.stage
+
+        global_vars.processor = self.containers.get(name)
+        global_vars.lambda_context = context
+        self.stage = stage or name
+        durations = self.durations if global_vars.processor else self.cold_durations
+        try:
+            st = time.perf_counter()
+            result = self.lambda_.handlers[name](event, context)
+            durations[self.stage].append(time.perf_counter() - st)
+        finally:
+            self.containers[name] = global_vars.processor
+            global_vars.processor, global_vars.lambda_context, self.stage = previous
+
+        return result
+
+
+    def drain(self, stages: Dict[str, str] = None) -> int:
+        """
+        Deliver the queued asynchronous invocations and SQS messages until there are none left.
+
+        :param stages:  Names of stages by names of functions. Default: name of the function.
+        :return:        Number of runs of functions.
+        """
+
+        stages = stages or {}
+        runs = 0
+
+        while True:
+            if self.lambda_.queue:
+                name, payload = self.lambda_.queue.popleft()
+                self.run_function(name, json.loads(payload), stage=stages.get(name))
+                runs += 1
+                continue
+
+            for queue_url, (name, _) in self.sqs.subscriptions.items():
+                event = self.sqs.receive_event(queue_url)
+                if event:
+                    self.run_function(name, event, stage=stages.get(name))
+                    runs += 1
+                    break
+            else:
+                return runs
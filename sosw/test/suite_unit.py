@@ -1,5 +1,6 @@
 # Core applications
 from .unit.test_app import app_UnitTestCase
+from .unit.test_benchmark_pipeline import PipelineBenchmark_UnitTestCase
 from .unit.test_labourer import Labourer_UnitTestCase
 from .unit.test_orchestrator import Orchestrator_UnitTestCase
 from .unit.test_scavenger import Scavenger_UnitTestCase
@@ -8,9 +9,13 @@ from .unit.test_worker import Worker_UnitTestCase
 from .unit.test_worker_assistant import WorkerAssistant_UnitTestCase
 
 # Components
+from ..components.test.unit.test_benchmark import benchmark_UnitTestCase
 from ..components.test.unit.test_config import Config_UnitTestCase
 from ..components.test.unit.test_dynamo_db import dynamodb_client_UnitTestCase
+from ..components.test.unit.test_memory_dynamo_db import MemoryDynamoDb_UnitTestCase
 from ..components.test.unit.test_helpers import helpers_UnitTestCase
+from ..components.test.unit.test_queue_file import (QueueFile_UnitTestCase, QueueFileGzip_UnitTestCase,
+                                                     QueueFileCodec_UnitTestCase, QueueFileZstd_UnitTestCase)
 from sosw.components.test.unit.test_siblings import siblings_TestCase
 from sosw.components.test.unit.test_sns import sns_TestCase
 from sosw.components.test.unit.test_sigv4 import sigv4_TestCase
@@ -25,6 +30,7 @@ def suite():
 
     # Core applications
     test_suite.addTest(unittest.makeSuite(app_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(PipelineBenchmark_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(Labourer_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(Orchestrator_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(Scavenger_UnitTestCase))
@@ -33,9 +39,15 @@ def suite():
     test_suite.addTest(unittest.makeSuite(WorkerAssistant_UnitTestCase))
 
     # Components
+    test_suite.addTest(unittest.makeSuite(benchmark_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(Config_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(dynamodb_client_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(MemoryDynamoDb_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(helpers_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(QueueFile_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(QueueFileGzip_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(QueueFileCodec_UnitTestCase))
+    test_suite.addTest(unittest.makeSuite(QueueFileZstd_UnitTestCase))
     test_suite.addTest(unittest.makeSuite(siblings_TestCase))
     test_suite.addTest(unittest.makeSuite(sns_TestCase))
     test_suite.addTest(unittest.makeSuite(sigv4_TestCase))
@@ -1,5 +1,6 @@
 import boto3
 import os
+import time
 import unittest
 
 from unittest.mock import MagicMock, patch
@@ -8,6 +9,7 @@ os.environ["STAGE"] = "test"
 os.environ["autotest"] = "True"
 
 from sosw.app import Processor, LambdaGlobals, get_lambda_handler, logger
+from sosw.components.benchmark import benchmark
 from sosw.components.sns import SnsManager
 from sosw.components.siblings import SiblingsManager
 
@@ -54,6 +56,52 @@ class app_UnitTestCase(unittest.TestCase):
         self.assertEqual(processor.stats['total_processor_calls'], 1)
 
 
+    @patch("boto3.client")
+    def test_app__latency_histograms__get_stats_and_reset_stats(self, _):
+        class Child(Processor):
+            @benchmark(histogram=True)
+            def slow(self, seconds):
+                time.sleep(seconds)
+
+        processor = Child(custom_config=self.TEST_CONFIG)
+        for seconds in (0.001, 0.001, 0.02):
+            processor.slow(seconds)
+
+        stats = processor.get_stats()
+        self.assertEqual(stats['calls_slow'], 3)
+        self.assertLess(stats['latency_p50_slow'], 0.02)
+        self.assertGreaterEqual(stats['latency_max_slow'], 0.02)
+        self.assertEqual(stats['latency_p99_slow'], stats['latency_max_slow'])
+        self.assertNotIn('latency_p50_slow', processor.stats)
+
+        # Percentiles are not summed up by reset_stats(), the histograms are merged to the lifetime ones.
+        processor.reset_stats()
+        processor.slow(0.001)
+
+        stats = processor.get_stats()
+        self.assertLess(stats['latency_max_slow'], 0.02)
+        self.assertGreaterEqual(stats['total_latency_max_slow'], 0.02)
+        self.assertEqual(processor.lifetime_latency_histograms['slow'].count, 3)
+        self.assertEqual(stats['total_calls_slow'], 3)
+        self.assertFalse(any(k.startswith('total_total_') for k in processor.stats))
+
+
+    @patch("boto3.client")
+    def test_app__latency_histograms__disabled_in_config(self, _):
+        class Child(Processor):
+            @benchmark(histogram=True)
+            def slow(self):
+                pass
+
+        processor = Child(custom_config={**self.TEST_CONFIG, 'record_latency_histograms': False})
+        processor.slow()
+
+        stats = processor.get_stats()
+        self.assertEqual(stats['calls_slow'], 1)
+        self.assertFalse(any(k.startswith('latency_') for k in stats))
+        self.assertIsNone(getattr(processor, 'latency_histograms', None))
+
+
     @patch("boto3.client")
     def test_app_init__with_some_clients(self, mock_boto_client):
         custom_config = {
@@ -136,6 +184,26 @@ class app_UnitTestCase(unittest.TestCase):
             self.assertEqual(global_vars.processor.stats['total_calls_register_clients'], 1)
 
 
+    def test_lambda_handler__flushes_meta_handler(self):
+        mock_context = MagicMock()
+        mock_context.invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:example:42'
+
+        global_vars = LambdaGlobals()
+        lambda_handler = get_lambda_handler(self.Child, global_vars, self.TEST_CONFIG)
+
+        lambda_handler(event={'k': 'success'}, context=mock_context)
+        global_vars.processor.meta_handler = MagicMock()
+
+        lambda_handler(event={'k': 'success'}, context=mock_context)
+        global_vars.processor.meta_handler.flush.assert_called_once()
+
+        # Flushed even if the Processor fails. Failures of the flush itself do not mask the original exception.
+        global_vars.processor.meta_handler.flush.side_effect = RuntimeError("Flush failed")
+        with patch.object(self.Child, '__call__', side_effect=ValueError("Processor failed")):
+            self.assertRaises(ValueError, lambda_handler, event={'k': 'fail'}, context=mock_context)
+        self.assertEqual(global_vars.processor.meta_handler.flush.call_count, 2)
+
+
     def test_property_account__initialized_from_context(self):
         mock_context = MagicMock()
         mock_context.invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789000:function:example:42'
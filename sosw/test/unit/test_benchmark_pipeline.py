@@ -0,0 +1,82 @@
+import json
+import os
+import unittest
+
+
+os.environ["STAGE"] = "test"
+os.environ["autotest"] = "True"
+
+from sosw.test.benchmark.pipeline import PipelineBenchmark, compare_results
+from sosw.test.benchmark.pipeline.runner import make_job, percentile
+
+
+class PipelineBenchmark_UnitTestCase(unittest.TestCase):
+    SHAPE = {
+        'labourers':                    2,
+        'chunkable_attrs':              [['section', 2], ['store', 3]],
+        'failure_rate':                 0.2,
+        'max_attempts':                 2,
+        'max_simultaneous_invocations': 4,
+    }
+
+
+    def test_run(self):
+        results = PipelineBenchmark(self.SHAPE).run()
+        summary = results['summary']
+
+        self.assertEqual(summary['tasks'], 12)
+        self.assertEqual(summary['completed'] + summary['dead'], 12)
+        self.assertEqual(summary['unfinished'], 0)
+        self.assertGreater(summary['tasks_per_second'], 0)
+
+        # Failed tasks are invoked again after they expire.
+        stages = results['stages']
+        self.assertGreater(stages['worker']['invocations'], 12)
+        self.assertEqual(stages['worker_assistant']['invocations'], stages['worker']['invocations'])
+        self.assertEqual(stages['worker']['cold_starts'], 2)
+        self.assertEqual(stages['worker']['api_calls_by_method'], {'lambda.invoke': stages['worker']['invocations']})
+        self.assertEqual(summary['api_calls'], sum(x['api_calls'] for x in stages.values()))
+
+        # Results are saved as JSON and the same shape is comparable.
+        loaded = json.loads(json.dumps(results))
+        self.assertEqual(compare_results(loaded, results), [])
+
+
+    def test_compare_results(self):
+        baseline = {
+            'shape':   {'labourers': 1},
+            'summary': {'tasks_per_second': 100, 'api_calls_per_task': 5},
+            'stages':  {'worker': {'api_calls_per_task': 1, 'p99_ms': 10}},
+        }
+        current = {
+            'shape':   {'labourers': 1},
+            'summary': {'tasks_per_second': 80, 'api_calls_per_task': 5.2},
+            'stages':  {'worker': {'api_calls_per_task': 2, 'p99_ms': 14}},
+        }
+
+        result = compare_results(baseline, current, tolerance=0.1, latency_tolerance=0.5)
+        self.assertEqual(len(result), 2)
+        self.assertTrue(result[0].startswith('tasks_per_second: 100 -> 80'))
+        self.assertTrue(result[1].startswith('worker.api_calls_per_task: 1 -> 2'))
+
+        self.assertRaises(ValueError, compare_results, baseline, {**current, 'shape': {'labourers': 2}})
+
+
+    def test_make_job(self):
+        job = make_job('some_function', [('section', 2), ('store', 3)])
+
+        self.assertEqual(job['lambda_name'], 'some_function')
+        self.assertTrue(job['isolate_sections'])
+        self.assertEqual(job['sections']['section_1']['stores'], ['store_1_0', 'store_1_1', 'store_1_2'])
+
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 99), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -72,6 +72,33 @@ class Orchestrator_UnitTestCase(unittest.TestCase):
     #     self.assertEqual(orchestrator.get_labourer_setting(Labourer(id=4422), 'faz'), None)
 
 
+    def test_call__processes_labourers_concurrently(self):
+        labourers = [Labourer(id=f"some_function_{i}") for i in range(5)]
+        self.orchestrator.config['max_labourer_workers'] = 3
+        self.orchestrator.task_client.register_labourers = MagicMock(return_value=labourers)
+        self.orchestrator.invoke_for_labourer = MagicMock()
+
+        self.orchestrator({})
+
+        self.assertEqual(self.orchestrator.invoke_for_labourer.call_count, 5)
+        self.assertCountEqual([x[0][0] for x in self.orchestrator.invoke_for_labourer.call_args_list], labourers)
+        self.assertEqual(self.orchestrator.stats['labourers_processed'], 5)
+
+
+    def test_call__isolates_failed_labourer(self):
+        labourers = [Labourer(id=f"some_function_{i}") for i in range(3)]
+        self.orchestrator.task_client.register_labourers = MagicMock(return_value=labourers)
+        self.orchestrator.invoke_for_labourer = MagicMock(side_effect=[None, Exception("Boom"), None])
+
+        with self.assertRaises(RuntimeError) as cm:
+            self.orchestrator({})
+
+        self.assertIn('some_function_1', str(cm.exception))
+        self.assertEqual(self.orchestrator.invoke_for_labourer.call_count, 3)
+        self.assertEqual(self.orchestrator.stats['labourers_processed'], 2)
+        self.assertEqual(self.orchestrator.stats['labourers_failed'], 1)
+
+
     def test_get_desired_invocation_number_for_labourer(self):
 
         # Status - expected output for max invocations = 10
@@ -139,21 +166,70 @@ class Orchestrator_UnitTestCase(unittest.TestCase):
 
         self.orchestrator.get_desired_invocation_number_for_labourer = MagicMock(return_value=1)
         self.orchestrator.task_client.get_next_for_labourer = MagicMock(return_value=[self.SAMPLE_TASK])
-        self.orchestrator.task_client.invoke_task = MagicMock(signature=TaskManager.get_next_for_labourer)
+        self.orchestrator.task_client.invoke_tasks = MagicMock(return_value=([self.SAMPLE_TASK], []))
 
         self.orchestrator.invoke_for_labourer(some_labourer)
 
-        self.orchestrator.task_client.invoke_task.assert_called_once()
-        self.orchestrator.meta_handler.post.assert_called_once()
+        self.orchestrator.task_client.invoke_tasks.assert_called_once_with(labourer=some_labourer,
+                                                                           tasks=[self.SAMPLE_TASK])
+        self.orchestrator.meta_handler.post_many.assert_called_once_with(task_ids=[self.SAMPLE_TASK_ID],
+                                                                         labourer_id=some_labourer.id,
+                                                                         action='invoked')
+
+
+    def test_invoke_for_labourer__skipped_tasks__no_meta(self):
+        some_labourer = self.orchestrator.task_client.register_labourers()[0]
+
+        self.orchestrator.get_desired_invocation_number_for_labourer = MagicMock(return_value=1)
+        self.orchestrator.task_client.get_next_for_labourer = MagicMock(return_value=[self.SAMPLE_TASK])
+        self.orchestrator.task_client.invoke_tasks = MagicMock(return_value=([], []))
+
+        self.orchestrator.invoke_for_labourer(some_labourer)
+
+        self.orchestrator.meta_handler.post_many.assert_not_called()
+
+
+    def test_invoke_for_labourer__failed_task__meta_of_invoked_posted__and_raised(self):
+        some_labourer = self.orchestrator.task_client.register_labourers()[0]
+        tasks = [{**self.SAMPLE_TASK, 'task_id': str(i), 'created_at': 1000} for i in range(3)]
+
+        self.orchestrator.get_desired_invocation_number_for_labourer = MagicMock(return_value=3)
+        self.orchestrator.task_client.get_next_for_labourer = MagicMock(return_value=tasks)
+        self.orchestrator.task_client.mark_task_invoked = MagicMock()
+        self.orchestrator.task_client.lambda_client = MagicMock()
+        self.orchestrator.task_client.lambda_client.invoke.side_effect = [None, Exception("Boom"), None]
+
+        with self.assertRaises(Exception) as e:
+            self.orchestrator.invoke_for_labourer(some_labourer)
+
+        self.assertEqual(str(e.exception), "Boom")
+        self.orchestrator.meta_handler.post_many.assert_called_once_with(task_ids=['0', '2'],
+                                                                         labourer_id=some_labourer.id,
+                                                                         action='invoked')
+
+
+    def test_invoke_for_labourer__many_failures__raised(self):
+        some_labourer = self.orchestrator.task_client.register_labourers()[0]
+
+        self.orchestrator.get_desired_invocation_number_for_labourer = MagicMock(return_value=2)
+        self.orchestrator.task_client.get_next_for_labourer = MagicMock(return_value=[self.SAMPLE_TASK] * 2)
+        self.orchestrator.task_client.invoke_tasks = MagicMock(return_value=([], [ValueError("A"), ValueError("B")]))
+
+        with self.assertRaises(RuntimeError) as e:
+            self.orchestrator.invoke_for_labourer(some_labourer)
+
+        self.assertIn("Failed to invoke 2 of 2 tasks", str(e.exception))
+        self.assertIsInstance(e.exception.__cause__, ValueError)
+        self.orchestrator.meta_handler.post_many.assert_not_called()
 
 
     def test_invoke_for_labourer__desired_zero(self):
         self.orchestrator.get_desired_invocation_number_for_labourer = MagicMock(return_value=0)
         self.orchestrator.task_client.get_next_for_labourer = MagicMock()
-        self.orchestrator.task_client.invoke_task = MagicMock()
+        self.orchestrator.task_client.invoke_tasks = MagicMock()
 
         self.orchestrator.invoke_for_labourer(self.LABOURER)
 
         self.orchestrator.task_client.get_next_for_labourer.assert_not_called()
-        self.orchestrator.task_client.invoke_task.assert_not_called()
-        self.orchestrator.meta_handler.post.assert_not_called()
+        self.orchestrator.task_client.invoke_tasks.assert_not_called()
+        self.orchestrator.meta_handler.post_many.assert_not_called()
@@ -68,6 +68,38 @@ class Scavenger_UnitTestCase(unittest.TestCase):
         self.assertEqual(self.scavenger.retry_tasks.call_count, 3)
 
 
+    def test_call__sends_single_digest(self):
+        self.scavenger.task_client.register_labourers = Mock(return_value=LABOURERS)
+        self.scavenger.task_client.get_expired_tasks_for_labourer = MagicMock(return_value=[TASKS[0]])
+        self.scavenger.should_retry_task = Mock(return_value=False)
+        self.scavenger.archive_tasks = Mock()
+        self.scavenger.retry_tasks = Mock()
+
+        self.scavenger()
+
+        self.assertEqual(self.scavenger.task_client.archive_tasks.call_count, 3)
+        self.scavenger.sns_client.send_message.assert_called_once()
+        self.assertEqual(self.scavenger.stats['closed_dead_tasks'], 3)
+        self.assertFalse(self.scavenger.dead_tasks_digest)
+
+
+    def test_call__failure_of_later_labourer__digest_sent(self):
+        self.scavenger.task_client.register_labourers = Mock(return_value=LABOURERS)
+        self.scavenger.task_client.get_expired_tasks_for_labourer = MagicMock(return_value=[TASKS[0]])
+        self.scavenger.should_retry_task = Mock(return_value=False)
+        self.scavenger.archive_tasks = Mock(side_effect=[None, Exception("Boom")])
+        self.scavenger.retry_tasks = Mock()
+
+        with self.assertRaises(Exception):
+            self.scavenger()
+
+        # The dead task of the first Labourer is archived and reported.
+        self.assertEqual(self.scavenger.task_client.archive_tasks.call_count, 1)
+        self.scavenger.sns_client.send_message.assert_called_once()
+        self.assertIn(TASKS[0]['task_id'], self.scavenger.sns_client.send_message.call_args[0][0])
+        self.assertFalse(self.scavenger.dead_tasks_digest)
+
+
     def test_handle_expired_tasks_for_labourer(self):
         labourer = LABOURERS[1]
         expired_tasks_per_lambda = {
@@ -77,17 +109,50 @@ class Scavenger_UnitTestCase(unittest.TestCase):
 
         self.scavenger.task_client.get_expired_tasks_for_labourer = MagicMock(
                 side_effect=lambda l: expired_tasks_per_lambda.get(l.id, []))
-        self.scavenger.process_expired_task = Mock()
+        self.scavenger.should_retry_task = Mock(side_effect=lambda l, t: t['task_id'] == '124')
+        self.scavenger.calculate_delay_for_task_retry = Mock(return_value=300)
 
         # Call
         self.scavenger.handle_expired_tasks(labourer)
 
         # Check call
         self.scavenger.task_client.get_expired_tasks_for_labourer.assert_called_once_with(labourer)
+        self.scavenger.task_client.update_running_tasks_counter.assert_called_once_with('another_lambda', -2)
+
+        self.scavenger.task_client.move_tasks_to_retry_table.assert_called_once_with([TASKS[1]], [300])
+        self.scavenger.task_client.archive_tasks.assert_called_once_with([TASKS[2]])
+        self.scavenger.task_client.move_task_to_retry_table.assert_not_called()
+        self.scavenger.task_client.archive_task.assert_not_called()
+
+        self.scavenger.meta_handler.post_many.assert_has_calls([
+            call(task_ids=['124'], labourer_id='another_lambda', action='scheduled_for_retry'),
+            call(task_ids=['125'], labourer_id='another_lambda', action='archived_dead'),
+        ])
+
+        self.scavenger.sns_client.send_message.assert_called_once()
+        self.assertIn('125', self.scavenger.sns_client.send_message.call_args[0][0])
+        self.assertEqual(self.scavenger.stats['closed_dead_tasks'], 1)
+
+
+    def test_handle_expired_tasks_for_labourer__no_tasks(self):
+        self.scavenger.task_client.get_expired_tasks_for_labourer = MagicMock(return_value=[])
+
+        self.scavenger.handle_expired_tasks(self.labourer)
+
+        self.scavenger.task_client.update_running_tasks_counter.assert_not_called()
+        self.scavenger.task_client.archive_tasks.assert_not_called()
+        self.scavenger.sns_client.send_message.assert_not_called()
+
 
-        self.scavenger.process_expired_task.assert_has_calls(
-                [call(labourer, TASKS[1]), call(labourer, TASKS[2])]
-        )
+    def test_send_dead_tasks_digest__truncates_ids(self):
+        self.scavenger.config['dead_tasks_digest_max_ids'] = 2
+        self.scavenger.dead_tasks_digest['lambda3'].extend(['1', '2', '3', '4'])
+
+        self.scavenger.send_dead_tasks_digest()
+
+        message = self.scavenger.sns_client.send_message.call_args[0][0]
+        self.assertIn("lambda3 (4): 1, 2 and 2 more", message)
+        self.assertFalse(self.scavenger.dead_tasks_digest)
 
 
     def test_process_expired_task__close(self):
@@ -118,6 +183,70 @@ class Scavenger_UnitTestCase(unittest.TestCase):
         self.scavenger.task_client.archive_task.assert_not_called()
 
 
+    def test_process_expired_task__decrements_running_tasks_counter(self):
+        self.scavenger.should_retry_task = Mock(return_value=True)
+        self.scavenger.move_task_to_retry_table = Mock()
+
+        self.scavenger.process_expired_task(self.labourer, self.task)
+
+        self.scavenger.task_client.update_running_tasks_counter.assert_called_once_with(self.labourer.id, -1)
+
+
+    def test_archive_tasks(self):
+        tasks = [{'task_id': '123', 'labourer_id': 'lambda3'}, {'task_id': '124', 'labourer_id': 'lambda3'}]
+        self.scavenger.task_client.get_completed_tasks_for_labourer = Mock(return_value=tasks)
+
+        self.scavenger.archive_tasks(self.labourer)
+
+        self.scavenger.task_client.archive_tasks.assert_called_once_with(tasks)
+        self.scavenger.task_client.archive_task.assert_not_called()
+        self.scavenger.meta_handler.post_many.assert_called_once_with(task_ids=['123', '124'], labourer_id='lambda3',
+                                                                      action='archived')
+
+
+    def test_archive_tasks__no_tasks(self):
+        self.scavenger.task_client.get_completed_tasks_for_labourer = Mock(return_value=[])
+
+        self.scavenger.archive_tasks(self.labourer)
+
+        self.scavenger.task_client.archive_tasks.assert_not_called()
+        self.scavenger.meta_handler.post_many.assert_not_called()
+
+
+    def test_retry_tasks_in_bulk(self):
+        self.scavenger.config['retry_tasks_bulk_mode'] = True
+        self.scavenger.config['retry_tasks_bulk_size'] = 2
+        pages = [[{'task_id': str(i)} for i in range(3)], [{'task_id': '3'}]]
+        self.scavenger.task_client.get_tasks_to_retry_for_labourer_generator = Mock(return_value=iter(pages))
+        self.scavenger.task_client.get_oldest_greenfield_for_labourer = Mock(return_value=1000)
+        self.scavenger.task_client.retry_tasks = Mock(side_effect=lambda l, tasks, greenfield: greenfield - len(tasks))
+
+        self.scavenger.retry_tasks(self.labourer)
+
+        self.assertEqual(self.scavenger.task_client.retry_tasks.call_args_list, [
+            call(self.labourer, pages[0][:2], greenfield=1000),
+            call(self.labourer, pages[0][2:], greenfield=998),
+            call(self.labourer, pages[1], greenfield=997),
+        ])
+        self.assertEqual(self.scavenger.meta_handler.post_many.call_count, 3)
+        self.scavenger.task_client.get_tasks_to_retry_for_labourer.assert_not_called()
+
+
+    def test_retry_tasks_in_bulk__time_budget(self):
+        self.scavenger.config['retry_tasks_bulk_mode'] = True
+        self.scavenger.config['retry_tasks_bulk_size'] = 1
+        pages = [[{'task_id': str(i)} for i in range(5)]]
+        self.scavenger.task_client.get_tasks_to_retry_for_labourer_generator = Mock(return_value=iter(pages))
+        self.scavenger.task_client.get_oldest_greenfield_for_labourer = Mock(return_value=1000)
+        self.scavenger.task_client.retry_tasks = Mock(return_value=999)
+
+        with patch('time.monotonic', Mock(side_effect=[100, 101, 110])):
+            self.scavenger.retry_tasks(self.labourer, deadline=110)
+
+        self.assertEqual(self.scavenger.task_client.retry_tasks.call_count, 2)
+        self.assertEqual(self.scavenger.stats['retry_tasks_time_budget_exceeded'], 1)
+
+
     def test_calculate_delay_for_task_retry(self):
         _ = self.scavenger.get_db_field_name
         labourer = Labourer(id='some_lambda', arn='some_arn', max_duration=45)
@@ -1,5 +1,6 @@
 import boto3
 import datetime
+import gzip
 import json
 import logging
 import os
@@ -18,7 +19,9 @@ from unittest.mock import MagicMock, PropertyMock, patch
 
 from sosw.scheduler import Scheduler, InvalidJob, global_vars
 from sosw.labourer import Labourer
+from sosw.components.dynamo_db import CapacityTokenBucket
 from sosw.components.helpers import chunks
+from sosw.components.queue_file import QueueFile
 from sosw.managers.meta_handler import MetaHandler
 from sosw.test.variables import TEST_SCHEDULER_CONFIG
 from sosw.test.helpers_test import line_count
@@ -111,10 +114,11 @@ class Scheduler_UnitTestCase(unittest.TestCase):
             pass
 
         for fname in [self.scheduler.local_queue_file, self.FNAME]:
-            try:
-                os.remove(fname)
-            except Exception:
-                pass
+            for f in [fname, QueueFile(fname).offset_file_name]:
+                try:
+                    os.remove(f)
+                except Exception:
+                    pass
 
 
     def put_local_file(self, file_name=None, json=False):
@@ -207,6 +211,45 @@ class Scheduler_UnitTestCase(unittest.TestCase):
         self.assertFalse(os.path.isfile(self.FNAME))
 
 
+    def test_upload_and_unlock_queue_file__uploads_remainder(self):
+        self.put_local_file(self.scheduler.local_queue_file)
+        self.scheduler.get_queue_file().read_rows(rows=4)
+
+        def check_uploaded_file(Filename, **kwargs):
+            self.assertEqual(self.line_count(Filename), 6)
+
+        self.scheduler.s3_client.upload_file.side_effect = check_uploaded_file
+
+        self.scheduler.upload_and_unlock_queue_file()
+
+        self.scheduler.s3_client.upload_file.assert_called_once()
+
+
+    def test_set_queue_file__keeps_codec_suffix(self):
+        self.scheduler.config['queue_file'] = 'tasks_queue.txt.gz'
+        self.scheduler.set_queue_file()
+
+        self.assertEqual(self.scheduler.local_queue_file, '/tmp/tasks_queue_AWS_REQ_ID.txt.gz')
+        self.assertEqual(self.scheduler.get_queue_file().codec, 'gzip')
+
+
+    def test_parse_job_to_file__compressed(self):
+        self.scheduler.config['queue_file'] = 'tasks_queue.txt.gz'
+        self.scheduler.set_queue_file()
+        JOB = {
+            'lambda_name':      self.LABOURER.id,
+            'isolate_sections': True,
+            'sections':         {'section_technic': None, 'section_furniture': None},
+        }
+
+        self.scheduler.parse_job_to_file(JOB)
+
+        with gzip.open(self.scheduler.local_queue_file, 'rt') as f:
+            rows = [json.loads(x) for x in f]
+
+        self.assertEqual([x['sections'] for x in rows], [['section_technic'], ['section_furniture']])
+
+
     def test_process_file(self):
         self.put_local_file(self.FNAME, json=True)
         self.scheduler.get_and_lock_queue_file = MagicMock(return_value=self.FNAME)
@@ -232,6 +275,47 @@ class Scheduler_UnitTestCase(unittest.TestCase):
             self.assertEqual(self.scheduler.siblings_client.spawn_sibling.call_count, 1)
 
 
+    def test_process_file__batch_create_tasks(self):
+        self.put_local_file(self.FNAME, json=True)
+        self.scheduler.config['batch_create_tasks'] = True
+        self.scheduler.get_and_lock_queue_file = MagicMock(return_value=self.FNAME)
+        self.scheduler.upload_and_unlock_queue_file = MagicMock()
+        self.scheduler.clean_tmp = MagicMock()
+        self.scheduler.task_client.create_tasks.side_effect = \
+            lambda labourer, tasks: [{'task_id': f"task_{i}", **t} for i, t in enumerate(tasks)]
+
+        self.custom_lambda_context.get_remaining_time_in_millis.side_effect = [300000, 300000, 1000, 1000]
+
+        with patch('sosw.scheduler.Scheduler._sleeptime_for_dynamo', new_callable=PropertyMock) as mock_sleeptime:
+            self.scheduler.process_file()
+            mock_sleeptime.assert_not_called()
+
+        self.scheduler.task_client.create_task.assert_not_called()
+        self.scheduler.task_client.create_tasks.assert_called_once()
+        self.assertEqual(len(self.scheduler.task_client.create_tasks.call_args[1]['tasks']), 10)
+
+        self.scheduler.meta_handler.post.assert_not_called()
+        self.scheduler.meta_handler.post_many.assert_called_once_with(
+                task_ids=[f"task_{i}" for i in range(10)], action='created', labourer='some_function')
+        self.assertEqual(self.scheduler.stats['tasks_created_in_batch'], 10)
+
+
+    def test_create_tasks_in_batch__groups_by_labourer(self):
+        rows = [json.dumps({'labourer_id': f"lambda_{i % 2}", 'payload': {'n': i}}) for i in range(5)]
+        self.scheduler.task_client.get_labourer.side_effect = lambda x: Labourer(id=x)
+        self.scheduler.task_client.create_tasks.side_effect = \
+            lambda labourer, tasks: [{'task_id': 't', **x} for x in tasks]
+
+        self.scheduler.create_tasks_in_batch(rows)
+
+        self.assertEqual(self.scheduler.task_client.create_tasks.call_count, 2)
+        for args, kwargs in self.scheduler.task_client.create_tasks.call_args_list:
+            # The order of tasks of the Labourer in the file is preserved.
+            numbers = [x['payload']['n'] for x in kwargs['tasks']]
+            self.assertEqual(numbers, sorted(numbers))
+            self.assertTrue(all(x['labourer_id'] == kwargs['labourer'].id for x in kwargs['tasks']))
+
+
     ### Tests of construct_job_data ###
     def test_construct_job_data(self):
 
@@ -285,6 +369,42 @@ class Scheduler_UnitTestCase(unittest.TestCase):
         # self.assertEqual(1, 42)
 
 
+    def test_construct_job_data_generator(self):
+        JOB = {
+            'period':   'last_2_days', 'isolate_days': True,
+            'sections': {'111': None, '222': {'stores': {'s1': None, 's2': None}, 'isolate_stores': True}},
+            'isolate_sections': True,
+        }
+
+        generator = self.scheduler.construct_job_data_generator(deepcopy(JOB), skeleton={'labourer_id': 'some'})
+        self.assertIsInstance(generator, types.GeneratorType)
+
+        result = list(generator)
+        self.assertEqual(result, self.scheduler.construct_job_data(deepcopy(JOB), skeleton={'labourer_id': 'some'}))
+        self.assertEqual(len(result), 6)
+        self.assertTrue(all(x['labourer_id'] == 'some' for x in result))
+
+
+    def test_construct_job_data__tasks_do_not_share_values(self):
+        JOB = {
+            'period':   'last_2_days', 'isolate_days': True,
+            'sections': {'111': {'stores': {'s1': None, 's2': None}, 'isolate_stores': True}},
+            'isolate_sections': True, 'options': {'keep': [1]},
+        }
+        original = deepcopy(JOB)
+
+        for method in (self.scheduler.construct_job_data, self.scheduler.chunk_job, self.scheduler.chunk_dates):
+            r = method(JOB, skeleton={'meta': {'tags': []}})
+            self.assertGreater(len(r), 1)
+
+            r[0]['options']['keep'].append(2)
+            r[0]['meta']['tags'].append('x')
+
+            self.assertEqual(r[1]['options'], {'keep': [1]})
+            self.assertEqual(r[1]['meta'], {'tags': []})
+            self.assertEqual(JOB, original)
+
+
     ### Tests of chunk_dates ###
     def test_chunk_dates(self):
         TESTS = [
@@ -603,6 +723,20 @@ class Scheduler_UnitTestCase(unittest.TestCase):
         self.check_number_of_tasks(NUMBER_TASKS_EXPECTED, response)
 
 
+    def test_chunk_job_generator__lazy_and_same_as_chunk_job(self):
+        pl = deepcopy(self.PAYLOAD)
+        pl['sections']['section_weddings']['stores']['store_music']['isolate_products'] = True
+        original = deepcopy(pl)
+
+        generator = self.scheduler.chunk_job_generator(job=pl)
+        self.assertIsInstance(generator, types.GeneratorType)
+
+        self.assertEqual(list(generator), self.scheduler.chunk_job(job=pl))
+
+        # The job is not modified by chunking.
+        self.assertEqual(pl, original)
+
+
     def test_chunk_job__unchunckable_preserve_custom_attrs(self):
 
         pl = {
@@ -869,6 +1003,17 @@ class Scheduler_UnitTestCase(unittest.TestCase):
                 self.assertIn(parsed_row['sections'][0], SAMPLE_SIMPLE_JOB['sections'])
 
 
+    def test_parse_job_to_file__invalid_job__removes_partial_file(self):
+        JOB = {
+            'lambda_name':      self.LABOURER.id,
+            'isolate_sections': True,
+            'sections':         {'section_technic': None, 'section_furniture': 'bad value'},
+        }
+
+        self.assertRaises(InvalidJob, self.scheduler.parse_job_to_file, JOB)
+        self.assertFalse(os.path.isfile(self.scheduler.local_queue_file))
+
+
     def test_call__sample(self):
         SAMPLE_SIMPLE_JOB = {
             'lambda_name':  self.LABOURER.id,
@@ -895,6 +1040,10 @@ class Scheduler_UnitTestCase(unittest.TestCase):
         self.scheduler.s3_client.delete_object.assert_called_once()
 
 
+    def test_default_config__no_capacity_rate_limit(self):
+        self.assertFalse(Scheduler.DEFAULT_CONFIG['task_config']['dynamo_db_config']['rate_limit_to_capacity'])
+
+
     def test_sleeptime_for_dynamo(self):
 
         self.scheduler.task_client.dynamo_db_client.get_capacity.return_value = {'read': 10, 'write': 10}
@@ -907,6 +1056,13 @@ class Scheduler_UnitTestCase(unittest.TestCase):
         self.assertEqual(round(self.scheduler._sleeptime_for_dynamo, 2), 0)
 
 
+    def test_sleeptime_for_dynamo__rate_limited(self):
+        self.scheduler.task_client.dynamo_db_client.get_capacity.return_value = {'read': 10, 'write': 10}
+        self.scheduler.task_client.dynamo_db_client.get_rate_limiter.return_value = CapacityTokenBucket(rate=10)
+
+        self.assertEqual(self.scheduler._sleeptime_for_dynamo, 0)
+
+
     def test_apply_job_schema(self):
         self.scheduler.config['job_schema_variants']['sample_schema_name'] = {
             'chunkable_attrs': [
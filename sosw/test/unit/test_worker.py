@@ -1,7 +1,8 @@
+import json
 import os
 import unittest
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch, MagicMock
 
 from sosw.worker import Worker
 
@@ -33,4 +34,100 @@ class Worker_UnitTestCase(unittest.TestCase):
         p.mark_task_as_completed = MagicMock(return_value=None)
 
         p({'task_id': '123'})
-        p.mark_task_as_completed.assert_called_once_with('123')
+        p.mark_task_as_completed.assert_called_once_with('123', labourer_id=None)
+
+
+    def test_mark_task_as_completed__lambda_transport(self):
+        with patch('boto3.client'):
+            p = Worker()
+
+        p.lambda_client = MagicMock()
+        p.stats.clear()
+        p.mark_task_as_completed('123', labourer_id='some_lambda')
+
+        kwargs = p.lambda_client.invoke.call_args[1]
+        self.assertEqual(kwargs['FunctionName'], 'sosw_worker_assistant')
+        self.assertEqual(json.loads(kwargs['Payload']),
+                         {'action': 'mark_task_as_completed', 'task_id': '123', 'labourer_id': 'some_lambda'})
+
+
+    def test_mark_task_as_completed__dynamo_db_transport(self):
+        with patch('boto3.client'):
+            p = Worker(custom_config={'completion_transport':              'dynamo_db',
+                                      'sosw_running_tasks_counters_table': 'autotest_sosw_running_tasks_counters'})
+
+        p.completion_dynamo_db_client = MagicMock()
+        p.completion_dynamo_db_client.config = {}
+        p.stats.clear()
+        p.stats['foo'] = 5
+
+        with patch('time.time') as t:
+            t.return_value = 1000
+            p.mark_task_as_completed('123', labourer_id='some_lambda')
+
+        p.lambda_client.invoke.assert_not_called()
+        p.completion_dynamo_db_client.update.assert_has_calls([
+            call(keys={'task_id': '123'}, attributes_to_update={'stat_foo': 5, 'completed_at': 1000}),
+            call({'labourer_id': 'some_lambda'}, attributes_to_increment={'running_tasks': -1},
+                 table_name='autotest_sosw_running_tasks_counters'),
+        ])
+
+
+    def test_mark_task_as_failed__dynamo_db_transport(self):
+        with patch('boto3.client'):
+            p = Worker(custom_config={'completion_transport': 'dynamo_db'})
+
+        p.completion_dynamo_db_client = MagicMock()
+        p.completion_dynamo_db_client.config = {}
+        p.stats.clear()
+
+        p.mark_task_as_failed('123')
+
+        p.completion_dynamo_db_client.update.assert_called_once_with(keys={'task_id': '123'},
+                                                                     attributes_to_increment={'failed_attempts': 1})
+
+
+    def test_mark_task_as_completed__sqs_transport(self):
+        with patch('boto3.client'):
+            p = Worker(custom_config={'completion_transport':            'sqs',
+                                      'sosw_worker_assistant_queue_url': 'https://sqs/queue'})
+
+        p.sqs_client = MagicMock()
+        p.sqs_client.send_message_batch.return_value = {}
+
+        for i in range(12):
+            p.mark_task_as_completed(str(i))
+
+        # The first full batch is sent immediately, the rest waits for the flush.
+        p.sqs_client.send_message_batch.assert_called_once()
+        entries = p.sqs_client.send_message_batch.call_args[1]['Entries']
+        self.assertEqual([json.loads(x['MessageBody'])['task_id'] for x in entries], [str(i) for i in range(10)])
+
+        p.flush()
+
+        self.assertEqual(p.sqs_client.send_message_batch.call_count, 2)
+        self.assertEqual(p.sqs_client.send_message_batch.call_args[1]['QueueUrl'], 'https://sqs/queue')
+        self.assertEqual(len(p.sqs_client.send_message_batch.call_args[1]['Entries']), 2)
+        p.lambda_client.invoke.assert_not_called()
+
+
+    def test_send_completion_messages__keeps_failed(self):
+        with patch('boto3.client'):
+            p = Worker(custom_config={'completion_transport':            'sqs',
+                                      'sosw_worker_assistant_queue_url': 'https://sqs/queue'})
+
+        p.sqs_client = MagicMock()
+        p.sqs_client.send_message_batch.return_value = {'Failed': [{'Id': '1'}]}
+
+        p.mark_task_as_completed('a')
+        p.mark_task_as_completed('b')
+
+        self.assertRaises(RuntimeError, p.send_completion_messages)
+        self.assertEqual([json.loads(x)['task_id'] for x in p._completion_messages], ['b'])
+
+
+    def test_report_to_worker_assistant__invalid_transport(self):
+        with patch('boto3.client'):
+            p = Worker(custom_config={'completion_transport': 'pigeon'})
+
+        self.assertRaises(ValueError, p.mark_task_as_completed, '123')
@@ -1,6 +1,7 @@
+import json
 import os
 import unittest
-from unittest.mock import patch, Mock
+from unittest.mock import call, patch, Mock, MagicMock
 
 
 os.environ["STAGE"] = "test"
@@ -41,6 +42,116 @@ class WorkerAssistant_UnitTestCase(unittest.TestCase):
                                                                              result={"r_key": "value"})
 
 
+    def test_call__mark_task_as_closed__passes_labourer_id(self):
+        event = {
+            'action':      'mark_task_as_completed',
+            'task_id':     '123',
+            'labourer_id': 'some_function',
+        }
+
+        self.worker_assistant.mark_task_as_completed = Mock(return_value=None)
+        self.worker_assistant(event)
+        self.worker_assistant.mark_task_as_completed.assert_called_once_with(task_id='123', labourer_id='some_function')
+
+
+    def test_call__sqs_batch(self):
+        event = {'Records': [
+            {'eventSource': 'aws:sqs', 'body': json.dumps({'action': 'mark_task_as_completed', 'task_id': '123'})},
+            {'eventSource': 'aws:sqs', 'body': json.dumps({'action': 'mark_task_as_failed', 'task_id': '124'})},
+        ]}
+
+        self.worker_assistant.mark_task_as_completed = Mock(return_value=None)
+        self.worker_assistant.mark_task_as_failed = Mock(return_value=None)
+        r = self.worker_assistant(event)
+
+        self.worker_assistant.mark_task_as_completed.assert_called_once_with(task_id='123')
+        self.worker_assistant.mark_task_as_failed.assert_called_once_with(task_id='124')
+        self.assertEqual(r, {'batchItemFailures': []})
+
+
+    def test_call__sqs_batch__partial_failure(self):
+        event = {'Records': [
+            {'eventSource': 'aws:sqs', 'messageId': 'm1',
+             'body': json.dumps({'action': 'mark_task_as_completed', 'task_id': '123'})},
+            {'eventSource': 'aws:sqs', 'messageId': 'm2',
+             'body': json.dumps({'action': 'mark_task_as_completed', 'task_id': '124'})},
+            {'eventSource': 'aws:sqs', 'messageId': 'm3',
+             'body': json.dumps({'Message': json.dumps({'action': 'mark_task_as_completed', 'task_id': '125'}),
+                                 'TopicArn': 'arn:aws:sns:us-west-2:000000000000:some_topic'})},
+        ]}
+
+        def mark_task_as_completed(task_id):
+            if task_id == '124':
+                raise RuntimeError("Failed")
+
+        self.worker_assistant.mark_task_as_completed = Mock(side_effect=mark_task_as_completed)
+        r = self.worker_assistant(event)
+
+        self.assertEqual(self.worker_assistant.mark_task_as_completed.call_count, 3)
+        self.assertEqual(r, {'batchItemFailures': [{'itemIdentifier': 'm2'}]})
+
+
+    def test_call__list_of_actions(self):
+        events = [
+            {'action': 'mark_task_as_completed', 'task_id': '123', 'labourer_id': 'some_function'},
+            {'action': 'mark_task_as_failed', 'task_id': '124'},
+            {'action': 'unknown_action', 'task_id': '125'},
+            {'action': 'mark_task_as_completed', 'task_id': '126', 'stats': '{"s_key": "value"}'},
+        ]
+
+        self.worker_assistant.mark_task_as_completed = Mock(return_value=None)
+        self.worker_assistant.mark_task_as_failed = Mock(return_value=None)
+
+        for event in [events, {'actions': events}]:
+            r = self.worker_assistant(event)
+
+            self.assertEqual([x['task_id'] for x in r], ['123', '124', '125', '126'])
+            self.assertEqual([x['status'] for x in r], ['success', 'success', 'failed', 'success'])
+            self.assertIn('not supported', r[2]['error'])
+
+        self.worker_assistant.mark_task_as_completed.assert_has_calls([
+            call(task_id='123', labourer_id='some_function'),
+            call(task_id='126', stats={'s_key': 'value'}),
+        ], any_order=True)
+        self.assertEqual(self.worker_assistant.stats['batch_actions_failed'], 2)
+        self.assertEqual(self.worker_assistant.stats['batch_actions_succeeded'], 6)
+
+
+    def test_mark_task_as_completed__decrements_running_tasks_counter(self):
+        self.worker_assistant.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        self.worker_assistant.dynamo_db_client = MagicMock()
+        self.worker_assistant.meta_handler = MagicMock()
+
+        self.worker_assistant.mark_task_as_completed(task_id='123', labourer_id='some_function')
+
+        self.worker_assistant.dynamo_db_client.get_by_query.assert_not_called()
+        self.worker_assistant.dynamo_db_client.update.assert_called_with(
+                {'labourer_id': 'some_function'}, attributes_to_increment={'running_tasks': -1},
+                table_name='autotest_sosw_running_tasks_counters')
+
+
+    def test_mark_task_as_completed__decrements_running_tasks_counter__reads_labourer_id(self):
+        self.worker_assistant.config['sosw_running_tasks_counters_table'] = 'autotest_sosw_running_tasks_counters'
+        self.worker_assistant.dynamo_db_client = MagicMock()
+        self.worker_assistant.dynamo_db_client.get_by_query.return_value = [{'task_id': '123',
+                                                                             'labourer_id': 'some_function'}]
+        self.worker_assistant.meta_handler = MagicMock()
+
+        self.worker_assistant.mark_task_as_completed(task_id='123')
+
+        self.worker_assistant.dynamo_db_client.get_by_query.assert_called_once_with(keys={'task_id': '123'})
+        self.assertEqual(self.worker_assistant.dynamo_db_client.update.call_args[0][0], {'labourer_id': 'some_function'})
+
+
+    def test_mark_task_as_completed__counters_disabled(self):
+        self.worker_assistant.dynamo_db_client = MagicMock()
+        self.worker_assistant.meta_handler = MagicMock()
+
+        self.worker_assistant.mark_task_as_completed(task_id='123', labourer_id='some_function')
+
+        self.worker_assistant.dynamo_db_client.update.assert_called_once()
+
+
     def test_call__mark_task_as_closed__no_task_id__raises(self):
         event = {
             'action': 'mark_task_as_completed'
@@ -42,10 +42,12 @@ except ImportError:
     logger.setLevel(logging.INFO)
 
 import json
+import time
 
 from sosw.app import Processor
+from sosw.components.dynamo_db import DynamoDbClient
 from sosw.managers.meta_handler import MetaHandler
-from typing import Dict
+from typing import Dict, List, Optional
 
 
 class Worker(Processor):
@@ -64,14 +66,25 @@ class Worker(Processor):
     You also need to grant write permissions for this table to your Lambda.
 
     You can find more information about the configuration in the :ref:`MetaHandler<meta_handler>` chapter.
+
+    The way to report the completion is configurable with ``completion_transport``.
+    See ``report_to_worker_assistant()`` for the options.
     """
 
     DEFAULT_CONFIG = {
-        'init_clients':                 ['lambda'],
-        'sosw_worker_assistant_lambda': 'sosw_worker_assistant'
+        'init_clients':                      ['lambda'],
+        'sosw_worker_assistant_lambda':      'sosw_worker_assistant',
+        'completion_transport':              'lambda',
+        'sosw_worker_assistant_queue_url':   None,
+        'completion_dynamo_db_config':       None,
+        'sosw_running_tasks_counters_table': None,
     }
 
+    SQS_BATCH_MAX_MESSAGES = 10
+
     lambda_client = None
+    sqs_client = None
+    completion_dynamo_db_client: DynamoDbClient = None
     meta_handler: MetaHandler = None
 
 
@@ -82,6 +95,8 @@ class Worker(Processor):
         if 'meta_handler_config' in self.config:
             self.meta_handler = MetaHandler(custom_config=self.config['meta_handler_config'])
 
+        self._completion_messages: List[str] = []
+
 
     def __call__(self, event: Dict, reset_result: bool = True):
         """
@@ -92,7 +107,7 @@ class Worker(Processor):
         # Mark the task as completed in DynamoDB if the event had task_id.
         try:
             if event.get('task_id'):
-                self.mark_task_as_completed(event['task_id'])
+                self.mark_task_as_completed(event['task_id'], labourer_id=event.get('labourer_id'))
         except Exception:
             logger.exception(f"Failed to call WorkerAssistant for event {event}")
             pass
@@ -100,61 +115,158 @@ class Worker(Processor):
         super().__call__(event, reset_result)
 
 
-    def mark_task_as_completed(self, task_id: str):
-        """ Call worker assistant lambda and tell it to close task """
+    def mark_task_as_completed(self, task_id: str, labourer_id: Optional[str] = None):
+        """ Tell the WorkerAssistant to close the task using the configured ``completion_transport``. """
+
+        payload = self._make_worker_assistant_payload('mark_task_as_completed', task_id, labourer_id=labourer_id)
+        response = self.report_to_worker_assistant(payload)
+
+        if self.meta_handler:
+            self.meta_handler.post(task_id=task_id, action='completed')
+        logger.debug(f"mark_task_as_completed response: {response}")
+
+
+    def mark_task_as_failed(self, task_id: str):
+        """ Tell the WorkerAssistant to update task info using the configured ``completion_transport``. """
+
+        payload = self._make_worker_assistant_payload('mark_task_as_failed', task_id)
+        response = self.report_to_worker_assistant(payload)
+
+        if self.meta_handler:
+            self.meta_handler.post(task_id=task_id, action='failed')
+        logger.debug(f"mark_task_as_failed response: {response}")
 
-        if not self.lambda_client:
-            self.register_clients(['lambda'])
 
-        worker_assistant_lambda_name = self.config.get('sosw_worker_assistant_lambda', 'sosw_worker_assistant')
+    def _make_worker_assistant_payload(self, action: str, task_id: str, labourer_id: Optional[str] = None) -> Dict:
         payload = {
-            'action':  'mark_task_as_completed',
+            'action':  action,
             'task_id': task_id,
         }
 
+        if labourer_id:
+            payload['labourer_id'] = labourer_id
+
         if self.stats:
             payload.update({'stats': self.stats})
 
         if self.result:
             payload.update({'result': self.result})
 
-        payload = json.dumps(payload)
+        return payload
 
-        lambda_response = self.lambda_client.invoke(
-                FunctionName=worker_assistant_lambda_name,
-                InvocationType='Event',
-                Payload=payload
-        )
-        if self.meta_handler:
-            self.meta_handler.post(task_id=task_id, action='completed')
-        logger.debug(f"mark_task_as_completed response: {lambda_response}")
 
+    def report_to_worker_assistant(self, payload: Dict):
+        """
+        Deliver the `payload` for the WorkerAssistant with the ``completion_transport`` from the config:
 
-    def mark_task_as_failed(self, task_id: str):
-        """ Call worker assistant lambda and tell it to update task info """
+        - ``'lambda'`` - asynchronous invocation of the ``sosw_worker_assistant_lambda`` (default).
+        - ``'dynamo_db'`` - update the task in ``sosw_tasks`` directly. The Worker needs write permissions for the
+          table (and for ``sosw_running_tasks_counters_table`` if configured).
+        - ``'sqs'`` - buffer the payload and send it to ``sosw_worker_assistant_queue_url`` in batches.
+          The WorkerAssistant Lambda should be subscribed to the queue. The buffer is sent by ``flush()``.
+        """
 
+        transport = self.config.get('completion_transport', 'lambda')
+
+        if transport == 'lambda':
+            return self._report_with_lambda(payload)
+        elif transport == 'dynamo_db':
+            return self._report_with_dynamo_db(payload)
+        elif transport == 'sqs':
+            return self._report_with_sqs(payload)
+        else:
+            raise ValueError(f"Unsupported completion_transport: {transport}")
+
+
+    def _report_with_lambda(self, payload: Dict):
         if not self.lambda_client:
             self.register_clients(['lambda'])
 
-        worker_assistant_lambda_name = self.config.get('sosw_worker_assistant_lambda', 'sosw_worker_assistant')
-        payload = {
-            'action':  'mark_task_as_failed',
-            'task_id': task_id,
-        }
+        return self.lambda_client.invoke(
+                FunctionName=self.config.get('sosw_worker_assistant_lambda', 'sosw_worker_assistant'),
+                InvocationType='Event',
+                Payload=json.dumps(payload)
+        )
 
-        if self.stats:
-            payload.update({'stats': self.stats})
 
-        if self.result:
-            payload.update({'result': self.result})
+    def _report_with_dynamo_db(self, payload: Dict):
+        # Imported here not to load the WorkerAssistant for every Worker with the other transports.
+        from sosw.worker_assistant import WorkerAssistant
 
-        payload = json.dumps(payload)
+        if not self.completion_dynamo_db_client:
+            self.completion_dynamo_db_client = DynamoDbClient(
+                    config=self.config.get('completion_dynamo_db_config')
+                           or WorkerAssistant.DEFAULT_CONFIG['dynamo_db_config'])
 
-        lambda_response = self.lambda_client.invoke(
-                FunctionName=worker_assistant_lambda_name,
-                InvocationType='Event',
-                Payload=payload
-        )
-        if self.meta_handler:
-            self.meta_handler.post(task_id=task_id, action='failed')
-        logger.debug(f"mark_task_as_failed response: {lambda_response}")
+        field_names = self.completion_dynamo_db_client.config.get('field_names', {})
+        _ = lambda x: field_names.get(x, x)
+
+        fields_to_update = WorkerAssistant.get_stats_and_result_fields(payload.get('stats'), payload.get('result'))
+        update_kwargs = {'keys': {_('task_id'): payload['task_id']}}
+
+        if payload['action'] == 'mark_task_as_completed':
+            fields_to_update[_('completed_at')] = int(time.time())
+        else:
+            update_kwargs['attributes_to_increment'] = {_('failed_attempts'): 1}
+
+        if fields_to_update:
+            update_kwargs['attributes_to_update'] = fields_to_update
+
+        self.completion_dynamo_db_client.update(**update_kwargs)
+
+        if payload['action'] == 'mark_task_as_completed' and payload.get('labourer_id') \
+                and self.config.get('sosw_running_tasks_counters_table'):
+            self.completion_dynamo_db_client.update({_('labourer_id'): payload['labourer_id']},
+                                                    attributes_to_increment={'running_tasks': -1},
+                                                    table_name=self.config['sosw_running_tasks_counters_table'])
+
+
+    def _report_with_sqs(self, payload: Dict):
+        self._completion_messages.append(json.dumps(payload))
+
+        if len(self._completion_messages) >= self.SQS_BATCH_MAX_MESSAGES:
+            self.send_completion_messages()
+
+
+    def send_completion_messages(self):
+        """
+        Send the buffered completion messages to the ``sosw_worker_assistant_queue_url`` with batches of up to 10.
+        Messages that SQS failed to accept stay in the buffer for the next call.
+        """
+
+        if not self._completion_messages:
+            return
+
+        if not self.sqs_client:
+            self.register_clients(['sqs'])
+
+        messages, self._completion_messages = self._completion_messages, []
+        failed = []
+
+        for i in range(0, len(messages), self.SQS_BATCH_MAX_MESSAGES):
+            batch = messages[i:i + self.SQS_BATCH_MAX_MESSAGES]
+            try:
+                response = self.sqs_client.send_message_batch(
+                        QueueUrl=self.config['sosw_worker_assistant_queue_url'],
+                        Entries=[{'Id': str(n), 'MessageBody': body} for n, body in enumerate(batch)])
+            except Exception:
+                logger.exception("Failed to send completion messages to SQS")
+                failed.extend(batch)
+                continue
+
+            failed.extend(batch[int(x['Id'])] for x in response.get('Failed', []))
+
+        self._completion_messages[:0] = failed
+        if failed:
+            raise RuntimeError(f"Failed to send {len(failed)} completion messages to SQS")
+
+
+    def flush(self):
+        """ Also sends the buffered completion messages of the ``'sqs'`` completion_transport. """
+
+        super().flush()
+
+        try:
+            self.send_completion_messages()
+        except Exception:
+            logger.exception("Failed to flush completion messages")
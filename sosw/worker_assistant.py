@@ -31,14 +31,27 @@ __all__ = ['WorkerAssistant']
 __author__ = "Sophie Fogel"
 __version__ = "1.0"
 
+try:
+    from aws_lambda_powertools import Logger
+
+    logger = Logger()
+
+except ImportError:
+    import logging
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
 
 import json
+import threading
 import time
 
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from sosw.essential import Essential
 from sosw.components.dynamo_db import DynamoDbClient
-from sosw.components.helpers import get_one_from_dict
-from typing import Dict
+from sosw.components.helpers import get_one_from_dict, is_event_from_sns, is_event_from_sqs, unwrap_event_recursively
+from typing import Dict, List, Optional
 
 
 class WorkerAssistant(Essential):
@@ -51,6 +64,9 @@ class WorkerAssistant(Essential):
     This Essential is supposed to be called synchronously by the Worker Lambdas.
     Should pass the ``action`` and ``task_id`` attributes in the payload of the call.
 
+    Workers with ``'completion_transport': 'sqs'`` send the same payloads to an SQS queue instead. Subscribe
+    the WorkerAssistant Lambda to this queue and it will process the messages in batches.
+
     See example of the usage in :ref:`Worker`.
     """
 
@@ -76,66 +92,165 @@ class WorkerAssistant(Essential):
             'required_fields':  ['task_id', 'labourer_id', 'created_at', 'greenfield'],
 
             'field_names':      {}
-        }
+        },
+
+        # Same as in TaskManager. If configured, the counter of running tasks is decremented on completion.
+        'sosw_running_tasks_counters_table': None,
+
+        # Max number of threads to apply the actions of a batch.
+        'max_batch_workers': 10,
+    }
+
+    # Supported actions: name of the method and the parameters it accepts from the event.
+    ACTIONS = {
+        'mark_task_as_completed': {
+            'required_params': ['task_id'],
+            'optional_params': ['labourer_id'],
+        },
+        'mark_task_as_failed':    {
+            'required_params': ['task_id'],
+        },
     }
 
     # these clients will be initialized by Processor constructor
     dynamo_db_client: DynamoDbClient = None
 
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Actions of ``process_batch`` run in the threads of a pool. Update ``self.stats`` only with this lock.
+        self._stats_lock = threading.Lock()
+
+
     def __call__(self, event):
-        action = get_one_from_dict(event, 'action', str)
+        """
+        Apply a single action or a batch of them. The batch can be passed as a list of actions (or in the
+        ``'actions'`` of the event) and also arrives wrapped in SQS / SNS events. See ``process_batch()``.
 
-        mapper = {
-            'mark_task_as_completed': {
-                'function':        self.mark_task_as_completed,
-                'required_params': ['task_id']
-            },
-            'mark_task_as_failed': {
-                'function':        self.mark_task_as_failed,
-                'required_params': ['task_id']
-            }
-        }
+        :return:    Result of the action for a single action. For batches the list of per-item results
+                    or the partial batch response for SQS events (``{'batchItemFailures': [...]}``).
+        """
+
+        if is_event_from_sqs(event):
+            return self.process_sqs_batch(event)
 
-        if action in mapper:
-            func = mapper[action]['function']
-            required_params = mapper[action]['required_params']
+        if is_event_from_sns(event):
+            return self.process_batch(unwrap_event_recursively(event))
 
-            for req_param in required_params:
-                if req_param not in event:
-                    raise Exception(f"Missing required parameter `{req_param}` in event for action `{action}`")
+        if isinstance(event, list):
+            return self.process_batch(event)
 
-            func_kwargs = {k: event[k] for k in event if k in required_params}
+        if 'actions' in event:
+            return self.process_batch(event['actions'])
 
-            if 'stats' in event:
-                if isinstance(event['stats'], str):
-                    func_kwargs.update({'stats': json.loads(event['stats'])})
-                else:
-                    func_kwargs.update({'stats': event['stats']})
+        return self.process_action(event)
 
-            if 'result' in event:
-                if isinstance(event['result'], str):
-                    func_kwargs.update({'result': json.loads(event['result'])})
-                else:
-                    func_kwargs.update({'result': event['result']})
 
-            return func(**func_kwargs)
-        else:
+    def process_action(self, event: Dict):
+        """ Validate the parameters of a single action and call the method implementing it. """
+
+        action = get_one_from_dict(event, 'action', str)
+
+        if action not in self.ACTIONS:
             raise Exception(f"Action `{action}` is not supported")
 
+        func = getattr(self, action)
+        required_params = self.ACTIONS[action]['required_params']
+
+        for req_param in required_params:
+            if req_param not in event:
+                raise Exception(f"Missing required parameter `{req_param}` in event for action `{action}`")
+
+        allowed_params = required_params + self.ACTIONS[action].get('optional_params', [])
+        func_kwargs = {k: event[k] for k in event if k in allowed_params}
+
+        if 'stats' in event:
+            if isinstance(event['stats'], str):
+                func_kwargs.update({'stats': json.loads(event['stats'])})
+            else:
+                func_kwargs.update({'stats': event['stats']})
+
+        if 'result' in event:
+            if isinstance(event['result'], str):
+                func_kwargs.update({'result': json.loads(event['result'])})
+            else:
+                func_kwargs.update({'result': event['result']})
+
+        return func(**func_kwargs)
+
+
+    def process_batch(self, events: List[Dict]) -> List[Dict]:
+        """
+        Apply a batch of actions. The actions are grouped by name and the actions of the group are applied
+        concurrently with up to ``max_batch_workers`` threads. A failure of one item does not stop the others.
+
+        :return:    Per-item results in the same order as `events`: ``task_id``, ``action``, ``status``
+                    (``'success'`` or ``'failed'``) and the ``error`` for failed items.
+        """
+
+        groups = defaultdict(list)
+        for i, event in enumerate(events):
+            groups[event.get('action') if isinstance(event, dict) else None].append(i)
+
+        results = [None] * len(events)
+        max_workers = max(1, min(self.config['max_batch_workers'], len(events)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for action, indexes in groups.items():
+                futures = {i: pool.submit(self.process_action, events[i]) for i in indexes}
+
+                for i, future in futures.items():
+                    result = {'task_id': events[i].get('task_id') if isinstance(events[i], dict) else None,
+                              'action':  action}
+                    try:
+                        future.result()
+                        result['status'] = 'success'
+                        with self._stats_lock:
+                            self.stats['batch_actions_succeeded'] += 1
+                    except Exception as err:
+                        logger.exception(f"Failed to apply action {events[i]}")
+                        result.update({'status': 'failed', 'error': str(err)})
+                        with self._stats_lock:
+                            self.stats['batch_actions_failed'] += 1
+
+                    results[i] = result
 
-    def mark_task_as_completed(self, task_id: str, stats: Dict = None, result: Dict = None):
+        return results
+
+
+    def process_sqs_batch(self, event: Dict) -> Dict:
+        """
+        Apply the actions from the messages of the SQS event (which may also be wrapped in SNS).
+
+        :return:    Partial batch response with IDs of SQS messages that have failed actions. Enable
+                    ``ReportBatchItemFailures`` for the event source mapping to retry only these messages.
+        """
+
+        message_ids, actions = [], []
+        for record in event['Records']:
+            for action in unwrap_event_recursively({'Records': [record]}):
+                message_ids.append(record.get('messageId'))
+                actions.append(action)
+
+        results = self.process_batch(actions)
+
+        failed_message_ids = []
+        for message_id, result in zip(message_ids, results):
+            if result['status'] == 'failed' and message_id not in failed_message_ids:
+                failed_message_ids.append(message_id)
+
+        return {'batchItemFailures': [{'itemIdentifier': x} for x in failed_message_ids]}
+
+
+    def mark_task_as_completed(self, task_id: str, stats: Dict = None, result: Dict = None,
+                               labourer_id: Optional[str] = None):
         assert isinstance(task_id, str), f"`task_id` must be a string"
 
         _ = self.get_db_field_name
 
         fields_to_update = {_('completed_at'): int(time.time())}
-
-        if stats:
-            fields_to_update.update({f'stat_{k}': v for k, v in stats.items()})
-
-        if result:
-            fields_to_update.update({f'result_{k}': v for k, v in result.items()})
+        fields_to_update.update(self.get_stats_and_result_fields(stats, result))
 
         self.dynamo_db_client.update(
             keys={_('task_id'): task_id},
@@ -143,19 +258,35 @@ class WorkerAssistant(Essential):
         )
         self.meta_handler.post(task_id=task_id, action='marked_as_completed')
 
+        if self.config.get('sosw_running_tasks_counters_table'):
+            self.decrement_running_tasks_counter(task_id, labourer_id)
 
-    def mark_task_as_failed(self, task_id: str, stats: Dict = None, result: Dict = None):
-        assert isinstance(task_id, str), f"`task_id` must be a string"
+
+    def decrement_running_tasks_counter(self, task_id: str, labourer_id: Optional[str] = None):
+        """
+        Decrement the counter of running tasks of the Labourer (see ``TaskManager.update_running_tasks_counter``).
+        Workers of older versions do not send the `labourer_id`, so in this case it is read from the task.
+        """
 
         _ = self.get_db_field_name
 
-        fields_to_update = {}
+        if not labourer_id:
+            tasks = self.dynamo_db_client.get_by_query(keys={_('task_id'): task_id})
+            if not tasks:
+                logger.warning(f"Task {task_id} not found. Skip decrementing the counter of running tasks.")
+                return
+            labourer_id = tasks[0][_('labourer_id')]
 
-        if stats:
-            fields_to_update.update({f'stat_{k}': v for k, v in stats.items()})
+        self.dynamo_db_client.update({_('labourer_id'): labourer_id}, attributes_to_increment={'running_tasks': -1},
+                                     table_name=self.config['sosw_running_tasks_counters_table'])
 
-        if result:
-            fields_to_update.update({f'result_{k}': v for k, v in result.items()})
+
+    def mark_task_as_failed(self, task_id: str, stats: Dict = None, result: Dict = None):
+        assert isinstance(task_id, str), f"`task_id` must be a string"
+
+        _ = self.get_db_field_name
+
+        fields_to_update = self.get_stats_and_result_fields(stats, result)
 
         update_kwargs = {
             'keys': {_('task_id'): task_id},
@@ -168,6 +299,21 @@ class WorkerAssistant(Essential):
         self.meta_handler.post(task_id=task_id, action='marked_as_failed')
 
 
+    @staticmethod
+    def get_stats_and_result_fields(stats: Dict = None, result: Dict = None) -> Dict:
+        """ Fields of the task to save the ``stats`` and ``result`` reported by the Worker. """
+
+        fields = {}
+
+        if stats:
+            fields.update({f'stat_{k}': v for k, v in stats.items()})
+
+        if result:
+            fields.update({f'result_{k}': v for k, v in result.items()})
+
+        return fields
+
+
     def get_db_field_name(self, field: str) -> str:
         mapping = self.config['dynamo_db_config'].get('field_names', {})
         return mapping.get(field, field)